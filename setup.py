@@ -104,6 +104,8 @@ kwargs = dict(
     setup_requires = [],
     tests_require = [],
     install_requires=['pep272-encryption>=0.3'],
+    extras_require={'numpy': ['numpy']},
+    entry_points={'console_scripts': ['xtea = xtea.__main__:main']},
     python_requires='>=2.7,!=3.0.*,!=3.1.*,!=3.2.*'
 )
 
@@ -126,8 +128,7 @@ if BUILD_EXTENSION:
     n_args["ext_modules"] = [
         Extension('_xtea',
                   sources=['xtea.c'],
-                  optional=True,
-                  py_limited_api=True)
+                  optional=True)
     ]
 
     try:
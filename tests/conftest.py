@@ -0,0 +1,9 @@
+"""
+Test collection across Python versions.
+"""
+
+import sys
+
+collect_ignore = []  # pylint: disable=invalid-name
+if sys.version_info[0] < 3:  # async def is a syntax error
+    collect_ignore.append("test_aio.py")
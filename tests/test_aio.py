@@ -0,0 +1,159 @@
+"""
+Test the asyncio interface.
+"""
+
+import asyncio
+import io
+import os
+import unittest
+
+from unittest import mock
+
+import xtea
+from xtea import MODE_CBC, MODE_CTR, aio
+from xtea.counter import Counter
+
+# pylint: disable=missing-function-docstring
+
+KEY = os.urandom(16)
+IV = os.urandom(8)
+NONCE = os.urandom(8)
+
+
+def _cipher(mode):
+    return xtea.new(KEY, mode=mode, IV=IV, counter=Counter(NONCE))
+
+
+def _run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class _Writer(object):
+    """Minimal stand-in for asyncio.StreamWriter."""
+
+    def __init__(self):
+        self.buffer = io.BytesIO()
+        self.closed = False
+
+    def write(self, data):
+        self.buffer.write(data)
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    async def wait_closed(self):
+        pass
+
+
+@mock.patch.object(aio, "INLINE_THRESHOLD", 64)
+class TestAio(unittest.TestCase):
+    """
+    Compare asynchronous results with direct calls.
+    """
+
+    @classmethod
+    def tearDownClass(cls):
+        aio.shutdown()
+
+    def test_encrypt(self):
+        data = os.urandom(8 * 100)
+        for mode in (MODE_CBC, MODE_CTR):
+            result = _run(aio.encrypt(_cipher(mode), data))
+            self.assertEqual(result, _cipher(mode).encrypt(data))
+            result = _run(aio.decrypt(_cipher(mode), result))
+            self.assertEqual(result, data)
+
+    def test_order(self):
+        chunks = [os.urandom(size) for size in (800, 8, 1600, 16, 8, 800)]
+        cipher = _cipher(MODE_CBC)
+
+        async def main():  # gather starts them in any order before 3.7
+            tasks = [asyncio.ensure_future(aio.encrypt(cipher, chunk))
+                     for chunk in chunks]
+            return [(await task) for task in tasks]
+
+        self.assertEqual(b"".join(_run(main())),
+                         _cipher(MODE_CBC).encrypt(b"".join(chunks)))
+
+    def test_waiting_first(self):
+        chunks = [os.urandom(800), os.urandom(8)]
+        cipher = _cipher(MODE_CBC)
+
+        async def main():
+            lock = aio._cipher_lock(cipher)  # pylint: disable=W0212
+            await lock.acquire()
+            waiting = asyncio.ensure_future(aio.encrypt(cipher, chunks[0]))
+            await asyncio.sleep(0)
+            lock.release()  # The waiting call has not resumed yet
+            small = await aio.encrypt(cipher, chunks[1])
+            return [await waiting, small]
+
+        self.assertEqual(b"".join(_run(main())),
+                         _cipher(MODE_CBC).encrypt(b"".join(chunks)))
+
+    def test_loops(self):
+        chunks = [os.urandom(size) for size in (800, 8, 1600, 16)]
+        cipher = _cipher(MODE_CBC)
+
+        async def main():
+            tasks = [asyncio.ensure_future(aio.encrypt(cipher, chunk))
+                     for chunk in chunks]
+            return [(await task) for task in tasks]
+
+        result = b"".join(_run(main()) + _run(main()))
+        self.assertEqual(result, _cipher(MODE_CBC).encrypt(
+            b"".join(chunks) * 2))
+
+    def test_reader(self):
+        data = os.urandom(1001)
+
+        async def main():
+            stream = asyncio.StreamReader()
+            stream.feed_data(data)
+            stream.feed_eof()
+            reader = aio.AsyncEncryptingReader(stream, _cipher(MODE_CTR))
+            result = []
+            while True:
+                chunk = await reader.read(100)
+                if not chunk:
+                    return b"".join(result)
+                result.append(chunk)
+
+        self.assertEqual(_run(main()),
+                         _cipher(MODE_CTR).encrypt(data))
+
+    def test_reader_incomplete(self):
+        async def main():
+            stream = asyncio.StreamReader()
+            stream.feed_data(b"1234567")
+            stream.feed_eof()
+            await aio.AsyncEncryptingReader(stream, _cipher(MODE_CBC)).read()
+
+        with self.assertRaises(ValueError):
+            _run(main())
+
+    def test_writer(self):
+        data = os.urandom(8 * 50)
+        stream = _Writer()
+
+        async def main():
+            writer = aio.AsyncEncryptingWriter(stream, _cipher(MODE_CBC))
+            for start in range(0, len(data), 13):
+                await writer.write(data[start:start + 13])
+            await writer.close()
+
+        _run(main())
+        self.assertTrue(stream.closed)
+        self.assertEqual(stream.buffer.getvalue(),
+                         _cipher(MODE_CBC).encrypt(data))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+"""
+Test the batch API against one cipher object per message.
+"""
+
+import array
+import os
+import unittest
+
+import xtea
+from xtea import MODE_CBC, MODE_CFB, MODE_CTR, MODE_ECB, MODE_OFB
+from xtea.batch import Packed, pack
+from xtea.counter import Counter
+
+# pylint: disable=missing-function-docstring
+
+KEY = os.urandom(16)
+
+
+def _items(aligned, count=20):
+    return [(os.urandom(8), os.urandom(8 * (i % 5) if aligned else i * 3))
+            for i in range(count)]
+
+
+def _expected(mode, items, decrypt=False, **kwargs):
+    results = []
+    for iv, data in items:
+        cipher = xtea.new(KEY, mode=mode, IV=iv, counter=Counter(iv),
+                          **kwargs)
+        results.append(cipher.decrypt(data) if decrypt
+                       else cipher.encrypt(data))
+    return results
+
+
+class TestBatch(unittest.TestCase):
+    """
+    Compare batches with single messages.
+    """
+
+    def test_modes(self):
+        for mode in (MODE_ECB, MODE_CBC, MODE_CFB, MODE_OFB, MODE_CTR):
+            items = _items(mode not in (MODE_OFB, MODE_CTR))
+            for decrypt in (False, True):
+                func = xtea.decrypt_many if decrypt else xtea.encrypt_many
+                batch = func(KEY, mode, items, segment_size=64)
+                self.assertEqual(batch.split(), _expected(
+                    mode, items, decrypt, segment_size=64))
+
+    def test_round_trip(self):
+        items = _items(False)
+        batch = xtea.encrypt_many(KEY, MODE_CTR, items, rounds=32,
+                                  endian="<")
+        self.assertEqual(batch.split(), _expected(MODE_CTR, items, rounds=32,
+                                                  endian="<"))
+        self.assertEqual(xtea.decrypt_many(KEY, MODE_CTR, batch, rounds=32,
+                                           endian="<").split(),
+                         [data for _, data in items])
+
+    def test_cfb_segments(self):
+        items = _items(False)
+        batch = xtea.encrypt_many(KEY, MODE_CFB, items, segment_size=8)
+        self.assertEqual(batch.split(), _expected(MODE_CFB, items,
+                                                  segment_size=8))
+
+    def test_packed(self):
+        items = _items(True)
+        packed = pack(items)
+        self.assertEqual(packed.split(), [data for _, data in items])
+        self.assertEqual(xtea.encrypt_many(KEY, MODE_CBC, packed),
+                         xtea.encrypt_many(KEY, MODE_CBC, items))
+
+    def test_empty(self):
+        batch = xtea.encrypt_many(KEY, MODE_CBC, [])
+        self.assertEqual((batch.data, list(batch.offsets)), (b"", [0]))
+
+    def test_ecb_without_iv(self):
+        batch = xtea.encrypt_many(KEY, MODE_ECB, [(None, b"12345678")])
+        self.assertEqual(batch.data,
+                         xtea.new(KEY, mode=MODE_ECB).encrypt(b"12345678"))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            xtea.encrypt_many(KEY, MODE_CBC, [(b"12345678", b"1234567")])
+        with self.assertRaises(ValueError):
+            xtea.encrypt_many(KEY, MODE_CBC, [(b"1234567", b"12345678")])
+        with self.assertRaises(ValueError):
+            xtea.encrypt_many(KEY[1:], MODE_CTR, [(b"12345678", b"1")])
+
+    @unittest.skipIf(xtea._xtea is None, "C extension not available")
+    def test_invalid_offsets(self):
+        for offsets in ([0, 16, 8, 24], [0, 8, 16, 32], [8, 16, 24, 24]):
+            packed = Packed(b"\0" * 24, b"\0" * 24, array.array("q", offsets))
+            with self.assertRaises(ValueError):
+                xtea.encrypt_many(KEY, MODE_CTR, packed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+"""
+Test the benchmark suite.
+"""
+
+import json
+import os
+import tempfile
+import unittest
+
+import xtea
+from xtea import bench
+
+# pylint: disable=missing-function-docstring
+
+
+class TestBench(unittest.TestCase):
+    """
+    Run the benchmark with tiny inputs.
+    """
+
+    def test_run(self):
+        results = bench.run(modes=["ecb", "ctr"], sizes=[8, 64],
+                            min_time=0)
+        self.assertEqual(len(results),
+                         len(bench.available_engines()) * 2 * 2)
+        for result in results:
+            self.assertEqual(result["calls"], 1)
+            self.assertGreater(result["mb_per_s"], 0)
+
+    def test_engine_restored(self):
+        engine = xtea._engine  # pylint: disable=protected-access
+        bench.run(engines=["python"], modes=["ctr"], sizes=[8], min_time=0)
+        self.assertIs(xtea._engine, engine)  # pylint: disable=protected-access
+
+    def test_json(self):
+        handle, path = tempfile.mkstemp()
+        os.close(handle)
+        try:
+            bench.main(["--engines", "pep272", "--modes", "cfb8,ofb",
+                        "--sizes", "8,1K", "--rounds", "32,64",
+                        "--min-time", "0", "--json", path])
+            with open(path) as file:
+                document = json.load(file)
+        finally:
+            os.remove(path)
+
+        self.assertEqual(document["environment"]["xtea"], xtea.__version__)
+        self.assertEqual(len(document["results"]), 2 * 2 * 2)
+        self.assertEqual(document["results"][-1]["size"], 1024)
+
+    def test_invalid_mode(self):
+        with self.assertRaises(SystemExit):
+            bench.main(["--modes", "pgp"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,258 @@
+"""
+Test the bulk code path against the block-by-block PEP-272 implementation.
+"""
+
+import array
+import os
+import sys
+import threading
+import unittest
+
+from pep272_encryption import PEP272Cipher
+
+import xtea
+from xtea import MODE_CBC, MODE_CFB, MODE_CTR, MODE_ECB, MODE_OFB, XTEACipher
+from xtea.counter import Counter
+
+# pylint: disable=missing-function-docstring
+
+KEY = os.urandom(16)
+IV = os.urandom(8)
+NONCE = os.urandom(8)
+
+
+def _pair(mode, **kwargs):
+    """Create a cipher and an identical reference cipher."""
+    def create():
+        return XTEACipher(KEY, mode=mode, IV=IV,
+                          counter=Counter(NONCE), **kwargs)
+    return create(), create()
+
+
+def _reference(cipher, data, decrypt=False):
+    if decrypt:
+        return PEP272Cipher.decrypt(cipher, data)
+    return PEP272Cipher.encrypt(cipher, data)
+
+
+@unittest.skipIf(xtea._load_engine() is None, "No bulk engine available")
+class TestBulk(unittest.TestCase):
+    """
+    Compare the results of the bulk engine with the reference.
+    """
+
+    def _compare(self, mode, data, chunks=(), **kwargs):
+        for decrypt in (False, True):
+            cipher, reference = _pair(mode, **kwargs)
+            func = cipher.decrypt if decrypt else cipher.encrypt
+
+            out, rest = [], data
+            for size in chunks:
+                out.append(func(rest[:size]))
+                rest = rest[size:]
+            out.append(func(rest))
+
+            self.assertEqual(b"".join(out),
+                             _reference(reference, data, decrypt))
+            self.assertEqual(cipher.IV, reference.IV)
+
+    def test_ecb(self):
+        self._compare(MODE_ECB, os.urandom(8 * 33), (8, 64))
+
+    def test_cbc(self):
+        self._compare(MODE_CBC, os.urandom(8 * 33), (8, 64))
+
+    def test_cfb(self):
+        self._compare(MODE_CFB, os.urandom(8 * 33), (8, 64),
+                      segment_size=64)
+
+    def test_cfb_segments(self):
+        for segment_size in range(8, 72, 8):
+            size = segment_size // 8
+            self._compare(MODE_CFB, os.urandom(size * 97), (size, 0, size * 9),
+                          segment_size=segment_size)
+        self._compare(MODE_CFB, os.urandom(70), (3,), segment_size=8,
+                      endian="<")
+
+    def test_cfb_segments_invalid(self):
+        cipher = xtea.new(KEY, mode=MODE_CFB, IV=IV, segment_size=16)
+        with self.assertRaises(ValueError):
+            cipher.encrypt(b"123")
+
+    def test_ofb(self):
+        self._compare(MODE_OFB, os.urandom(263), (1, 7, 3, 17, 0, 8))
+
+    def test_ctr(self):
+        self._compare(MODE_CTR, os.urandom(263), (1, 7, 3, 17, 0, 8))
+
+    def test_ctr_batches(self):
+        self._compare(MODE_CTR, os.urandom(3 * xtea._CTR_BATCH + 5), (3,))
+
+    def test_little_endian(self):
+        self._compare(MODE_CBC, os.urandom(64), endian="<")
+        self._compare(MODE_CTR, os.urandom(61), endian="<")
+
+    def test_rounds(self):
+        self._compare(MODE_ECB, os.urandom(64), rounds=16)
+
+    @unittest.skipIf(xtea._xtea is None, "C extension not available")
+    def test_key_schedule(self):
+        key, block = (1, 2, 3, 0xffffffff), (0xdeadbeef, 42)
+        for cycles in (0, 1, 8, 32, 33):
+            schedule = xtea._xtea.key_schedule(key, cycles)
+            self.assertEqual(xtea._xtea.encipher(schedule, block),
+                             xtea._xtea.encrypt_int(key, block, cycles))
+            self.assertEqual(xtea._xtea.decipher(schedule, block),
+                             xtea._xtea.decrypt_int(key, block, cycles))
+
+    @unittest.skipIf(xtea._xtea is None, "C extension not available")
+    def test_invalid_schedule(self):
+        with self.assertRaises(ValueError):
+            xtea._xtea.ecb_encrypt(object(), b"12345678")
+        with self.assertRaises(ValueError):
+            xtea._xtea.key_schedule((1, 2, 3, 4), (1 << 24) + 1)
+
+    def test_invalid_length(self):
+        for mode in (MODE_ECB, MODE_CBC):
+            with self.assertRaises(ValueError):
+                xtea.new(KEY, mode=mode, IV=IV).encrypt(b"1234567")
+
+    def test_invalid_counter(self):
+        cipher = xtea.new(KEY, mode=MODE_CTR, counter=lambda: b"short")
+        with self.assertRaises(TypeError):
+            cipher.encrypt(b"12345678")
+
+
+@unittest.skipIf(xtea._xtea is None, "C extension not available")
+class TestKernels(unittest.TestCase):
+    """
+    Every interleaved kernel of the C extension gives the same results.
+    """
+
+    def setUp(self):
+        self.previous = xtea._xtea.get_kernel()
+
+    def tearDown(self):
+        xtea._xtea.set_kernel(self.previous)
+
+    def test_default(self):
+        self.assertEqual(xtea._xtea.get_kernel(),
+                         xtea._xtea.available_kernels()[0])
+        self.assertIn("scalar", xtea._xtea.available_kernels())
+
+    def test_modes(self):
+        data = os.urandom(8 * 67 + 3)
+        for kernel in xtea._xtea.available_kernels():
+            xtea._xtea.set_kernel(kernel)
+            with self.subTest(kernel=kernel):
+                case = TestBulk()
+                case._compare(MODE_ECB, data[:8 * 67], (8, 72, 64))
+                case._compare(MODE_CBC, data[:8 * 67], (8, 72, 64))
+                case._compare(MODE_CFB, data[:8 * 67], (8, 72, 64),
+                              segment_size=64)
+                case._compare(MODE_CFB, data, (1, 64, 70), segment_size=8)
+                case._compare(MODE_CFB, data[:3 * 67], (3, 96),
+                              segment_size=24)
+                case._compare(MODE_CTR, data, (3, 64, 70, 1))
+                case._compare(MODE_ECB, data[:8 * 67], endian="<")
+                case._compare(MODE_CTR, data, (5,), rounds=16)
+
+    def test_in_place(self):
+        data = os.urandom(8 * 40)
+        for kernel in xtea._xtea.available_kernels():
+            xtea._xtea.set_kernel(kernel)
+            for mode in (MODE_ECB, MODE_CBC, MODE_CTR):
+                expected = _pair(mode)[0].encrypt(data)
+                buffer = bytearray(expected)
+                _pair(mode)[0].decrypt_into(buffer, buffer)
+                self.assertEqual(bytes(buffer), data)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            xtea._xtea.set_kernel("mmx")
+
+
+class TestInto(unittest.TestCase):
+    """
+    Test encryption and decryption into writable buffers.
+    """
+
+    def test_into(self):
+        data = os.urandom(8 * 17)
+        for mode in (MODE_ECB, MODE_CBC, MODE_CFB, MODE_OFB, MODE_CTR):
+            cipher, reference = _pair(mode)
+            out = bytearray(len(data))
+            self.assertEqual(cipher.encrypt_into(data, out), len(data))
+            self.assertEqual(bytes(out), reference.encrypt(data))
+
+    def test_in_place(self):
+        data = os.urandom(8 * 17)
+        for mode in (MODE_ECB, MODE_CBC, MODE_CFB, MODE_OFB, MODE_CTR):
+            cipher, reference = _pair(mode, segment_size=64)
+            buffer = bytearray(data)
+            cipher.encrypt_into(buffer, buffer)
+            self.assertEqual(bytes(buffer), reference.encrypt(data))
+
+            cipher, reference = _pair(mode, segment_size=64)
+            cipher.decrypt_into(buffer, memoryview(buffer))
+            self.assertEqual(bytes(buffer), data)
+
+    def test_cfb_segments_in_place(self):
+        data = os.urandom(8 * 17 + 3)
+        cipher, reference = _pair(MODE_CFB, segment_size=8)
+        buffer = bytearray(data)
+        cipher.encrypt_into(buffer, buffer)
+        self.assertEqual(bytes(buffer), reference.encrypt(data))
+
+        cipher, reference = _pair(MODE_CFB, segment_size=8)
+        cipher.decrypt_into(buffer, buffer)
+        self.assertEqual(bytes(buffer), data)
+
+    def test_ctr_batches(self):
+        data = os.urandom(2 * xtea._CTR_BATCH + 3)
+        cipher, reference = _pair(MODE_CTR)
+        buffer = bytearray(data)
+        cipher.encrypt_into(buffer, buffer)
+        self.assertEqual(bytes(buffer), reference.encrypt(data))
+
+    @unittest.skipIf(sys.version_info[0] < 3,
+                     "array.array is read-only as a memoryview on Python 2")
+    def test_array(self):
+        data = os.urandom(8 * 4)
+        cipher, reference = _pair(MODE_ECB)
+        buffer = array.array("I", data)
+        cipher.encrypt_into(buffer, buffer)
+        self.assertEqual(buffer.tobytes(), reference.encrypt(data))
+
+    def test_array_source(self):
+        data = os.urandom(8 * 4)
+        cipher, reference = _pair(MODE_CBC)
+        out = bytearray(len(data))
+        cipher.encrypt_into(array.array("I", data), out)
+        self.assertEqual(bytes(out), reference.encrypt(data))
+
+    def test_too_small(self):
+        cipher = xtea.new(KEY, mode=MODE_ECB)
+        with self.assertRaises(ValueError):
+            cipher.encrypt_into(b"12345678" * 2, bytearray(8))
+
+    def test_threads(self):
+        data = os.urandom(1 << 16)
+        expected = _pair(MODE_CBC)[0].encrypt(data)
+        results = []
+
+        def work():
+            out = bytearray(len(data))
+            _pair(MODE_CBC)[0].encrypt_into(data, out)
+            results.append(bytes(out))
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [expected] * 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+Test the key schedule cache.
+"""
+
+import threading
+import unittest
+
+import xtea
+from xtea.cache import KeyCache, key_cache
+
+# pylint: disable=missing-function-docstring
+
+
+class TestKeyCache(unittest.TestCase):
+    """
+    Test the LRU cache.
+    """
+
+    def test_lru(self):
+        cache = KeyCache(maxsize=2)
+        cache.get(1, lambda: "one")
+        cache.get(2, lambda: "two")
+        cache.get(1, lambda: "new")  # 2 is now the least recently used
+        cache.get(3, lambda: "three")
+
+        self.assertEqual(cache.get(1, lambda: "new"), "one")
+        self.assertEqual(cache.get(2, lambda: "new"), "new")
+        self.assertEqual(len(cache), 2)
+
+    def test_info(self):
+        cache = KeyCache(maxsize=4)
+        cache.get(1, lambda: None)
+        cache.get(1, lambda: None)
+        cache.get(2, lambda: None)
+        self.assertEqual(tuple(cache.info()), (1, 2, 4, 2))
+
+        cache.clear()
+        self.assertEqual(tuple(cache.info()), (0, 0, 4, 0))
+
+    def test_evict(self):
+        cache = KeyCache()
+        cache.get(1, lambda: "one")
+        self.assertTrue(cache.evict(1))
+        self.assertFalse(cache.evict(1))
+
+    def test_resize(self):
+        cache = KeyCache(maxsize=3)
+        for i in range(3):
+            cache.get(i, lambda: None)
+        cache.maxsize = 1
+        self.assertEqual(len(cache), 1)
+
+        with self.assertRaises(ValueError):
+            cache.maxsize = -1
+
+    def test_disabled(self):
+        cache = KeyCache(maxsize=0)
+        self.assertEqual(cache.get(1, lambda: "one"), "one")
+        self.assertEqual(cache.get(1, lambda: "two"), "two")
+        self.assertEqual(len(cache), 0)
+
+    def test_threads(self):
+        cache = KeyCache(maxsize=8)
+
+        def work():
+            for i in range(1000):
+                cache.get(i % 16, lambda: None)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        info = cache.info()
+        self.assertEqual(info.hits + info.misses, 4000)
+        self.assertEqual(info.currsize, 8)
+
+
+class TestCipherCache(unittest.TestCase):
+    """
+    Test that cipher objects share their key schedules.
+    """
+
+    def setUp(self):
+        key_cache.clear()
+
+    def test_shared(self):
+        key = b"0123456789abcdef"
+        first = xtea.new(key, mode=xtea.MODE_ECB).encrypt(b"12345678")
+        second = xtea.new(key, mode=xtea.MODE_ECB).encrypt(b"12345678")
+        self.assertEqual(first, second)
+        self.assertEqual(key_cache.info().hits, 1)
+
+    def test_parameters(self):
+        key = b"0123456789abcdef"
+        xtea.new(key, mode=xtea.MODE_ECB)
+        xtea.new(key, mode=xtea.MODE_ECB, rounds=32)
+        xtea.new(key, mode=xtea.MODE_ECB, endian="<")
+        xtea.new(bytearray(key), mode=xtea.MODE_ECB)
+        self.assertEqual(tuple(key_cache.info())[:2], (1, 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+"""
+Test the memory-compact cipher contexts.
+"""
+
+import os
+import platform
+import unittest
+
+import xtea
+from xtea import MODE_CBC, MODE_CFB, MODE_CTR, MODE_ECB, MODE_OFB
+from xtea.context import CipherContext
+from xtea.counter import Counter
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+# pylint: disable=missing-function-docstring
+
+KEY = os.urandom(16)
+IV = os.urandom(8)
+
+#: Bytes per context besides the key schedule, see xtea.context.
+CONTEXT_BUDGET = 200
+
+#: Sizes are measured with tracemalloc on CPython 3.
+MEASURABLE = tracemalloc is not None and \
+    platform.python_implementation() == "CPython"
+
+
+def _allocated(factory, count=1000):
+    """Get the bytes allocated per object created by `factory`."""
+    objects = [factory()]
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        objects.extend(factory() for _ in range(count))
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return (after - before) / count
+
+
+class TestCipherContext(unittest.TestCase):
+    """
+    Contexts give the results of cipher objects.
+    """
+
+    def _compare(self, mode, data, chunks=(), **kwargs):
+        for decrypt in (False, True):
+            cipher = xtea.new(KEY, mode=mode, IV=IV, counter=Counter(IV),
+                              segment_size=64, **kwargs)
+            context = CipherContext(KEY, mode, IV, **kwargs)
+            func = context.decrypt if decrypt else context.encrypt
+
+            out, rest = [], data
+            for size in chunks:
+                out.append(func(rest[:size]))
+                rest = rest[size:]
+            out.append(func(rest))
+
+            expected = cipher.decrypt(data) if decrypt \
+                else cipher.encrypt(data)
+            self.assertEqual(b"".join(out), expected)
+
+    def test_block_modes(self):
+        data = os.urandom(8 * 33)
+        for mode in (MODE_ECB, MODE_CBC, MODE_CFB):
+            self._compare(mode, data, (8, 64))
+
+    def test_keystream_modes(self):
+        data = os.urandom(263)
+        for mode in (MODE_OFB, MODE_CTR):
+            self._compare(mode, data, (1, 7, 3, 17, 0, 8))
+
+    def test_ctr_batches(self):
+        self._compare(MODE_CTR, os.urandom(2 * xtea._CTR_BATCH + 5), (3,))
+
+    def test_parameters(self):
+        self._compare(MODE_CBC, os.urandom(64), endian="<")
+        self._compare(MODE_CTR, os.urandom(61), rounds=16)
+
+    def test_counter_wraps(self):
+        nonce = b"\xff" * 7 + b"\xfe"
+        context = CipherContext(KEY, MODE_CTR, nonce)
+        cipher = xtea.new(KEY, mode=MODE_CTR, counter=Counter(nonce))
+        data = os.urandom(40)
+        self.assertEqual(context.encrypt(data), cipher.encrypt(data))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            CipherContext(KEY[1:], MODE_ECB)
+        with self.assertRaises(ValueError):
+            CipherContext(KEY, MODE_CBC)
+        with self.assertRaises(ValueError):
+            CipherContext(KEY, xtea.MODE_PGP, IV)
+        with self.assertRaises(ValueError):
+            CipherContext(KEY, MODE_OFB, IV, endian="@")
+        with self.assertRaises(ValueError):
+            CipherContext(KEY, MODE_ECB).encrypt(b"1234567")
+
+
+class TestSize(unittest.TestCase):
+    """
+    Contexts and counters have no instance dictionary and stay small.
+    """
+
+    def test_slots(self):
+        context = CipherContext(KEY, MODE_CTR, IV)
+        self.assertFalse(hasattr(context, "__dict__"))
+        with self.assertRaises(AttributeError):
+            context.mode = MODE_ECB
+        self.assertFalse(hasattr(Counter(IV), "__dict__"))
+
+    @unittest.skipIf(not MEASURABLE, "Sizes are measured on CPython 3")
+    def test_per_instance(self):
+        for mode in (MODE_ECB, MODE_CBC, MODE_OFB, MODE_CTR):
+            size = _allocated(
+                lambda: CipherContext(KEY, mode, IV))  # pylint: disable=W0640
+            self.assertLess(size, CONTEXT_BUDGET)
+
+    @unittest.skipIf(not MEASURABLE, "Sizes are measured on CPython 3")
+    def test_smaller_than_cipher(self):
+        def cipher():
+            return xtea.new(KEY, mode=MODE_CTR, counter=Counter(IV))
+        self.assertLess(
+            _allocated(lambda: CipherContext(KEY, MODE_CTR, IV)) * 3,
+            _allocated(cipher))
+
+
+if __name__ == "__main__":
+    unittest.main()
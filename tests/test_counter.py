@@ -69,6 +69,34 @@ class TestCounter(unittest.TestCase):
         self.assertEqual(counter(), b'\xff\xff\xff\xff\xff\xff\xff\xff')
         self.assertEqual(counter(), b'\x00\x00\x00\x00\x00\x00\x00\x00')
 
+    def test_blocks(self):
+        for byteorder in ('little', 'big'):
+            counter = Counter(b'\x01\x02\x03\x04\x05\x06\x07\x08',
+                              byteorder)
+            expected = b''.join(counter() for _ in range(101))
+            counter.reset()
+            self.assertEqual(counter.blocks(60) + counter.blocks(0) +
+                             counter.blocks(40), expected[:-8])
+            self.assertEqual(counter(), expected[-8:])
+
+    def test_blocks_overflow(self):
+        for byteorder in ('little', 'big'):
+            counter = Counter(b'\xff\xff\xff\xff\xff\xff\xff\xfe',
+                              byteorder)
+            expected = b''.join(counter() for _ in range(5))
+            counter.reset()
+            self.assertEqual(counter.blocks(4), expected[:-8])
+            self.assertEqual(counter(), expected[-8:])
+
+    def test_seek(self):
+        counter = Counter(b'\xff\xff\xff\xff\xff\xff\xff\xfe', 'big')
+        expected = [counter() for _ in range(5)]
+        counter.seek(3)
+        self.assertEqual(counter.tell(), 3)
+        self.assertEqual(counter(), expected[3])
+        counter.seek(0)
+        self.assertEqual(counter(), expected[0])
+
 
 if __name__ == "__main__":
     unittest.main()
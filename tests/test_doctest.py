@@ -3,7 +3,21 @@ import os
 import sys
 
 import xtea
+import xtea.batch
+import xtea.cache
+import xtea.context
 import xtea.counter
+import xtea.eax
+import xtea.mac
+import xtea.metrics
+import xtea.mmapio
+import xtea.padding
+import xtea.prefetch
+import xtea.stream
+
+if sys.version_info[0] > 2:
+    import xtea.aio
+    import xtea.parallel
 
 
 def test_init():
@@ -13,3 +27,51 @@ def test_init():
 def test_counter():
     if sys.version_info[0] > 2:
         doctest.testmod(xtea.counter, raise_on_error=True)
+
+def test_cache():
+    if sys.version_info[0] > 2:
+        doctest.testmod(xtea.cache, raise_on_error=True)
+
+def test_stream():
+    if sys.version_info[0] > 2:
+        doctest.testmod(xtea.stream, raise_on_error=True)
+
+def test_mmapio():
+    if sys.version_info[0] > 2:
+        doctest.testmod(xtea.mmapio, raise_on_error=True)
+
+def test_parallel():
+    if sys.version_info[0] > 2:
+        doctest.testmod(xtea.parallel, raise_on_error=True)
+
+def test_aio():
+    if sys.version_info[0] > 2:
+        doctest.testmod(xtea.aio, raise_on_error=True)
+
+def test_metrics():
+    if sys.version_info[0] > 2:
+        doctest.testmod(xtea.metrics, raise_on_error=True)
+
+def test_mac():
+    if sys.version_info[0] > 2:
+        doctest.testmod(xtea.mac, raise_on_error=True)
+
+def test_eax():
+    if sys.version_info[0] > 2:
+        doctest.testmod(xtea.eax, raise_on_error=True)
+
+def test_batch():
+    if sys.version_info[0] > 2:
+        doctest.testmod(xtea.batch, raise_on_error=True)
+
+def test_context():
+    if sys.version_info[0] > 2:
+        doctest.testmod(xtea.context, raise_on_error=True)
+
+def test_prefetch():
+    if sys.version_info[0] > 2:
+        doctest.testmod(xtea.prefetch, raise_on_error=True)
+
+def test_padding():
+    if sys.version_info[0] > 2:
+        doctest.testmod(xtea.padding, raise_on_error=True)
@@ -0,0 +1,119 @@
+"""
+Test EAX against a reference built from CTR mode and CMAC.
+"""
+
+import binascii
+import os
+import struct
+import unittest
+
+import xtea
+from xtea import MODE_CTR, eax, mac
+from xtea.counter import Counter
+
+# pylint: disable=missing-function-docstring
+
+KEY = os.urandom(16)
+NONCE = os.urandom(12)
+
+
+def _xor(one, two):
+    return bytes(bytearray(x ^ y for x, y in zip(bytearray(one),
+                                                 bytearray(two))))
+
+
+def _reference(key, nonce, header, msg, **kwargs):
+    """EAX as described by Bellare, Rogaway and Wagner."""
+    def omac(tweak, data):
+        return mac.new(key, struct.pack(">Q", tweak) + data,
+                       **kwargs).digest()
+
+    counter = omac(0, nonce)
+    encrypted = xtea.new(key, mode=MODE_CTR, counter=Counter(counter),
+                         **kwargs).encrypt(msg)
+    tag = _xor(_xor(counter, omac(1, header)), omac(2, encrypted))
+    return encrypted, tag
+
+
+class TestEAX(unittest.TestCase):
+    """
+    Compare one-shot and streamed results with the reference.
+    """
+
+    def test_lengths(self):
+        for length in (0, 1, 7, 8, 9, 16, 17, 100, 4096):
+            msg, header = os.urandom(length), os.urandom(length % 11)
+            expected = _reference(KEY, NONCE, header, msg)
+            cipher = eax.new(KEY, NONCE, header)
+            self.assertEqual(cipher.encrypt_and_digest(msg), expected)
+            cipher = eax.new(KEY, NONCE, header)
+            self.assertEqual(cipher.decrypt_and_verify(*expected), msg)
+
+    def test_stream(self):
+        msg = os.urandom(203)
+        expected = _reference(KEY, NONCE, b"header", msg)
+        for chunks in ((1,) * 20, (7, 1, 8, 16, 3), (8, 8, 8), (0, 64, 5)):
+            for decrypt in (False, True):
+                cipher = eax.new(KEY, NONCE)
+                rest = expected[0] if decrypt else msg
+                func = cipher.decrypt if decrypt else cipher.encrypt
+                out = []
+                for size in chunks:
+                    out.append(func(rest[:size]))
+                    rest = rest[size:]
+                out.append(func(bytearray(rest)))
+                cipher.update(b"head")
+                cipher.update(b"er")
+
+                self.assertEqual(b"".join(out), msg if decrypt
+                                 else expected[0])
+                self.assertEqual(cipher.digest(), expected[1])
+
+    def test_counter_wrap(self):
+        # The CTR counter must wrap around at 2**64 like xtea.counter
+        cipher = eax.new(KEY, NONCE)
+        cipher._counter = b"\xff" * 8  # pylint: disable=protected-access
+        result = cipher.encrypt(b"\0" * 24)
+        expected = xtea.new(KEY, mode=MODE_CTR, counter=Counter(b"\xff" * 8)
+                            ).encrypt(b"\0" * 24)
+        self.assertEqual(result, expected)
+
+    def test_parameters(self):
+        msg = os.urandom(21)
+        cipher = eax.new(KEY, NONCE, rounds=32, endian="<", tag_size=4)
+        encrypted, tag = _reference(KEY, NONCE, b"", msg,
+                                    rounds=32, endian="<")
+        self.assertEqual(cipher.encrypt_and_digest(msg),
+                         (encrypted, tag[:4]))
+
+    def test_verify(self):
+        encrypted, tag = eax.new(KEY, NONCE).encrypt_and_digest(b"message")
+        with self.assertRaises(ValueError):
+            eax.new(KEY, NONCE).decrypt_and_verify(encrypted[:-1] + b"!",
+                                                   tag)
+        with self.assertRaises(ValueError):
+            eax.new(KEY, NONCE, b"header").decrypt_and_verify(encrypted, tag)
+        with self.assertRaises(ValueError):
+            eax.new(KEY, NONCE[1:]).decrypt_and_verify(encrypted, tag)
+
+    def test_vectors(self):
+        key = bytes(bytearray(range(16)))
+        cipher = eax.new(key, b"nonce", b"header")
+        encrypted, tag = cipher.encrypt_and_digest(b"This is a text.")
+        self.assertEqual(binascii.hexlify(encrypted),
+                         b"a0d68f3ea32ba0dbde82ea66b63d5b")
+        self.assertEqual(binascii.hexlify(tag), b"dfafc51552f297e2")
+
+    def test_mixed(self):
+        cipher = eax.new(KEY, NONCE)
+        cipher.encrypt(b"123")
+        with self.assertRaises(TypeError):
+            cipher.decrypt(b"123")
+
+    def test_tag_size(self):
+        with self.assertRaises(ValueError):
+            eax.new(KEY, NONCE, tag_size=9)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+"""
+Test the import time and the modules imported with xtea.
+"""
+
+import subprocess
+import sys
+import unittest
+
+from xtea import bench
+
+# pylint: disable=missing-function-docstring
+
+#: Generous limit for the import time of xtea, in microseconds.
+IMPORT_BUDGET = 200000
+
+CHECK = """
+import sys
+before = set(sys.modules)  # Python 2 imports warnings on startup
+import xtea
+print(" ".join(name for name in ("numpy", "threading", "warnings",
+                                 "xtea.batch")
+               if name in sys.modules and name not in before))
+print(xtea._engine is None)
+xtea.new(b" " * 16, mode=xtea.MODE_CTR, counter=lambda: b"12345678")
+print(xtea._engine is None)
+"""
+
+
+class TestImport(unittest.TestCase):
+    """
+    Importing xtea stays cheap, the engine is selected on first use.
+    """
+
+    def test_lazy(self):
+        output = subprocess.check_output([sys.executable, "-c", CHECK],
+                                         universal_newlines=True)
+        self.assertEqual(output.splitlines(), ["", "True", "False"])
+
+    @unittest.skipIf(sys.version_info < (3, 7), "-X importtime is missing")
+    def test_import_time(self):
+        result = bench.measure_import(runs=3)
+        self.assertLess(result["microseconds"], IMPORT_BUDGET)
+        self.assertIn("xtea", result["modules"])
+        self.assertNotIn("xtea.batch", result["modules"])
+
+    @unittest.skipIf(sys.version_info < (3, 7), "-X importtime is missing")
+    def test_main(self):
+        self.assertEqual(bench.main(["--import-time"]), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+Test CMAC against a reference built from CBC mode.
+"""
+
+import binascii
+import os
+import struct
+import unittest
+
+import xtea
+from xtea import MODE_CBC, mac
+
+# pylint: disable=missing-function-docstring
+
+KEY = os.urandom(16)
+
+
+def _xor(one, two):
+    return bytes(bytearray(x ^ y for x, y in zip(bytearray(one),
+                                                 bytearray(two))))
+
+
+def _double(block):
+    value, = struct.unpack(">Q", block)
+    value = (value << 1) ^ (0x1b if value >> 63 else 0)
+    return struct.pack(">Q", value & (2 ** 64 - 1))
+
+
+def _reference(key, msg, **kwargs):
+    """CMAC as described in NIST SP 800-38B."""
+    encrypt = xtea.new(key, mode=xtea.MODE_ECB, **kwargs).encrypt
+    first = _double(encrypt(b"\0" * 8))
+    second = _double(first)
+
+    if msg and len(msg) % 8 == 0:
+        last = _xor(msg[-8:], first)
+        msg = msg[:-8]
+    else:
+        rest = len(msg) % 8
+        last = _xor(msg[len(msg) - rest:] + b"\x80" + b"\0" * (7 - rest),
+                    second)
+        msg = msg[:len(msg) - rest]
+
+    cipher = xtea.new(key, mode=MODE_CBC, IV=b"\0" * 8, **kwargs)
+    return cipher.encrypt(msg + last)[-8:]
+
+
+class TestCMAC(unittest.TestCase):
+    """
+    Compare one-shot and incremental tags with the reference.
+    """
+
+    def test_lengths(self):
+        for length in (0, 1, 7, 8, 9, 16, 17, 100, 4096):
+            msg = os.urandom(length)
+            self.assertEqual(mac.new(KEY, msg).digest(),
+                             _reference(KEY, msg))
+
+    def test_update(self):
+        msg = os.urandom(203)
+        for chunks in ((1,) * 20, (7, 1, 8, 16, 3), (8, 8, 8), (0, 64)):
+            tag, rest = mac.new(KEY), msg
+            for size in chunks:
+                tag.update(rest[:size])
+                rest = rest[size:]
+            tag.update(bytearray(rest))
+            self.assertEqual(tag.digest(), _reference(KEY, msg))
+
+    def test_copy(self):
+        tag = mac.new(KEY, b"12345678")
+        other = tag.copy()
+        other.update(b"9")
+        self.assertEqual(tag.digest(), _reference(KEY, b"12345678"))
+        self.assertEqual(other.digest(), _reference(KEY, b"123456789"))
+        self.assertEqual(tag.digest(), tag.digest())
+
+    def test_parameters(self):
+        msg = os.urandom(21)
+        self.assertEqual(mac.new(KEY, msg, rounds=32, endian="<").digest(),
+                         _reference(KEY, msg, rounds=32, endian="<"))
+        self.assertNotEqual(mac.new(KEY, msg, rounds=32).digest(),
+                            mac.new(KEY, msg).digest())
+
+    def test_hexdigest(self):
+        tag = mac.new(KEY, b"message")
+        self.assertEqual(tag.hexdigest(),
+                         binascii.hexlify(tag.digest()).decode())
+        self.assertEqual(tag.digest_size, 8)
+
+    def test_vectors(self):
+        key = bytes(bytearray(range(16)))
+        self.assertEqual(mac.new(key).hexdigest(), "a821403929958a1a")
+        self.assertEqual(mac.new(key, bytes(bytearray(range(40)))).hexdigest(),
+                         "d8c9dd54a6079602")
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            mac.new(b"short")
+        with self.assertRaises(ValueError):
+            mac.new(KEY, endian="@")
+
+
+if __name__ == "__main__":
+    unittest.main()
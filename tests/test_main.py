@@ -0,0 +1,197 @@
+"""
+Test the command line interface.
+"""
+
+import binascii
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import xtea
+from xtea import MODE_CBC, MODE_CFB, MODE_CTR, MODE_ECB, MODE_OFB
+from xtea import PADDING_ISO7816, PADDING_PKCS7
+from xtea.__main__ import main
+from xtea.counter import Counter
+
+try:
+    from unittest import mock
+except ImportError:  # Python 2
+    mock = None
+
+# pylint: disable=missing-function-docstring
+
+KEY = os.urandom(16)
+IV = os.urandom(8)
+ENV = {"XTEA_KEY": binascii.hexlify(KEY).decode()}
+
+MODES = {"ecb": MODE_ECB, "cbc": MODE_CBC, "cfb": MODE_CFB,
+         "ofb": MODE_OFB, "ctr": MODE_CTR}
+
+
+@unittest.skipIf(mock is None, "unittest.mock is not available")
+class TestMain(unittest.TestCase):
+    """
+    Encrypt and decrypt files with the command line interface.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _path(self, name, data=None):
+        path = os.path.join(self.directory, name)
+        if data is not None:
+            with open(path, "wb") as file:
+                file.write(data)
+        return path
+
+    def _read(self, name):
+        with open(self._path(name), "rb") as file:
+            return file.read()
+
+    def _main(self, *argv):
+        with mock.patch.dict(os.environ, ENV):
+            return main(list(argv) + ["-q"])
+
+    def test_modes(self):
+        data = os.urandom(8 * 1000)
+        source = self._path("plain", data)
+        for name, mode in MODES.items():
+            self.assertEqual(self._main(
+                "encrypt", "-m", name, "-i", source, "-o",
+                self._path("encrypted"), "--iv", binascii.hexlify(IV).decode(),
+                "--chunk-size", "1000"), 0)
+            padding = PADDING_PKCS7 if mode in (MODE_ECB, MODE_CBC) else None
+            cipher = xtea.new(KEY, mode=mode, IV=IV, counter=Counter(IV),
+                              padding=padding)
+            self.assertEqual(self._read("encrypted"), cipher.encrypt(data))
+
+    def test_round_trip(self):
+        data = os.urandom(12345)
+        source = self._path("plain", data)
+        for name in ("ctr", "ofb", "cfb"):
+            self._main("encrypt", "-m", name, "-i", source,
+                       "-o", self._path("encrypted"), "--chunk-size", "1K")
+            self.assertEqual(len(self._read("encrypted")), len(data) + 8)
+            self._main("decrypt", "-m", name, "-i", self._path("encrypted"),
+                       "-o", self._path("decrypted"))
+            self.assertEqual(self._read("decrypted"), data)
+
+    def test_workers(self):
+        data = os.urandom(3 << 18)
+        source = self._path("plain", data)
+        self._main("encrypt", "-m", "cbc", "-i", source,
+                   "-o", self._path("encrypted"))
+        self._main("decrypt", "-m", "cbc", "-j", "3",
+                   "-i", self._path("encrypted"), "-o", self._path("out"))
+        self.assertEqual(self._read("out"), data)
+
+    def test_key_file(self):
+        data = os.urandom(64)
+        for content in (KEY, binascii.hexlify(KEY) + b"\n"):
+            key_file = self._path("key", content)
+            self.assertEqual(main(
+                ["encrypt", "-m", "ecb", "-q", "--key-file", key_file,
+                 "-i", self._path("plain", data), "-o",
+                 self._path("encrypted"), "--key-env", "XTEA_MISSING"]), 0)
+            self.assertEqual(self._read("encrypted"), xtea.new(
+                KEY, mode=MODE_ECB, padding=PADDING_PKCS7).encrypt(data))
+
+    def test_padding(self):
+        for length in (0, 7, 8, 12345):
+            data = os.urandom(length)
+            source = self._path("plain", data)
+            for name in ("ecb", "cbc"):
+                for padding in ("pkcs7", "iso7816"):
+                    self._main("encrypt", "-m", name, "--padding", padding,
+                               "-i", source, "-o", self._path("encrypted"),
+                               "--chunk-size", "1K")
+                    self._main("decrypt", "-m", name, "--padding", padding,
+                               "-i", self._path("encrypted"),
+                               "-o", self._path("decrypted"),
+                               "--chunk-size", "1K")
+                    self.assertEqual(self._read("decrypted"), data)
+
+        self._main("encrypt", "-m", "cbc", "--padding", "iso7816",
+                   "-i", source, "-o", self._path("encrypted"),
+                   "--iv", binascii.hexlify(IV).decode())
+        self.assertEqual(self._read("encrypted"), xtea.new(
+            KEY, mode=MODE_CBC, IV=IV, padding=PADDING_ISO7816).encrypt(data))
+
+    def test_failed_output(self):
+        output = self._path("out", b"previous")
+        with mock.patch("sys.stderr"):
+            self.assertEqual(self._main(
+                "decrypt", "-m", "ecb", "-i", self._path("plain", b"1" * 16),
+                "-o", output), 1)
+        self.assertEqual(self._read("out"), b"previous")
+        self.assertEqual(sorted(os.listdir(self.directory)), ["out", "plain"])
+
+    def test_iv_env(self):
+        data = os.urandom(64)
+        with mock.patch.dict(os.environ,
+                             {"IV": binascii.hexlify(IV).decode()}):
+            self._main("encrypt", "-m", "ofb", "--iv-env", "IV",
+                       "-i", self._path("plain", data),
+                       "-o", self._path("encrypted"))
+        self.assertEqual(self._read("encrypted"), xtea.new(
+            KEY, mode=MODE_OFB, IV=IV).encrypt(data))
+
+    def test_errors(self):
+        source = self._path("plain", b"1234567")
+        output = self._path("out")
+        with mock.patch("sys.stderr"):
+            self.assertEqual(main(["encrypt", "-i", source, "-o", output,
+                                   "--key-env", "XTEA_MISSING"]), 1)
+            self.assertEqual(self._main("encrypt", "-m", "ecb",
+                                        "--padding", "none",
+                                        "-i", source, "-o", output), 1)
+            with self.assertRaises(SystemExit):
+                self._main("encrypt", "--padding", "pkcs7", "-i", source)
+            self.assertEqual(self._main("decrypt", "-i", source,
+                                        "-o", output), 1)
+            with mock.patch.dict(os.environ, {"XTEA_KEY": "abc"}):
+                self.assertEqual(main(["encrypt", "-i", source,
+                                       "-o", output]), 1)
+
+    def test_invalid_options(self):
+        source = self._path("plain", b"hello")
+        with mock.patch("sys.stderr"):
+            for option in (["-m", "cfb", "--segment-size", "12"],
+                           ["-m", "cfb", "--segment-size", "72"],
+                           ["--rounds", "-3"]):
+                with self.assertRaises(SystemExit) as context:
+                    self._main("encrypt", "-i", source, *option)
+                self.assertEqual(context.exception.code, 2)
+
+    def test_no_iv_on_error(self):
+        stdout = mock.Mock(buffer=io.BytesIO())
+        with mock.patch("sys.stderr"), mock.patch("sys.stdout", stdout), \
+                mock.patch("xtea.new", side_effect=ValueError("Invalid")):
+            self.assertEqual(self._main("encrypt", "-i",
+                                        self._path("plain", b"hello")), 1)
+        self.assertEqual(stdout.buffer.getvalue(), b"")
+
+    def test_pipe(self):
+        data = os.urandom(5000)
+        env = dict(os.environ, **ENV)
+        env["PYTHONPATH"] = os.pathsep.join(p for p in sys.path if p)
+        encrypted = subprocess.check_output(
+            [sys.executable, "-m", "xtea", "encrypt"], input=data, env=env,
+            stderr=subprocess.PIPE)
+        process = subprocess.run(
+            [sys.executable, "-m", "xtea", "decrypt"], input=encrypted,
+            env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            check=True)
+        self.assertEqual(process.stdout, data)
+        self.assertIn(b"decrypted 5000 bytes", process.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+"""
+Test that the C extension does not leak objects per block.
+"""
+
+import os
+import sys
+import unittest
+
+import xtea
+from xtea import MODE_CBC
+
+# pylint: disable=missing-function-docstring
+
+BLOCKS = 1 << 20
+
+
+@unittest.skipIf(xtea._xtea is None, "C extension not available")
+@unittest.skipUnless(hasattr(sys, "getallocatedblocks"), "CPython only")
+class TestMemory(unittest.TestCase):
+    """
+    The amount of allocated memory blocks must stay flat.
+    """
+
+    def _assert_flat(self, func, *args):
+        func(*args)  # Warm up caches
+        before = sys.getallocatedblocks()
+        for _ in range(BLOCKS):
+            func(*args)
+        self.assertLess(sys.getallocatedblocks() - before, 1000)
+
+    def test_int(self):
+        key, block = (1, 2, 3, 0xffffffff), (0xdeadbeef, 0xcafebabe)
+        self._assert_flat(xtea._xtea.encrypt_int, key, block)
+        self._assert_flat(xtea._xtea.decrypt_int, key, block)
+
+    def test_block_bytes(self):
+        schedule = xtea._xtea.key_schedule((1, 2, 3, 4))
+        self._assert_flat(xtea._xtea.encrypt_block_bytes, schedule,
+                          b"12345678")
+        self._assert_flat(xtea._xtea.decrypt_block_bytes, schedule,
+                          b"12345678", False)
+
+    def test_cipher(self):
+        cipher = xtea.new(os.urandom(16), mode=MODE_CBC, IV=os.urandom(8))
+        self._assert_flat(cipher.encrypt_block, None, b"12345678")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+"""
+Test the instrumentation.
+"""
+
+import os
+import threading
+import time
+import unittest
+
+import xtea
+from xtea import MODE_CBC, MODE_CFB, MODE_CTR, metrics
+from xtea.counter import Counter
+
+# pylint: disable=missing-function-docstring
+
+IV = os.urandom(8)
+
+
+def _cipher(mode, **kwargs):
+    return xtea.new(os.urandom(16), mode=mode, IV=IV,
+                    counter=Counter(IV), **kwargs)
+
+
+class TestMetrics(unittest.TestCase):
+    """
+    Test counters, timings and hooks.
+    """
+
+    def setUp(self):
+        metrics.reset()
+        metrics.enable()
+
+    def tearDown(self):
+        metrics.disable()
+        metrics.reset()
+
+    def test_counters(self):
+        cipher = _cipher(MODE_CBC)
+        cipher.encrypt(os.urandom(64))
+        cipher.decrypt(os.urandom(16))
+
+        for stats in (cipher.stats, metrics.totals):
+            self.assertEqual(stats.calls, {"cbc": 2})
+            self.assertEqual(stats.bytes, 80)
+            self.assertEqual(stats.blocks, 10)
+            self.assertGreater(stats.time["key_setup"], 0)
+
+    def test_segment_phases(self):
+        cipher = _cipher(MODE_CFB, segment_size=8)
+        cipher.encrypt(os.urandom(5))
+        self.assertEqual(cipher.stats.blocks, 5)
+        self.assertGreater(cipher.stats.time["engine"], 0)
+        self.assertGreater(cipher.stats.time["mode"], 0)
+
+    def test_block_phase(self):
+        cipher = _cipher(MODE_CBC)
+        cipher.encrypt_block(cipher.key, IV)
+        self.assertEqual(cipher.stats.blocks, 1)
+        self.assertGreater(cipher.stats.time["block"], 0)
+
+    def test_threads(self):
+        cipher, started, done = _cipher(MODE_CBC), threading.Event(), []
+
+        def call():
+            started.set()
+            time.sleep(0.1)
+
+        def other():
+            started.wait()
+            metrics.timed(cipher, "block", 0, time.sleep, 0.05)
+            done.append(True)
+
+        thread = threading.Thread(target=other)
+        thread.start()
+        metrics.record(cipher, False, 0, call)
+        thread.join()
+        # The other thread's phase is not subtracted from this call
+        self.assertTrue(done)
+        self.assertGreater(cipher.stats.time["mode"], 0.09)
+
+    def test_hook(self):
+        events = []
+        metrics.add_hook(events.append)
+        try:
+            cipher = _cipher(MODE_CTR)
+            cipher.decrypt_into(b"123", bytearray(3))
+        finally:
+            metrics.remove_hook(events.append)
+
+        self.assertEqual(len(events), 1)
+        self.assertIs(events[0]["cipher"], cipher)
+        self.assertEqual(events[0]["operation"], "decrypt")
+        self.assertEqual(events[0]["mode"], "ctr")
+        self.assertEqual(events[0]["bytes"], 3)
+
+    def test_disabled(self):
+        metrics.disable()
+        cipher = _cipher(MODE_CTR)
+        cipher.encrypt(b"1234")
+        self.assertIsNone(cipher.stats)
+        self.assertEqual(metrics.totals.bytes, 0)
+
+    def test_engine_info(self):
+        info = xtea.engine_info()
+        self.assertIn(info["engine"], ("c", "numpy", "python"))
+        self.assertEqual(info["releases_gil"],
+                         xtea._xtea is not None)  # pylint: disable=W0212
+        self.assertIn("ctr", info["bulk_functions"])
+        self.assertTrue(info["metrics"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+"""
+Test in-place file encryption.
+"""
+
+import mmap
+import os
+import tempfile
+import unittest
+
+import xtea
+from xtea import MODE_CBC, MODE_CFB, MODE_CTR, MODE_ECB, MODE_OFB
+from xtea.counter import Counter
+from xtea.mmapio import encrypt_file_inplace, decrypt_file_inplace
+
+# pylint: disable=missing-function-docstring
+
+KEY = os.urandom(16)
+IV = os.urandom(8)
+NONCE = os.urandom(8)
+
+
+def _cipher(mode):
+    return xtea.new(KEY, mode=mode, IV=IV, counter=Counter(NONCE),
+                    segment_size=64)
+
+
+class TestInplace(unittest.TestCase):
+    """
+    Compare in-place results with a single call.
+    """
+
+    data = os.urandom(2 * mmap.ALLOCATIONGRANULARITY + 8 * 3)
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp()
+        os.write(handle, self.data)
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def _read(self):
+        with open(self.path, "rb") as file:
+            return file.read()
+
+    def test_modes(self):
+        for mode in (MODE_ECB, MODE_CBC, MODE_CFB, MODE_OFB, MODE_CTR):
+            self.assertEqual(
+                encrypt_file_inplace(self.path, _cipher(mode), window_size=1),
+                len(self.data))
+            self.assertEqual(self._read(), _cipher(mode).encrypt(self.data))
+
+            decrypt_file_inplace(self.path, _cipher(mode))
+            self.assertEqual(self._read(), self.data)
+
+    def test_resume(self):
+        start = mmap.ALLOCATIONGRANULARITY // 8 + 3
+        offset = start * 8
+        for mode in (MODE_ECB, MODE_OFB, MODE_CTR):
+            expected = _cipher(mode).encrypt(self.data)[offset:]
+
+            self.assertEqual(
+                encrypt_file_inplace(self.path, _cipher(mode), start,
+                                     window_size=1),
+                len(self.data) - offset)
+            self.assertEqual(self._read(), self.data[:offset] + expected)
+
+            decrypt_file_inplace(self.path, _cipher(mode), start)
+            self.assertEqual(self._read(), self.data)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            encrypt_file_inplace(self.path, _cipher(MODE_CBC), 1)
+        with self.assertRaises(ValueError):
+            encrypt_file_inplace(self.path, _cipher(MODE_ECB), 10 ** 9)
+        self.assertEqual(self._read(), self.data)
+
+    def test_empty(self):
+        with open(self.path, "wb"):
+            pass
+        self.assertEqual(encrypt_file_inplace(self.path, _cipher(MODE_CTR)),
+                         0)
+
+
+if __name__ == "__main__":
+    unittest.main()
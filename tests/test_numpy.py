@@ -0,0 +1,119 @@
+"""
+Test the NumPy engine against the pure Python block function.
+"""
+
+import os
+import struct
+import unittest
+
+from xtea import _python
+
+try:
+    from xtea import _numpy
+except ImportError:
+    _numpy = None
+
+# pylint: disable=missing-function-docstring
+
+SCHEDULE = _python.key_schedule(struct.unpack("!4L", os.urandom(16)))
+IV = os.urandom(8)
+
+
+def _blocks(func, data, big_endian=True):
+    fmt = ("!" if big_endian else "<") + "2L"
+    return b"".join(
+        struct.pack(fmt, *func(SCHEDULE, struct.unpack(fmt, data[i:i + 8])))
+        for i in range(0, len(data), 8))
+
+
+def _xor(one, two):
+    return bytes(bytearray(x ^ y for x, y in zip(bytearray(one),
+                                                 bytearray(two))))
+
+
+@unittest.skipIf(_numpy is None, "NumPy not available")
+class TestNumpy(unittest.TestCase):
+    """
+    Test the modes of operation of the NumPy engine.
+    """
+
+    sizes = (0, 8, 8 * 31, 8 * 32, 8 * 100)
+
+    def test_ecb(self):
+        for size in self.sizes:
+            for big_endian in (True, False):
+                data = os.urandom(size)
+                encrypted = _numpy.ecb_encrypt(SCHEDULE, data, big_endian)
+                self.assertEqual(
+                    encrypted,
+                    _blocks(_python.encipher, data, big_endian))
+                self.assertEqual(
+                    _numpy.ecb_decrypt(SCHEDULE, encrypted, big_endian),
+                    data)
+
+    def test_cbc_decrypt(self):
+        for size in self.sizes:
+            data = os.urandom(size)
+            plain, iv = _numpy.cbc_decrypt(SCHEDULE, IV, data)
+            chain = IV + data[:-8]
+            self.assertEqual(plain,
+                             _xor(_blocks(_python.decipher, data), chain))
+            self.assertEqual(iv, (IV + data)[-8:])
+
+    def test_cfb_decrypt(self):
+        for size in self.sizes:
+            data = os.urandom(size)
+            plain, iv = _numpy.cfb_decrypt(SCHEDULE, IV, data)
+            chain = IV + data[:-8]
+            self.assertEqual(plain,
+                             _xor(_blocks(_python.encipher, chain), data))
+            self.assertEqual(iv, (IV + data)[-8:])
+
+    def test_cfb_segment_decrypt(self):
+        for segment_size in (8, 24, 64):
+            for size in self.sizes:
+                data = os.urandom(size // 8 * segment_size // 8)
+                encrypted, iv = _python.cfb_segment_encrypt(
+                    SCHEDULE, IV, segment_size, data)
+                self.assertEqual(_numpy.cfb_segment_decrypt(
+                    SCHEDULE, IV, segment_size, encrypted), (data, iv))
+
+    def test_cfb_segment_chunks(self):
+        self.addCleanup(setattr, _numpy, "SEGMENT_CHUNK",
+                        _numpy.SEGMENT_CHUNK)
+        _numpy.SEGMENT_CHUNK = 7
+        for segment_size in (8, 16, 64):
+            data = os.urandom(segment_size // 8 * 50)
+            encrypted, iv = _python.cfb_segment_encrypt(
+                SCHEDULE, IV, segment_size, data)
+            self.assertEqual(_numpy.cfb_segment_decrypt(
+                SCHEDULE, IV, segment_size, encrypted), (data, iv))
+
+    def test_ctr(self):
+        counters = os.urandom(8 * 40)
+        keystream = _blocks(_python.encipher, counters)
+        data = os.urandom(320)
+
+        out, block, used, rest = [], IV, 8, data
+        for size in (1, 7, 3, 250, 0, 59):
+            offset = len(data) - len(rest) + 8 - used
+            result, block, used = _numpy.ctr(
+                SCHEDULE, block, used, counters[offset:], rest[:size])
+            out.append(result)
+            rest = rest[size:]
+
+        self.assertEqual(b"".join(out), _xor(data, keystream))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            _numpy.ecb_encrypt(SCHEDULE, b"1234567")
+        with self.assertRaises(ValueError):
+            _numpy.cbc_decrypt(SCHEDULE, b"1234567", b"12345678")
+        with self.assertRaises(ValueError):
+            _numpy.ctr(SCHEDULE, IV, 8, b"", b"1")
+        with self.assertRaises(ValueError):
+            _numpy.cfb_segment_decrypt(SCHEDULE, IV, 16, b"123")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+"""
+Test the padding schemes and padded cipher objects.
+"""
+
+import os
+import unittest
+
+import xtea
+from xtea import MODE_CBC, MODE_CTR, MODE_ECB
+from xtea import PADDING_ISO7816, PADDING_PKCS7, PADDING_ZERO
+from xtea.padding import final_block, unpad
+
+# pylint: disable=missing-function-docstring
+
+KEY = os.urandom(16)
+IV = os.urandom(8)
+SCHEMES = (PADDING_PKCS7, PADDING_ISO7816, PADDING_ZERO)
+
+
+def _message(length, scheme):
+    data = os.urandom(length)
+    if scheme == PADDING_ZERO:  # Trailing zero bytes would be removed
+        data = data[:-1] + b"\1" if data else data
+    return data
+
+
+class TestSchemes(unittest.TestCase):
+    """
+    Test the padding functions.
+    """
+
+    def test_final_block(self):
+        self.assertEqual(final_block(b"abc"), b"abc\5\5\5\5\5")
+        self.assertEqual(final_block(b""), b"\x08" * 8)
+        self.assertEqual(final_block(b"abc", PADDING_ISO7816),
+                         b"abc\x80\0\0\0\0")
+        self.assertEqual(final_block(b"", PADDING_ISO7816),
+                         b"\x80" + b"\0" * 7)
+        self.assertEqual(final_block(b"abc", PADDING_ZERO), b"abc\0\0\0\0\0")
+        self.assertEqual(final_block(b"", PADDING_ZERO), b"")
+
+    def test_unpad(self):
+        for scheme in SCHEMES:
+            for length in range(20):
+                data = _message(length, scheme)
+                aligned = length - length % 8
+                padded = data[:aligned] + final_block(data[aligned:], scheme)
+                result = unpad(padded, scheme)
+                self.assertIsInstance(result, memoryview)
+                self.assertEqual(result.tobytes(), data)
+
+    def test_invalid(self):
+        for scheme, data in ((PADDING_PKCS7, b""),
+                             (PADDING_PKCS7, b"1234567\0"),
+                             (PADDING_PKCS7, b"1234567\x09"),
+                             (PADDING_PKCS7, b"123456\3\3"),
+                             (PADDING_PKCS7, b"1234567"),
+                             (PADDING_ISO7816, b""),
+                             (PADDING_ISO7816, b"\0" * 8),
+                             (PADDING_ISO7816, b"1234567\1"),
+                             (PADDING_ZERO, b"123")):
+            with self.assertRaises(ValueError):
+                unpad(data, scheme)
+        with self.assertRaises(ValueError):
+            final_block(b"12345678")
+        with self.assertRaises(ValueError):
+            final_block(b"", "pkcs7")
+
+
+class TestCipher(unittest.TestCase):
+    """
+    Compare padded cipher objects with padding applied by hand.
+    """
+
+    def test_modes(self):
+        for mode in (MODE_ECB, MODE_CBC):
+            for scheme in SCHEMES:
+                for length in (0, 1, 7, 8, 9, 16, 100, 1003):
+                    data = _message(length, scheme)
+                    aligned = length - length % 8
+                    expected = xtea.new(KEY, mode=mode, IV=IV).encrypt(
+                        data[:aligned] + final_block(data[aligned:], scheme))
+
+                    cipher = xtea.new(KEY, mode=mode, IV=IV, padding=scheme)
+                    self.assertEqual(cipher.encrypt(data), expected)
+                    cipher = xtea.new(KEY, mode=mode, IV=IV, padding=scheme)
+                    result = cipher.decrypt(expected)
+                    self.assertIsInstance(result, memoryview)
+                    self.assertEqual(result.tobytes(), data)
+
+    def test_into(self):
+        data = os.urandom(21)
+        expected = xtea.new(KEY, mode=MODE_CBC, IV=IV,
+                            padding=PADDING_PKCS7).encrypt(data)
+
+        cipher = xtea.new(KEY, mode=MODE_CBC, IV=IV, padding=PADDING_PKCS7)
+        out = bytearray(len(expected))
+        self.assertEqual(cipher.encrypt_into(data, out), len(expected))
+        self.assertEqual(bytes(out), expected)
+
+        cipher = xtea.new(KEY, mode=MODE_CBC, IV=IV, padding=PADDING_PKCS7)
+        self.assertEqual(cipher.decrypt_into(out, out), len(data))
+        self.assertEqual(bytes(out[:len(data)]), data)
+
+    def test_little_endian(self):
+        data = os.urandom(13)
+        for endian in ("<", ">"):
+            cipher = xtea.new(KEY, mode=MODE_CBC, IV=IV, endian=endian,
+                              padding=PADDING_ISO7816)
+            encrypted = cipher.encrypt(data)
+            cipher = xtea.new(KEY, mode=MODE_CBC, IV=IV, endian=endian,
+                              padding=PADDING_ISO7816)
+            self.assertEqual(cipher.decrypt(encrypted).tobytes(), data)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            xtea.new(KEY, mode=MODE_CTR, counter=lambda: IV,
+                     padding=PADDING_PKCS7)
+        with self.assertRaises(ValueError):
+            xtea.new(KEY, mode=MODE_ECB, padding="pkcs7")
+        cipher = xtea.new(KEY, mode=MODE_ECB, padding=PADDING_PKCS7)
+        with self.assertRaises(ValueError):
+            cipher.decrypt(b"1234567")
+        with self.assertRaises(ValueError):
+            cipher.decrypt(xtea.new(KEY, mode=MODE_ECB).encrypt(b"1" * 8))
+        with self.assertRaises(ValueError):
+            xtea.encrypt_many(KEY, MODE_ECB, [(None, b"1")],
+                              padding=PADDING_PKCS7)
+
+
+if __name__ == "__main__":
+    unittest.main()
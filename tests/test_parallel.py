@@ -0,0 +1,96 @@
+"""
+Test encryption with multiple workers.
+"""
+
+import os
+import unittest
+
+import xtea
+from xtea import MODE_CBC, MODE_CFB, MODE_CTR, MODE_ECB, MODE_OFB
+from xtea.counter import Counter
+
+try:
+    from unittest import mock
+    from xtea import parallel
+except ImportError:  # Python 2
+    mock = parallel = None
+
+# pylint: disable=missing-function-docstring
+
+KEY = os.urandom(16)
+IV = os.urandom(8)
+NONCE = os.urandom(8)
+
+
+def _cipher(mode, counter=None):
+    return xtea.new(KEY, mode=mode, IV=IV, counter=counter or Counter(NONCE),
+                    segment_size=64)
+
+
+@unittest.skipIf(parallel is None, "xtea.parallel requires Python 3")
+class TestParallel(unittest.TestCase):
+    """
+    Compare the sharded results with a single call.
+    """
+
+    data = os.urandom(8 * 101)
+
+    @classmethod
+    def tearDownClass(cls):
+        parallel.shutdown()
+
+    def setUp(self):
+        patcher = mock.patch.object(parallel, "MIN_SHARD_SIZE", 64)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _compare(self, mode, data, decrypt=False):
+        cipher, reference = _cipher(mode), _cipher(mode)
+        if decrypt:
+            result = parallel.decrypt(cipher, data, workers=3)
+            expected = reference.decrypt(data)
+        else:
+            result = parallel.encrypt(cipher, data, workers=3)
+            expected = reference.encrypt(data)
+        self.assertEqual(result, expected)
+
+        # The state must continue like the reference
+        more = os.urandom(8 * 5)
+        func = cipher.decrypt if decrypt else cipher.encrypt
+        self.assertEqual(func(more), (reference.decrypt if decrypt
+                                      else reference.encrypt)(more))
+
+    def test_modes(self):
+        for mode in (MODE_ECB, MODE_CBC, MODE_CFB, MODE_OFB, MODE_CTR):
+            for decrypt in (False, True):
+                self._compare(mode, self.data, decrypt)
+
+    def test_ctr_unaligned(self):
+        cipher, reference = _cipher(MODE_CTR), _cipher(MODE_CTR)
+        self.assertEqual(cipher.encrypt(b"abc"), reference.encrypt(b"abc"))
+        data = os.urandom(8 * 100 + 3)
+        self.assertEqual(parallel.encrypt(cipher, data, workers=4),
+                         reference.encrypt(data))
+        self.assertEqual(cipher.encrypt(b"12345"), reference.encrypt(b"12345"))
+
+    def test_ctr_callable(self):
+        def counter():
+            values = iter(range(1000))
+            return lambda: b"%08d" % next(values)
+
+        cipher, reference = (_cipher(MODE_CTR, counter()),
+                             _cipher(MODE_CTR, counter()))
+        self.assertEqual(parallel.encrypt(cipher, self.data, workers=3),
+                         reference.encrypt(self.data))
+
+    def test_invalid_length(self):
+        with self.assertRaises(ValueError):
+            parallel.encrypt(_cipher(MODE_ECB), self.data[:-1], workers=3)
+
+    def test_single_worker(self):
+        self.assertEqual(parallel.encrypt(_cipher(MODE_ECB), self.data, 1),
+                         _cipher(MODE_ECB).encrypt(self.data))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+"""
+Test the background keystream generation.
+"""
+
+import os
+import time
+import unittest
+
+import xtea
+from xtea import MODE_CBC, MODE_CTR, MODE_OFB
+from xtea.counter import Counter
+from xtea.prefetch import KeystreamPrefetcher
+
+# pylint: disable=missing-function-docstring
+
+KEY = os.urandom(16)
+IV = os.urandom(8)
+
+
+def _cipher(mode, iv=IV):
+    return xtea.new(KEY, mode=mode, IV=iv, counter=Counter(iv))
+
+
+def _wait_full(prefetcher):
+    limit = prefetcher.depth * prefetcher.chunk_size
+    deadline = time.time() + 10
+    while prefetcher.buffered < limit and time.time() < deadline:
+        time.sleep(0.001)
+    return prefetcher.buffered
+
+
+class TestPrefetcher(unittest.TestCase):
+    """
+    The prefetched keystream gives the results of the cipher.
+    """
+
+    def _compare(self, mode, chunks, **kwargs):
+        data = os.urandom(sum(chunks))
+        expected = _cipher(mode).encrypt(data)
+        with KeystreamPrefetcher(_cipher(mode), **kwargs) as prefetcher:
+            out, rest = [], data
+            for size in chunks:
+                out.append(prefetcher.encrypt(rest[:size]))
+                rest = rest[size:]
+        self.assertEqual(b"".join(out), expected)
+
+    def test_modes(self):
+        for mode in (MODE_OFB, MODE_CTR):
+            self._compare(mode, (1, 7, 0, 100, 4096, 5000, 3),
+                          depth=2, chunk_size=64)
+
+    def test_default(self):
+        self._compare(MODE_CTR, (1 << 16, 17, 1 << 12))
+
+    def test_ready(self):
+        data = os.urandom(1000)
+        with KeystreamPrefetcher(_cipher(MODE_OFB), depth=4,
+                                 chunk_size=256) as prefetcher:
+            self.assertEqual(_wait_full(prefetcher), 1024)
+            self.assertEqual(prefetcher.decrypt(data),
+                             _cipher(MODE_OFB).decrypt(data))
+
+    def test_bounded(self):
+        with KeystreamPrefetcher(_cipher(MODE_CTR), depth=3,
+                                 chunk_size=100) as prefetcher:
+            _wait_full(prefetcher)
+            time.sleep(0.01)
+            self.assertEqual(prefetcher.buffered, 300)
+
+    def test_reset(self):
+        other = os.urandom(8)
+        data = os.urandom(300)
+        with KeystreamPrefetcher(_cipher(MODE_CTR), depth=4,
+                                 chunk_size=64) as prefetcher:
+            _wait_full(prefetcher)
+            prefetcher.encrypt(data[:10])
+            prefetcher.reset(_cipher(MODE_CTR, other))
+            self.assertEqual(prefetcher.encrypt(data),
+                             _cipher(MODE_CTR, other).encrypt(data))
+
+    def test_closed(self):
+        data = os.urandom(100)
+        prefetcher = KeystreamPrefetcher(_cipher(MODE_OFB), chunk_size=8)
+        prefetcher.close()
+        self.assertEqual(prefetcher.encrypt(data),
+                         _cipher(MODE_OFB).encrypt(data))
+
+    def test_invalid(self):
+        with self.assertRaises(TypeError):
+            KeystreamPrefetcher(_cipher(MODE_CBC))
+        with self.assertRaises(ValueError):
+            KeystreamPrefetcher(_cipher(MODE_CTR), depth=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
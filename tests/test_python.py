@@ -0,0 +1,119 @@
+"""
+Test the generated block functions of the pure Python implementation.
+"""
+
+import os
+import struct
+import unittest
+
+from pep272_encryption import PEP272Cipher
+
+import xtea
+
+from xtea import _python
+
+# pylint: disable=missing-function-docstring,protected-access
+
+KEY = struct.unpack("!4L", os.urandom(16))
+
+
+class TestGenerated(unittest.TestCase):
+    """
+    The unrolled functions match the loop over the rounds.
+    """
+
+    def test_vector(self):
+        schedule = _python.key_schedule(
+            (0x27f917b1, 0xc1da8993, 0x60e2acaa, 0xa6eb923d))
+        self.assertEqual(_python.encipher(schedule, (0xaf20a390, 0x547571aa)),
+                         (0xd26428af, 0x0a202283))
+        self.assertEqual(_python.decipher(schedule, (0xd26428af, 0x0a202283)),
+                         (0xaf20a390, 0x547571aa))
+
+    def test_cycles(self):
+        block = struct.unpack("!2L", os.urandom(8))
+        for cycles in (0, 1, 8, 32, 33, _python.UNROLL_LIMIT + 1):
+            schedule = _python.key_schedule(KEY, cycles)
+            encrypted = _python.encipher(schedule, block)
+            self.assertEqual(encrypted,
+                             _python._encipher_loop(schedule, *block))
+            self.assertEqual(_python.decipher(schedule, encrypted), block)
+
+    def test_cached(self):
+        one = _python.key_schedule(KEY)
+        two = _python.key_schedule(KEY[::-1])
+        _python.encipher(one, (1, 2))
+        _python.encipher(two, (1, 2))
+        self.assertIs(one.encipher.__code__, two.encipher.__code__)
+        func = one.encipher
+        _python.encipher(one, (3, 4))
+        self.assertIs(one.encipher, func)
+
+    def test_sequence(self):
+        schedule = _python.key_schedule(KEY)
+        self.assertEqual(_python.encipher(tuple(schedule), (1, 2)),
+                         _python.encipher(schedule, (1, 2)))
+
+
+class TestBlockModes(unittest.TestCase):
+    """
+    ECB, CBC and CFB match the block-by-block modes of the cipher objects.
+    """
+
+    def test_modes(self):
+        key, iv = struct.pack("!4L", *KEY), os.urandom(8)
+        schedule = _python.key_schedule(KEY)
+        data = os.urandom(8 * 11)
+        for mode, name in ((xtea.MODE_ECB, "ecb"), (xtea.MODE_CBC, "cbc"),
+                           (xtea.MODE_CFB, "cfb")):
+            cipher = xtea.new(key, mode=mode, IV=iv, segment_size=64)
+            expected = PEP272Cipher.encrypt(cipher, data)
+            encrypt = getattr(_python, name + "_encrypt")
+            decrypt = getattr(_python, name + "_decrypt")
+            if mode == xtea.MODE_ECB:
+                self.assertEqual(encrypt(schedule, memoryview(data)),
+                                 expected)
+                self.assertEqual(decrypt(schedule, expected), data)
+            else:
+                self.assertEqual(encrypt(schedule, iv, memoryview(data)),
+                                 (expected, expected[-8:]))
+                self.assertEqual(decrypt(schedule, iv, expected),
+                                 (data, expected[-8:]))
+
+    def test_invalid(self):
+        schedule = _python.key_schedule(KEY)
+        with self.assertRaises(ValueError):
+            _python.ecb_encrypt(schedule, b"1234567")
+        with self.assertRaises(ValueError):
+            _python.cbc_decrypt(schedule, b"1234567", b"12345678")
+
+
+class TestSegments(unittest.TestCase):
+    """
+    CFB with a shift register matches the cipher objects.
+    """
+
+    def test_modes(self):
+        key = struct.pack("!4L", *KEY)
+        schedule = _python.key_schedule(KEY)
+        iv = os.urandom(8)
+        for segment_size in (8, 24, 64):
+            data = os.urandom(segment_size // 8 * 11)
+            cipher = xtea.new(key, mode=xtea.MODE_CFB, IV=iv,
+                              segment_size=segment_size)
+            expected = cipher.encrypt(data)
+            self.assertEqual(_python.cfb_segment_encrypt(
+                schedule, iv, segment_size, data), (expected, cipher._status))
+            self.assertEqual(_python.cfb_segment_decrypt(
+                schedule, iv, segment_size, expected), (data, cipher._status))
+
+    def test_invalid(self):
+        schedule = _python.key_schedule(KEY)
+        for segment_size, data in ((12, b"123"), (72, b""), (16, b"123")):
+            with self.assertRaises(ValueError):
+                _python.cfb_segment_encrypt(schedule, b"12345678",
+                                            segment_size, data)
+
+
+if __name__ == "__main__":
+    unittest.main()
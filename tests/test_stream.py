@@ -0,0 +1,165 @@
+"""
+Test the stream wrappers.
+"""
+
+import io
+import os
+import unittest
+
+import xtea
+from xtea import MODE_CBC, MODE_CFB, MODE_CTR, MODE_ECB, MODE_OFB
+from xtea.counter import Counter
+from xtea.stream import (
+    EncryptingReader, EncryptingWriter, encrypt_file, decrypt_file)
+
+# pylint: disable=missing-function-docstring
+
+KEY = os.urandom(16)
+IV = os.urandom(8)
+NONCE = os.urandom(8)
+MODES = (MODE_ECB, MODE_CBC, MODE_CFB, MODE_OFB, MODE_CTR)
+
+
+def _cipher(mode):
+    return xtea.new(KEY, mode=mode, IV=IV, counter=Counter(NONCE),
+                    segment_size=16)
+
+
+class _ReadOnly(object):
+    """A stream without readinto."""
+
+    def __init__(self, data):
+        self.stream = io.BytesIO(data)
+
+    def read(self, size):
+        return self.stream.read(size)
+
+
+class TestStream(unittest.TestCase):
+    """
+    Compare streamed results with a single call.
+    """
+
+    data = os.urandom(8 * 1001)
+
+    def test_encrypt_file(self):
+        for mode in MODES:
+            for chunk_size in (1, 5, 8, 1000, 1 << 20):
+                out = io.BytesIO()
+                self.assertEqual(
+                    encrypt_file(io.BytesIO(self.data), out, _cipher(mode),
+                                 chunk_size=chunk_size),
+                    len(self.data))
+                self.assertEqual(out.getvalue(),
+                                 _cipher(mode).encrypt(self.data))
+
+    def test_decrypt_file(self):
+        for mode in MODES:
+            out = io.BytesIO()
+            decrypt_file(io.BytesIO(_cipher(mode).encrypt(self.data)), out,
+                         _cipher(mode), chunk_size=999)
+            self.assertEqual(out.getvalue(), self.data)
+
+    def test_reader(self):
+        for mode in MODES:
+            reader = EncryptingReader(_ReadOnly(self.data), _cipher(mode))
+            out = b"".join(iter(lambda: reader.read(3), b""))
+            self.assertEqual(out, _cipher(mode).encrypt(self.data))
+
+    def test_buffered_reader(self):
+        reader = io.BufferedReader(
+            EncryptingReader(io.BytesIO(self.data), _cipher(MODE_CBC)))
+        self.assertEqual(reader.read(5) + reader.read(),
+                         _cipher(MODE_CBC).encrypt(self.data))
+
+    def test_writer(self):
+        for mode in MODES:
+            out = io.BytesIO()
+            writer = EncryptingWriter(out, _cipher(mode), closefd=False)
+            for i in range(0, len(self.data), 7):
+                writer.write(self.data[i:i + 7])
+            writer.close()
+            self.assertEqual(out.getvalue(), _cipher(mode).encrypt(self.data))
+
+    def test_closefd(self):
+        raw = io.BytesIO()
+        EncryptingWriter(raw, _cipher(MODE_OFB)).close()
+        self.assertTrue(raw.closed)
+
+        raw = io.BytesIO()
+        EncryptingReader(raw, _cipher(MODE_OFB), closefd=False).close()
+        self.assertFalse(raw.closed)
+
+    def test_incomplete(self):
+        with self.assertRaises(ValueError):
+            encrypt_file(io.BytesIO(b"123456789"), io.BytesIO(),
+                         _cipher(MODE_CBC))
+
+        writer = EncryptingWriter(io.BytesIO(), _cipher(MODE_ECB))
+        writer.write(b"123")
+        with self.assertRaises(ValueError):
+            writer.close()
+
+
+class TestPadding(unittest.TestCase):
+    """
+    Streams of ciphers with padding are one padded message.
+    """
+
+    def _cipher(self):
+        return xtea.new(KEY, mode=MODE_CBC, IV=IV,
+                        padding=xtea.PADDING_PKCS7)
+
+    def test_files(self):
+        for length in (0, 7, 8, 9, 1000):
+            data = os.urandom(length)
+            expected = self._cipher().encrypt(data)
+            for chunk_size in (8, 16, 24, 4096):
+                encrypted = io.BytesIO()
+                encrypt_file(io.BytesIO(data), encrypted, self._cipher(),
+                             chunk_size=chunk_size)
+                self.assertEqual(encrypted.getvalue(), expected)
+
+                decrypted = io.BytesIO()
+                decrypt_file(io.BytesIO(expected), decrypted, self._cipher(),
+                             chunk_size=chunk_size)
+                self.assertEqual(decrypted.getvalue(), data)
+
+    def test_small_reads(self):
+        data = os.urandom(61)
+        encrypted = self._cipher().encrypt(data)
+        for decrypt, src, expected in ((False, data, encrypted),
+                                       (True, encrypted, data)):
+            reader = EncryptingReader(io.BytesIO(src), self._cipher(),
+                                      decrypt)
+            result, chunk = b"", reader.read(3)
+            while chunk:
+                result += chunk
+                chunk = reader.read(3)
+            self.assertEqual(result, expected)
+            self.assertEqual(reader.read(3), b"")
+
+    def test_writer(self):
+        data = os.urandom(61)
+        encrypted = self._cipher().encrypt(data)
+        for decrypt, src, expected in ((False, data, encrypted),
+                                       (True, encrypted, data)):
+            out = io.BytesIO()
+            writer = EncryptingWriter(out, self._cipher(), decrypt,
+                                      closefd=False)
+            for i in range(0, len(src), 5):
+                writer.write(src[i:i + 5])
+            writer.finish()
+            writer.close()
+            self.assertEqual(out.getvalue(), expected)
+
+    def test_invalid(self):
+        out = io.BytesIO()
+        writer = EncryptingWriter(out, self._cipher(), decrypt=True)
+        writer.write(b"1234567")
+        with self.assertRaises(ValueError):
+            writer.finish()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -107,5 +107,51 @@ class TestModes(unittest.TestCase):
         print("Time: %s" % str(round(time, 3)))
 
 
+class TestRandomAccess(unittest.TestCase):
+    """
+    Test decryption at an offset of a CTR stream.
+    """
+
+    def setUp(self):
+        self.key, self.nonce = os.urandom(16), os.urandom(8)
+        self.plain = os.urandom(1000)
+        self.encrypted = XTEACipher(self.key, mode=MODE_CTR,
+                                    counter=Counter(self.nonce)).encrypt(
+                                        self.plain)
+
+    def test_decrypt_at(self):
+        cipher = XTEACipher(self.key, mode=MODE_CTR,
+                            counter=Counter(self.nonce))
+        for start, end in ((0, 8), (3, 5), (5, 21), (16, 1000), (999, 1000),
+                           (500, 500)):
+            self.assertEqual(
+                cipher.decrypt_at(start, self.encrypted[start:end]),
+                self.plain[start:end])
+
+    def test_state(self):
+        counter = Counter(self.nonce)
+        cipher = XTEACipher(self.key, mode=MODE_CTR, counter=counter)
+        first = cipher.decrypt(self.encrypted[:13])
+        cipher.decrypt_at(800, self.encrypted[800:])
+        self.assertEqual(first + cipher.decrypt(self.encrypted[13:]),
+                         self.plain)
+
+    def test_encrypt_at(self):
+        cipher = XTEACipher(self.key, mode=MODE_CTR,
+                            counter=Counter(self.nonce))
+        self.assertEqual(cipher.encrypt_at(77, self.plain[77:99]),
+                         self.encrypted[77:99])
+
+    def test_invalid(self):
+        cipher = XTEACipher(self.key, mode=MODE_CTR,
+                            counter=Counter(self.nonce))
+        with self.assertRaises(ValueError):
+            cipher.decrypt_at(-1, b"")
+
+        cipher = XTEACipher(self.key, mode=MODE_CTR, counter=lambda: b"")
+        with self.assertRaises(TypeError):
+            cipher.decrypt_at(0, b"")
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,13 +1,17 @@
-//#define PY_SSIZE_T_CLEAN
+#define PY_SSIZE_T_CLEAN
 #include <Python.h>
 #include <stdint.h>
+#include <string.h>
 
 #define DELTA (0x9E3779B9)
 #define DEFAULT_CYCLES (32)
+#define BLOCK_SIZE (8)
+// Schedules are 8 bytes per cycle, this keeps them at 128 MiB or less
+#define MAX_CYCLES (1u << 24)
 
 
 // Signature: *k[4], *k[2], num_cycles
-static PyObject * xtea_encrypt_int(PyObject *self, PyObject *args, PyObject *kwargs) {
+static PyObject * xtea_encrypt_int(PyObject *self, PyObject *args) {
     const uint32_t k[4];
     uint32_t v0, v1, sum=0;
     unsigned int num_cycles = DEFAULT_CYCLES;
@@ -21,10 +25,7 @@ static PyObject * xtea_encrypt_int(PyObject *self, PyObject *args, PyObject *kwa
         sum += DELTA;
         v1 += (((v0 << 4) ^ (v0 >> 5)) + v0) ^ (sum + k[(sum>>11) & 3]);
     }
-    PyObject *v0r = PyLong_FromUnsignedLongLong(v0);
-    PyObject *v1r = PyLong_FromUnsignedLongLong(v1);
-
-    return PyTuple_Pack(2, v0r, v1r);
+    return Py_BuildValue("(kk)", (unsigned long)v0, (unsigned long)v1);
 };
 
 
@@ -45,16 +46,1297 @@ static PyObject* xtea_decrypt_int(PyObject *self, PyObject *args) {
         v0 -= (((v1 << 4) ^ (v1 >> 5)) + v1) ^ (sum + k[sum & 3]);
     }
 
-    PyObject *v0r = PyLong_FromUnsignedLong(v0);
-    PyObject *v1r = PyLong_FromUnsignedLong(v1);
+    return Py_BuildValue("(kk)", (unsigned long)v0, (unsigned long)v1);
+};
+
+
+/*
+ * Key schedule
+ *
+ * The round keys `sum + k[...]` only depend on the key and the number of
+ * cycles, so they are computed once and wrapped in a capsule which the
+ * functions below accept instead of the key.
+ */
+
+#define SCHEDULE_NAME "_xtea.schedule"
+
+typedef struct {
+    unsigned int num_cycles;
+    uint32_t keys[1];  // Two round keys per cycle, 2 * num_cycles in total
+} xtea_schedule;
+
+
+static void free_schedule(PyObject *capsule) {
+    PyMem_Free(PyCapsule_GetPointer(capsule, SCHEDULE_NAME));
+}
+
+
+// Signature: *k[4], num_cycles
+static PyObject *xtea_key_schedule(PyObject *self, PyObject *args) {
+    uint32_t k[4];
+    uint32_t sum = 0;
+    unsigned int num_cycles = DEFAULT_CYCLES;
+    unsigned int i;
+    xtea_schedule *schedule;
+    PyObject *capsule;
+
+    if (!PyArg_ParseTuple(args, "(IIII)|I",
+                          &k[0], &k[1], &k[2], &k[3], &num_cycles)) return NULL;
+
+    if (num_cycles > MAX_CYCLES) {
+        PyErr_SetString(PyExc_ValueError, "Too many cycles");
+        return NULL;
+    }
+
+    schedule = PyMem_Malloc(sizeof(xtea_schedule) + 8 * (size_t)num_cycles);
+    if (schedule == NULL)
+        return PyErr_NoMemory();
+
+    schedule->num_cycles = num_cycles;
+    for (i=0; i < num_cycles; i++) {
+        schedule->keys[2 * i] = sum + k[sum & 3];
+        sum += DELTA;
+        schedule->keys[2 * i + 1] = sum + k[(sum>>11) & 3];
+    }
+
+    capsule = PyCapsule_New(schedule, SCHEDULE_NAME, free_schedule);
+    if (capsule == NULL)
+        PyMem_Free(schedule);
+    return capsule;
+}
+
+
+// Converter for PyArg_ParseTuple's "O&"
+static int get_schedule(PyObject *capsule, const xtea_schedule **schedule) {
+    *schedule = PyCapsule_GetPointer(capsule, SCHEDULE_NAME);
+    return *schedule != NULL;
+}
+
+
+static void encipher(const xtea_schedule *s, uint32_t *v0, uint32_t *v1) {
+    const uint32_t *key = s->keys, *end = s->keys + 2 * s->num_cycles;
+    uint32_t y = *v0, z = *v1;
+
+    for (; key < end; key += 2) {
+        y += (((z << 4) ^ (z >> 5)) + z) ^ key[0];
+        z += (((y << 4) ^ (y >> 5)) + y) ^ key[1];
+    }
+
+    *v0 = y; *v1 = z;
+}
+
+
+static void decipher(const xtea_schedule *s, uint32_t *v0, uint32_t *v1) {
+    const uint32_t *key = s->keys + 2 * s->num_cycles;
+    uint32_t y = *v0, z = *v1;
+
+    for (; key > s->keys; key -= 2) {
+        z -= (((y << 4) ^ (y >> 5)) + y) ^ key[-1];
+        y -= (((z << 4) ^ (z >> 5)) + z) ^ key[-2];
+    }
+
+    *v0 = y; *v1 = z;
+}
+
+
+// Signature: schedule, *v[2]
+static PyObject *xtea_encipher(PyObject *self, PyObject *args) {
+    const xtea_schedule *schedule;
+    uint32_t v0, v1;
+
+    if (!PyArg_ParseTuple(args, "O&(II)",
+                          get_schedule, &schedule, &v0, &v1)) return NULL;
+
+    encipher(schedule, &v0, &v1);
+    return Py_BuildValue("(kk)", (unsigned long)v0, (unsigned long)v1);
+}
+
+
+// Signature: schedule, *v[2]
+static PyObject *xtea_decipher(PyObject *self, PyObject *args) {
+    const xtea_schedule *schedule;
+    uint32_t v0, v1;
+
+    if (!PyArg_ParseTuple(args, "O&(II)",
+                          get_schedule, &schedule, &v0, &v1)) return NULL;
+
+    decipher(schedule, &v0, &v1);
+    return Py_BuildValue("(kk)", (unsigned long)v0, (unsigned long)v1);
+}
+
+
+/*
+ * Bulk operations
+ *
+ * The functions below run a whole mode of operation over a buffer, so only
+ * a single call from Python is needed per encrypt() / decrypt(). Blocks are
+ * converted from bytes with the same endianess struct would use for "2L".
+ *
+ * All loops read a block completely before writing its output, so the
+ * source and destination may point to the same memory.
+ */
+
+typedef struct {
+    const xtea_schedule *schedule;
+    int big_endian;
+} xtea_params;
+
+
+static uint32_t load32(const unsigned char *p, int big_endian) {
+    if (big_endian)
+        return ((uint32_t)p[0] << 24) | ((uint32_t)p[1] << 16) |
+               ((uint32_t)p[2] << 8) | (uint32_t)p[3];
+    return ((uint32_t)p[3] << 24) | ((uint32_t)p[2] << 16) |
+           ((uint32_t)p[1] << 8) | (uint32_t)p[0];
+}
+
+
+static void store32(unsigned char *p, uint32_t v, int big_endian) {
+    if (big_endian) {
+        p[0] = (unsigned char)(v >> 24); p[1] = (unsigned char)(v >> 16);
+        p[2] = (unsigned char)(v >> 8); p[3] = (unsigned char)v;
+    } else {
+        p[3] = (unsigned char)(v >> 24); p[2] = (unsigned char)(v >> 16);
+        p[1] = (unsigned char)(v >> 8); p[0] = (unsigned char)v;
+    }
+}
+
+
+static void encrypt_block(const xtea_params *p,
+                          const unsigned char *in, unsigned char *out) {
+    uint32_t v0 = load32(in, p->big_endian);
+    uint32_t v1 = load32(in + 4, p->big_endian);
+
+    encipher(p->schedule, &v0, &v1);
+
+    store32(out, v0, p->big_endian);
+    store32(out + 4, v1, p->big_endian);
+}
+
+
+static void decrypt_block(const xtea_params *p,
+                          const unsigned char *in, unsigned char *out) {
+    uint32_t v0 = load32(in, p->big_endian);
+    uint32_t v1 = load32(in + 4, p->big_endian);
+
+    decipher(p->schedule, &v0, &v1);
+
+    store32(out, v0, p->big_endian);
+    store32(out + 4, v1, p->big_endian);
+}
+
+
+/*
+ * Interleaved kernels
+ *
+ * The rounds of a single block depend on each other, so the CPU waits for
+ * every instruction. Modes without dependencies between blocks process
+ * LANES blocks at once instead, round by round, which keeps the pipeline
+ * busy. On x86 the lanes are SIMD registers: SSE2 is always available on
+ * x86-64, AVX2 is selected at runtime if the CPU supports it.
+ */
+#define LANES (8)
+
+typedef void (*lanes_func)(const xtea_schedule *, uint32_t *, uint32_t *);
+
+
+static void encipher_scalar(const xtea_schedule *s, uint32_t *v0,
+                            uint32_t *v1) {
+    const uint32_t *key = s->keys, *end = s->keys + 2 * s->num_cycles;
+    uint32_t y[LANES], z[LANES];
+    int j;
+
+    memcpy(y, v0, sizeof(y));
+    memcpy(z, v1, sizeof(z));
+    for (; key < end; key += 2) {
+        for (j=0; j < LANES; j++)
+            y[j] += (((z[j] << 4) ^ (z[j] >> 5)) + z[j]) ^ key[0];
+        for (j=0; j < LANES; j++)
+            z[j] += (((y[j] << 4) ^ (y[j] >> 5)) + y[j]) ^ key[1];
+    }
+    memcpy(v0, y, sizeof(y));
+    memcpy(v1, z, sizeof(z));
+}
+
+
+static void decipher_scalar(const xtea_schedule *s, uint32_t *v0,
+                            uint32_t *v1) {
+    const uint32_t *key = s->keys + 2 * s->num_cycles;
+    uint32_t y[LANES], z[LANES];
+    int j;
+
+    memcpy(y, v0, sizeof(y));
+    memcpy(z, v1, sizeof(z));
+    for (; key > s->keys; key -= 2) {
+        for (j=0; j < LANES; j++)
+            z[j] -= (((y[j] << 4) ^ (y[j] >> 5)) + y[j]) ^ key[-1];
+        for (j=0; j < LANES; j++)
+            y[j] -= (((z[j] << 4) ^ (z[j] >> 5)) + z[j]) ^ key[-2];
+    }
+    memcpy(v0, y, sizeof(y));
+    memcpy(v1, z, sizeof(z));
+}
+
+
+#if defined(__SSE2__) || defined(_M_X64) || \
+    (defined(_M_IX86_FP) && _M_IX86_FP >= 2)
+#define HAVE_SSE2
+#include <emmintrin.h>
+
+#define SSE2_F(v) _mm_add_epi32(_mm_xor_si128(_mm_slli_epi32((v), 4), \
+                                              _mm_srli_epi32((v), 5)), (v))
+
+static void encipher_sse2(const xtea_schedule *s, uint32_t *v0,
+                          uint32_t *v1) {
+    const uint32_t *key = s->keys, *end = s->keys + 2 * s->num_cycles;
+    __m128i y0 = _mm_loadu_si128((const __m128i *)v0);
+    __m128i y1 = _mm_loadu_si128((const __m128i *)(v0 + 4));
+    __m128i z0 = _mm_loadu_si128((const __m128i *)v1);
+    __m128i z1 = _mm_loadu_si128((const __m128i *)(v1 + 4));
+    __m128i k;
 
-    return PyTuple_Pack(2, v0r, v1r);
+    for (; key < end; key += 2) {
+        k = _mm_set1_epi32((int)key[0]);
+        y0 = _mm_add_epi32(y0, _mm_xor_si128(SSE2_F(z0), k));
+        y1 = _mm_add_epi32(y1, _mm_xor_si128(SSE2_F(z1), k));
+        k = _mm_set1_epi32((int)key[1]);
+        z0 = _mm_add_epi32(z0, _mm_xor_si128(SSE2_F(y0), k));
+        z1 = _mm_add_epi32(z1, _mm_xor_si128(SSE2_F(y1), k));
+    }
+
+    _mm_storeu_si128((__m128i *)v0, y0);
+    _mm_storeu_si128((__m128i *)(v0 + 4), y1);
+    _mm_storeu_si128((__m128i *)v1, z0);
+    _mm_storeu_si128((__m128i *)(v1 + 4), z1);
+}
+
+
+static void decipher_sse2(const xtea_schedule *s, uint32_t *v0,
+                          uint32_t *v1) {
+    const uint32_t *key = s->keys + 2 * s->num_cycles;
+    __m128i y0 = _mm_loadu_si128((const __m128i *)v0);
+    __m128i y1 = _mm_loadu_si128((const __m128i *)(v0 + 4));
+    __m128i z0 = _mm_loadu_si128((const __m128i *)v1);
+    __m128i z1 = _mm_loadu_si128((const __m128i *)(v1 + 4));
+    __m128i k;
+
+    for (; key > s->keys; key -= 2) {
+        k = _mm_set1_epi32((int)key[-1]);
+        z0 = _mm_sub_epi32(z0, _mm_xor_si128(SSE2_F(y0), k));
+        z1 = _mm_sub_epi32(z1, _mm_xor_si128(SSE2_F(y1), k));
+        k = _mm_set1_epi32((int)key[-2]);
+        y0 = _mm_sub_epi32(y0, _mm_xor_si128(SSE2_F(z0), k));
+        y1 = _mm_sub_epi32(y1, _mm_xor_si128(SSE2_F(z1), k));
+    }
+
+    _mm_storeu_si128((__m128i *)v0, y0);
+    _mm_storeu_si128((__m128i *)(v0 + 4), y1);
+    _mm_storeu_si128((__m128i *)v1, z0);
+    _mm_storeu_si128((__m128i *)(v1 + 4), z1);
+}
+#endif
+
+
+#if (defined(__GNUC__) || defined(__clang__)) && \
+    (defined(__x86_64__) || defined(__i386__))
+#define HAVE_AVX2
+#include <immintrin.h>
+
+#define AVX2_F(v) _mm256_add_epi32(_mm256_xor_si256( \
+    _mm256_slli_epi32((v), 4), _mm256_srli_epi32((v), 5)), (v))
+
+__attribute__((target("avx2")))
+static void encipher_avx2(const xtea_schedule *s, uint32_t *v0,
+                          uint32_t *v1) {
+    const uint32_t *key = s->keys, *end = s->keys + 2 * s->num_cycles;
+    __m256i y = _mm256_loadu_si256((const __m256i *)v0);
+    __m256i z = _mm256_loadu_si256((const __m256i *)v1);
+
+    for (; key < end; key += 2) {
+        y = _mm256_add_epi32(y, _mm256_xor_si256(
+            AVX2_F(z), _mm256_set1_epi32((int)key[0])));
+        z = _mm256_add_epi32(z, _mm256_xor_si256(
+            AVX2_F(y), _mm256_set1_epi32((int)key[1])));
+    }
+
+    _mm256_storeu_si256((__m256i *)v0, y);
+    _mm256_storeu_si256((__m256i *)v1, z);
+}
+
+
+__attribute__((target("avx2")))
+static void decipher_avx2(const xtea_schedule *s, uint32_t *v0,
+                          uint32_t *v1) {
+    const uint32_t *key = s->keys + 2 * s->num_cycles;
+    __m256i y = _mm256_loadu_si256((const __m256i *)v0);
+    __m256i z = _mm256_loadu_si256((const __m256i *)v1);
+
+    for (; key > s->keys; key -= 2) {
+        z = _mm256_sub_epi32(z, _mm256_xor_si256(
+            AVX2_F(y), _mm256_set1_epi32((int)key[-1])));
+        y = _mm256_sub_epi32(y, _mm256_xor_si256(
+            AVX2_F(z), _mm256_set1_epi32((int)key[-2])));
+    }
+
+    _mm256_storeu_si256((__m256i *)v0, y);
+    _mm256_storeu_si256((__m256i *)v1, z);
+}
+#endif
+
+
+typedef struct {
+    const char *name;
+    lanes_func encipher;
+    lanes_func decipher;
+} xtea_kernel;
+
+static const xtea_kernel kernels[] = {
+#ifdef HAVE_AVX2
+    {"avx2", encipher_avx2, decipher_avx2},
+#endif
+#ifdef HAVE_SSE2
+    {"sse2", encipher_sse2, decipher_sse2},
+#endif
+    {"scalar", encipher_scalar, decipher_scalar},
 };
 
+#define NUM_KERNELS ((int)(sizeof(kernels) / sizeof(kernels[0])))
+
+static const xtea_kernel *kernel = &kernels[NUM_KERNELS - 1];
+
+
+static int kernel_supported(const xtea_kernel *k) {
+#ifdef HAVE_AVX2
+    if (k->encipher == encipher_avx2) {
+        __builtin_cpu_init();
+        return __builtin_cpu_supports("avx2");
+    }
+#endif
+    return 1;
+}
+
+
+// Load LANES blocks into words, process them and store them again
+static void crypt_lanes(const xtea_params *p, lanes_func func,
+                        const unsigned char *in, unsigned char *out) {
+    uint32_t v0[LANES], v1[LANES];
+    int j;
+
+    for (j=0; j < LANES; j++) {
+        v0[j] = load32(in + j * BLOCK_SIZE, p->big_endian);
+        v1[j] = load32(in + j * BLOCK_SIZE + 4, p->big_endian);
+    }
+    func(p->schedule, v0, v1);
+    for (j=0; j < LANES; j++) {
+        store32(out + j * BLOCK_SIZE, v0[j], p->big_endian);
+        store32(out + j * BLOCK_SIZE + 4, v1[j], p->big_endian);
+    }
+}
+
+
+// Signature: schedule, block, big_endian
+static PyObject *run_block_bytes(PyObject *args, int decrypt) {
+    xtea_params p = {NULL, 1};
+    Py_buffer block;
+    unsigned char out[BLOCK_SIZE];
+    int ok;
+
+    if (!PyArg_ParseTuple(args, "O&y*|p",
+                          get_schedule, &p.schedule, &block, &p.big_endian))
+        return NULL;
+
+    ok = block.len == BLOCK_SIZE;
+    if (!ok) {
+        PyErr_SetString(PyExc_ValueError, "Block length must be block_size");
+    } else if (decrypt) {
+        decrypt_block(&p, block.buf, out);
+    } else {
+        encrypt_block(&p, block.buf, out);
+    }
+
+    PyBuffer_Release(&block);
+    if (!ok)
+        return NULL;
+    return PyBytes_FromStringAndSize((const char *)out, BLOCK_SIZE);
+}
+
+
+static PyObject *xtea_encrypt_block_bytes(PyObject *self, PyObject *args) {
+    return run_block_bytes(args, 0);
+}
+
+
+static PyObject *xtea_decrypt_block_bytes(PyObject *self, PyObject *args) {
+    return run_block_bytes(args, 1);
+}
+
+
+static void xor_block(unsigned char *out, const unsigned char *a,
+                      const unsigned char *b, Py_ssize_t length) {
+    Py_ssize_t i;
+    for (i=0; i < length; i++)
+        out[i] = a[i] ^ b[i];
+}
+
+
+#define GROUP (LANES * BLOCK_SIZE)
+
+
+static void ecb_encrypt(const xtea_params *p, const unsigned char *src,
+                        unsigned char *dst, Py_ssize_t length) {
+    Py_ssize_t i = 0;
+    for (; i + GROUP <= length; i += GROUP)
+        crypt_lanes(p, kernel->encipher, src + i, dst + i);
+    for (; i < length; i += BLOCK_SIZE)
+        encrypt_block(p, src + i, dst + i);
+}
+
+
+static void ecb_decrypt(const xtea_params *p, const unsigned char *src,
+                        unsigned char *dst, Py_ssize_t length) {
+    Py_ssize_t i = 0;
+    for (; i + GROUP <= length; i += GROUP)
+        crypt_lanes(p, kernel->decipher, src + i, dst + i);
+    for (; i < length; i += BLOCK_SIZE)
+        decrypt_block(p, src + i, dst + i);
+}
+
+
+static void cbc_encrypt(const xtea_params *p, unsigned char *iv,
+                        const unsigned char *src, unsigned char *dst,
+                        Py_ssize_t length) {
+    Py_ssize_t i;
+    for (i=0; i < length; i += BLOCK_SIZE) {
+        xor_block(iv, iv, src + i, BLOCK_SIZE);
+        encrypt_block(p, iv, iv);
+        memcpy(dst + i, iv, BLOCK_SIZE);
+    }
+}
+
+
+static void cbc_decrypt(const xtea_params *p, unsigned char *iv,
+                        const unsigned char *src, unsigned char *dst,
+                        Py_ssize_t length) {
+    unsigned char block[BLOCK_SIZE], plain[BLOCK_SIZE];
+    unsigned char group[BLOCK_SIZE + GROUP], plains[GROUP];
+    Py_ssize_t i = 0;
+
+    // The IV and the ciphertext, it may be overwritten in place
+    memcpy(group, iv, BLOCK_SIZE);
+    for (; i + GROUP <= length; i += GROUP) {
+        memcpy(group + BLOCK_SIZE, src + i, GROUP);
+        crypt_lanes(p, kernel->decipher, group + BLOCK_SIZE, plains);
+        xor_block(dst + i, plains, group, GROUP);
+        memcpy(group, group + GROUP, BLOCK_SIZE);
+    }
+    memcpy(iv, group, BLOCK_SIZE);
+
+    for (; i < length; i += BLOCK_SIZE) {
+        memcpy(block, src + i, BLOCK_SIZE);
+        decrypt_block(p, block, plain);
+        xor_block(dst + i, plain, iv, BLOCK_SIZE);
+        memcpy(iv, block, BLOCK_SIZE);
+    }
+}
+
+
+static void cfb_encrypt(const xtea_params *p, unsigned char *iv,
+                        const unsigned char *src, unsigned char *dst,
+                        Py_ssize_t length) {
+    Py_ssize_t i;
+    for (i=0; i < length; i += BLOCK_SIZE) {
+        encrypt_block(p, iv, iv);
+        xor_block(iv, iv, src + i, BLOCK_SIZE);
+        memcpy(dst + i, iv, BLOCK_SIZE);
+    }
+}
+
+
+static void cfb_decrypt(const xtea_params *p, unsigned char *iv,
+                        const unsigned char *src, unsigned char *dst,
+                        Py_ssize_t length) {
+    unsigned char block[BLOCK_SIZE];
+    unsigned char group[BLOCK_SIZE + GROUP], keystream[GROUP];
+    Py_ssize_t i = 0;
+
+    // The IV and the ciphertext, it may be overwritten in place
+    memcpy(group, iv, BLOCK_SIZE);
+    for (; i + GROUP <= length; i += GROUP) {
+        memcpy(group + BLOCK_SIZE, src + i, GROUP);
+        crypt_lanes(p, kernel->encipher, group, keystream);
+        xor_block(dst + i, keystream, group + BLOCK_SIZE, GROUP);
+        memcpy(group, group + GROUP, BLOCK_SIZE);
+    }
+    memcpy(iv, group, BLOCK_SIZE);
+
+    for (; i < length; i += BLOCK_SIZE) {
+        memcpy(block, src + i, BLOCK_SIZE);
+        encrypt_block(p, iv, iv);
+        xor_block(dst + i, iv, block, BLOCK_SIZE);
+        memcpy(iv, block, BLOCK_SIZE);
+    }
+}
+
+
+/*
+ * CFB with segments of 1 to 8 bytes. The IV is a shift register: after
+ * every encryption, the ciphertext segment is shifted in. When decrypting,
+ * the registers are known from the ciphertext, so a group of LANES segments
+ * is encrypted at once from a window of the IV and the next segments.
+ */
+static void cfb_segments(const xtea_params *p, unsigned char *iv,
+                         Py_ssize_t segment, const unsigned char *src,
+                         unsigned char *dst, Py_ssize_t length,
+                         int decrypt) {
+    unsigned char window[BLOCK_SIZE + GROUP], registers[GROUP];
+    unsigned char keystream[GROUP], shifted[BLOCK_SIZE];
+    Py_ssize_t i = 0, step = LANES * segment, keep = BLOCK_SIZE - segment;
+    int j;
+
+    if (segment == BLOCK_SIZE) {
+        (decrypt ? cfb_decrypt : cfb_encrypt)(p, iv, src, dst, length);
+        return;
+    }
+
+    if (decrypt) {
+        // The ciphertext is copied first, it may be overwritten in place
+        memcpy(window, iv, BLOCK_SIZE);
+        for (; i + step <= length; i += step) {
+            memcpy(window + BLOCK_SIZE, src + i, step);
+            for (j=0; j < LANES; j++)
+                memcpy(registers + j * BLOCK_SIZE, window + j * segment,
+                       BLOCK_SIZE);
+            crypt_lanes(p, kernel->encipher, registers, keystream);
+            for (j=0; j < LANES; j++)
+                xor_block(dst + i + j * segment,
+                          window + BLOCK_SIZE + j * segment,
+                          keystream + j * BLOCK_SIZE, segment);
+            memmove(window, window + step, BLOCK_SIZE);
+        }
+        memcpy(iv, window, BLOCK_SIZE);
+    }
+
+    for (; i < length; i += segment) {
+        encrypt_block(p, iv, keystream);
+        memcpy(shifted, iv + segment, keep);
+        if (decrypt)
+            memcpy(shifted + keep, src + i, segment);
+        xor_block(dst + i, src + i, keystream, segment);
+        if (!decrypt)
+            memcpy(shifted + keep, dst + i, segment);
+        memcpy(iv, shifted, BLOCK_SIZE);
+    }
+}
+
+
+// CBC-MAC: chain the blocks into `state` without storing the ciphertext
+static void cbc_mac(const xtea_params *p, unsigned char *state,
+                    const unsigned char *src, Py_ssize_t length) {
+    Py_ssize_t i;
+    for (i=0; i < length; i += BLOCK_SIZE) {
+        xor_block(state, state, src + i, BLOCK_SIZE);
+        encrypt_block(p, state, state);
+    }
+}
+
+
+static void increment_counter(unsigned char *counter) {
+    int i;
+    for (i=BLOCK_SIZE - 1; i >= 0 && ++counter[i] == 0; i--);
+}
+
+
+/*
+ * EAX: CTR mode with a big endian counter, fused with the CBC-MAC of the
+ * ciphertext. The last block is not chained, it might be the final block
+ * of the message which CMAC masks with a subkey.
+ */
+static void eax_crypt(const xtea_params *p, unsigned char *counter,
+                      unsigned char *state, const unsigned char *src,
+                      unsigned char *dst, Py_ssize_t length, int decrypt) {
+    unsigned char block[BLOCK_SIZE], keystream[BLOCK_SIZE];
+    Py_ssize_t i;
+    for (i=0; i < length; i += BLOCK_SIZE) {
+        memcpy(block, src + i, BLOCK_SIZE);
+        encrypt_block(p, counter, keystream);
+        increment_counter(counter);
+        xor_block(dst + i, block, keystream, BLOCK_SIZE);
+
+        if (i + BLOCK_SIZE < length) {
+            xor_block(state, state, decrypt ? block : dst + i, BLOCK_SIZE);
+            encrypt_block(p, state, state);
+        }
+    }
+}
+
+
+/*
+ * Keystream modes carry the current keystream block and how many of its
+ * bytes are already used, so a stream can be continued at any byte.
+ * For CTR, one counter block is consumed for every fresh keystream block.
+ */
+static Py_ssize_t keystream_xor(const xtea_params *p, unsigned char *block,
+                                Py_ssize_t used, const unsigned char *counters,
+                                const unsigned char *src, unsigned char *dst,
+                                Py_ssize_t length) {
+    unsigned char keystream[GROUP];
+    Py_ssize_t i;
+    for (i=0; i < length; i++) {
+        if (used == BLOCK_SIZE && counters != NULL && length - i >= GROUP) {
+            // Whole groups of counter blocks are independent
+            crypt_lanes(p, kernel->encipher, counters, keystream);
+            counters += GROUP;
+            xor_block(dst + i, src + i, keystream, GROUP);
+            memcpy(block, keystream + GROUP - BLOCK_SIZE, BLOCK_SIZE);
+            i += GROUP - 1;
+            continue;
+        }
+        if (used == BLOCK_SIZE) {
+            if (counters != NULL) {
+                encrypt_block(p, counters, block);
+                counters += BLOCK_SIZE;
+            } else {
+                encrypt_block(p, block, block);
+            }
+            used = 0;
+        }
+        dst[i] = src[i] ^ block[used++];
+    }
+    return used;
+}
+
+
+/*
+ * Batches of independent messages under the same key. Each message has its
+ * own IV (the initial counter block in CTR mode), message i is found at
+ * data[offsets[i]:offsets[i + 1]] with native 64 bit integers as offsets.
+ * The mode numbers are the MODE_* constants of the Python package.
+ */
+#define MODE_ECB (1)
+#define MODE_CBC (2)
+#define MODE_CFB (3)
+#define MODE_OFB (5)
+#define MODE_CTR (6)
+
+static void ctr_counter(const xtea_params *p, unsigned char *counter,
+                        const unsigned char *src, unsigned char *dst,
+                        Py_ssize_t length) {
+    unsigned char keystream[BLOCK_SIZE];
+    Py_ssize_t i;
+    for (i=0; i < length; i += BLOCK_SIZE) {
+        encrypt_block(p, counter, keystream);
+        increment_counter(counter);
+        xor_block(dst + i, src + i, keystream,
+                  length - i < BLOCK_SIZE ? length - i : BLOCK_SIZE);
+    }
+}
+
+
+static int64_t get_offset(const unsigned char *offsets, Py_ssize_t i) {
+    int64_t value;
+    memcpy(&value, offsets + i * sizeof(int64_t), sizeof(int64_t));
+    return value;
+}
+
+
+static void crypt_many(const xtea_params *p, int mode, int decrypt,
+                       Py_ssize_t segment, const unsigned char *ivs,
+                       const unsigned char *offsets, const unsigned char *src,
+                       unsigned char *dst, Py_ssize_t count) {
+    unsigned char iv[BLOCK_SIZE];
+    Py_ssize_t i, start, length;
+
+    for (i=0; i < count; i++) {
+        start = (Py_ssize_t)get_offset(offsets, i);
+        length = (Py_ssize_t)get_offset(offsets, i + 1) - start;
+        memcpy(iv, ivs + i * BLOCK_SIZE, BLOCK_SIZE);
+
+        switch (mode) {
+        case MODE_ECB:
+            (decrypt ? ecb_decrypt : ecb_encrypt)(p, src + start, dst + start,
+                                                  length);
+            break;
+        case MODE_CBC:
+            (decrypt ? cbc_decrypt : cbc_encrypt)(p, iv, src + start,
+                                                  dst + start, length);
+            break;
+        case MODE_CFB:
+            cfb_segments(p, iv, segment, src + start, dst + start, length,
+                         decrypt);
+            break;
+        case MODE_OFB:
+            keystream_xor(p, iv, BLOCK_SIZE, NULL, src + start, dst + start,
+                          length);
+            break;
+        case MODE_CTR:
+            ctr_counter(p, iv, src + start, dst + start, length);
+            break;
+        }
+    }
+}
+
+
+static Py_ssize_t keystream_blocks(Py_ssize_t used, Py_ssize_t length) {
+    Py_ssize_t missing = length - (BLOCK_SIZE - used);
+    return missing > 0 ? (missing + BLOCK_SIZE - 1) / BLOCK_SIZE : 0;
+}
+
+
+static int check_blocks(Py_ssize_t length) {
+    if (length % BLOCK_SIZE) {
+        PyErr_SetString(PyExc_ValueError,
+                        "Input length must be a multiple of block_size");
+        return 0;
+    }
+    return 1;
+}
+
+
+static int check_iv(Py_buffer *iv) {
+    if (iv->len != BLOCK_SIZE) {
+        PyErr_SetString(PyExc_ValueError, "IV length must be block_size");
+        return 0;
+    }
+    return 1;
+}
+
+
+static int check_segment_size(Py_ssize_t segment_size) {
+    if (segment_size < 8 || segment_size > 8 * BLOCK_SIZE ||
+            segment_size % 8) {
+        PyErr_SetString(PyExc_ValueError,
+                        "segment_size must be a multiple of 8 between 8 "
+                        "and 64");
+        return 0;
+    }
+    return 1;
+}
+
+
+static int check_used(Py_ssize_t used) {
+    if (used < 0 || used > BLOCK_SIZE) {
+        PyErr_SetString(PyExc_ValueError, "used must be in range(9)");
+        return 0;
+    }
+    return 1;
+}
+
+
+/*
+ * Output of a bulk operation: either a new bytes object, or a writable
+ * buffer given by the caller (the *_into functions). For the latter, the
+ * number of bytes written is returned instead of the data.
+ */
+typedef struct {
+    PyObject *bytes;
+    Py_buffer view;
+    int has_view;
+    unsigned char *buf;
+} xtea_output;
+
+
+static int open_output(xtea_output *out, PyObject *target, Py_ssize_t length) {
+    out->bytes = NULL;
+    out->has_view = 0;
+
+    if (target == NULL) {
+        out->bytes = PyBytes_FromStringAndSize(NULL, length);
+        if (out->bytes == NULL)
+            return 0;
+        out->buf = (unsigned char *)PyBytes_AsString(out->bytes);
+        return 1;
+    }
+
+    if (PyObject_GetBuffer(target, &out->view, PyBUF_WRITABLE) < 0)
+        return 0;
+    out->has_view = 1;
+
+    if (out->view.len < length) {
+        PyErr_SetString(PyExc_ValueError, "Output buffer is too small");
+        return 0;
+    }
+    out->buf = out->view.buf;
+    return 1;
+}
+
+
+// Returns a new reference to the output data (or the written length).
+static PyObject *close_output(xtea_output *out, Py_ssize_t length, int ok) {
+    if (out->has_view) {
+        PyBuffer_Release(&out->view);
+        return ok ? PyLong_FromSsize_t(length) : NULL;
+    }
+    if (!ok)
+        Py_CLEAR(out->bytes);
+    return out->bytes;
+}
+
+
+/*
+ * The GIL is released for the actual work, so other threads can run (and
+ * encrypt) in parallel. For tiny inputs the switch costs more than it helps.
+ */
+#define GIL_THRESHOLD (4096)
+
+#define WITHOUT_GIL(length, statement) \
+    if ((length) >= GIL_THRESHOLD) { \
+        Py_BEGIN_ALLOW_THREADS \
+        statement; \
+        Py_END_ALLOW_THREADS \
+    } else { \
+        statement; \
+    }
+
+
+typedef void (*block_mode)(const xtea_params *, const unsigned char *,
+                           unsigned char *, Py_ssize_t);
+typedef void (*chain_mode)(const xtea_params *, unsigned char *,
+                           const unsigned char *, unsigned char *,
+                           Py_ssize_t);
+
+
+/*
+ * The block modes take an optional tail, blocks processed after the data
+ * into the same output. The final block with padding is passed that way,
+ * so the data does not have to be copied to append it.
+ */
+
+// Signature: schedule, data, [out], big_endian, tail
+static PyObject *run_block_mode(PyObject *args, block_mode func, int into) {
+    xtea_params p = {NULL, 1};
+    Py_buffer data, tail = {0};
+    PyObject *target = NULL;
+    xtea_output out = {0};
+    Py_ssize_t length;
+    int ok;
+
+    if (into ? !PyArg_ParseTuple(args, "O&y*O|py*",
+                                 get_schedule, &p.schedule,
+                                 &data, &target,
+                                 &p.big_endian, &tail)
+             : !PyArg_ParseTuple(args, "O&y*|py*",
+                                 get_schedule, &p.schedule,
+                                 &data, &p.big_endian, &tail))
+        return NULL;
+
+    length = data.len + tail.len;
+    ok = check_blocks(data.len) && check_blocks(tail.len) &&
+         open_output(&out, target, length);
+    if (ok) {
+        WITHOUT_GIL(length, func(&p, data.buf, out.buf, data.len);
+                            func(&p, tail.buf, out.buf + data.len, tail.len))
+    }
+
+    PyBuffer_Release(&data);
+    PyBuffer_Release(&tail);
+    return close_output(&out, length, ok);
+}
+
+
+// Signature: schedule, iv, data, [out], big_endian, tail
+static PyObject *run_chain_mode(PyObject *args, chain_mode func, int into) {
+    xtea_params p = {NULL, 1};
+    Py_buffer iv, data, tail = {0};
+    PyObject *target = NULL, *result;
+    xtea_output out = {0};
+    unsigned char state[BLOCK_SIZE];
+    Py_ssize_t length;
+    int ok;
+
+    if (into ? !PyArg_ParseTuple(args, "O&y*y*O|py*",
+                                 get_schedule, &p.schedule,
+                                 &iv, &data, &target,
+                                 &p.big_endian, &tail)
+             : !PyArg_ParseTuple(args, "O&y*y*|py*",
+                                 get_schedule, &p.schedule,
+                                 &iv, &data, &p.big_endian, &tail))
+        return NULL;
+
+    length = data.len + tail.len;
+    ok = check_iv(&iv) && check_blocks(data.len) && check_blocks(tail.len) &&
+         open_output(&out, target, length);
+    if (ok) {
+        memcpy(state, iv.buf, BLOCK_SIZE);
+        WITHOUT_GIL(length, func(&p, state, data.buf, out.buf, data.len);
+                            func(&p, state, tail.buf, out.buf + data.len,
+                                 tail.len))
+    }
+
+    PyBuffer_Release(&iv);
+    PyBuffer_Release(&data);
+    PyBuffer_Release(&tail);
+    result = close_output(&out, length, ok);
+    if (result == NULL)
+        return NULL;
+    return Py_BuildValue("(Ny#)", result, state, (Py_ssize_t)BLOCK_SIZE);
+}
+
+
+// Signature: schedule, iv, segment_size, data, [out], big_endian
+static PyObject *run_segment_mode(PyObject *args, int decrypt, int into) {
+    xtea_params p = {NULL, 1};
+    Py_buffer iv, data;
+    Py_ssize_t segment_size;
+    PyObject *target = NULL, *result;
+    xtea_output out = {0};
+    unsigned char state[BLOCK_SIZE];
+    int ok;
+
+    if (into ? !PyArg_ParseTuple(args, "O&y*ny*O|p",
+                                 get_schedule, &p.schedule,
+                                 &iv, &segment_size, &data, &target,
+                                 &p.big_endian)
+             : !PyArg_ParseTuple(args, "O&y*ny*|p",
+                                 get_schedule, &p.schedule,
+                                 &iv, &segment_size, &data, &p.big_endian))
+        return NULL;
+
+    ok = check_iv(&iv) && check_segment_size(segment_size);
+    if (ok && data.len % (segment_size / 8)) {
+        PyErr_SetString(PyExc_ValueError,
+                        "Input length must be a multiple of segment_size/8");
+        ok = 0;
+    }
+    ok = ok && open_output(&out, target, data.len);
+    if (ok) {
+        memcpy(state, iv.buf, BLOCK_SIZE);
+        WITHOUT_GIL(data.len, cfb_segments(&p, state, segment_size / 8,
+                                           data.buf, out.buf, data.len,
+                                           decrypt))
+    }
+
+    PyBuffer_Release(&iv);
+    PyBuffer_Release(&data);
+    result = close_output(&out, data.len, ok);
+    if (result == NULL)
+        return NULL;
+    return Py_BuildValue("(Ny#)", result, state, (Py_ssize_t)BLOCK_SIZE);
+}
+
+
+// Signature: schedule, block, used, [counters], data, [out], big_endian
+static PyObject *run_keystream_mode(PyObject *args, int ctr, int into) {
+    xtea_params p = {NULL, 1};
+    Py_buffer block, counters = {0}, data;
+    Py_ssize_t used;
+    PyObject *target = NULL, *result;
+    xtea_output out = {0};
+    unsigned char state[BLOCK_SIZE];
+    const unsigned char *counter_buf = NULL;
+    int ok;
+
+    if (ctr) {
+        if (into ? !PyArg_ParseTuple(args, "O&y*ny*y*O|p",
+                                     get_schedule, &p.schedule,
+                                     &block, &used, &counters, &data, &target,
+                                     &p.big_endian)
+                 : !PyArg_ParseTuple(args, "O&y*ny*y*|p",
+                                     get_schedule, &p.schedule,
+                                     &block, &used, &counters, &data,
+                                     &p.big_endian))
+            return NULL;
+        counter_buf = counters.buf;
+    } else {
+        if (into ? !PyArg_ParseTuple(args, "O&y*ny*O|p",
+                                     get_schedule, &p.schedule,
+                                     &block, &used, &data, &target,
+                                     &p.big_endian)
+                 : !PyArg_ParseTuple(args, "O&y*ny*|p",
+                                     get_schedule, &p.schedule,
+                                     &block, &used, &data,
+                                     &p.big_endian))
+            return NULL;
+    }
+
+    ok = check_used(used) && check_iv(&block);
+    if (ok && ctr &&
+            counters.len < keystream_blocks(used, data.len) * BLOCK_SIZE) {
+        PyErr_SetString(PyExc_ValueError, "Not enough counter blocks");
+        ok = 0;
+    }
+    ok = ok && open_output(&out, target, data.len);
+    if (ok) {
+        memcpy(state, block.buf, BLOCK_SIZE);
+        WITHOUT_GIL(data.len, used = keystream_xor(&p, state, used, counter_buf,
+                                                   data.buf, out.buf, data.len))
+    }
+
+    PyBuffer_Release(&block);
+    if (ctr)
+        PyBuffer_Release(&counters);
+    PyBuffer_Release(&data);
+    result = close_output(&out, data.len, ok);
+    if (result == NULL)
+        return NULL;
+    return Py_BuildValue("(Ny#n)", result, state, (Py_ssize_t)BLOCK_SIZE, used);
+}
+
+
+// Signature: schedule, state, data, big_endian
+static PyObject *xtea_cbc_mac(PyObject *self, PyObject *args) {
+    xtea_params p = {NULL, 1};
+    Py_buffer iv, data;
+    unsigned char state[BLOCK_SIZE];
+    int ok;
+
+    if (!PyArg_ParseTuple(args, "O&y*y*|p",
+                          get_schedule, &p.schedule,
+                          &iv, &data, &p.big_endian))
+        return NULL;
+
+    ok = check_iv(&iv) && check_blocks(data.len);
+    if (ok) {
+        memcpy(state, iv.buf, BLOCK_SIZE);
+        WITHOUT_GIL(data.len, cbc_mac(&p, state, data.buf, data.len))
+    }
+
+    PyBuffer_Release(&iv);
+    PyBuffer_Release(&data);
+    if (!ok)
+        return NULL;
+    return PyBytes_FromStringAndSize((const char *)state, BLOCK_SIZE);
+}
+
+
+// Signature: schedule, counter, state, data, decrypt, big_endian
+static PyObject *xtea_eax_crypt(PyObject *self, PyObject *args) {
+    xtea_params p = {NULL, 1};
+    Py_buffer counter, iv, data;
+    xtea_output out = {0};
+    unsigned char counter_state[BLOCK_SIZE], state[BLOCK_SIZE];
+    PyObject *result;
+    int decrypt = 0, ok;
+
+    if (!PyArg_ParseTuple(args, "O&y*y*y*|pp",
+                          get_schedule, &p.schedule,
+                          &counter, &iv, &data, &decrypt, &p.big_endian))
+        return NULL;
+
+    ok = check_iv(&counter) && check_iv(&iv) && check_blocks(data.len) &&
+         open_output(&out, NULL, data.len);
+    if (ok) {
+        memcpy(counter_state, counter.buf, BLOCK_SIZE);
+        memcpy(state, iv.buf, BLOCK_SIZE);
+        WITHOUT_GIL(data.len, eax_crypt(&p, counter_state, state, data.buf,
+                                        out.buf, data.len, decrypt))
+    }
+
+    PyBuffer_Release(&counter);
+    PyBuffer_Release(&iv);
+    PyBuffer_Release(&data);
+    result = close_output(&out, data.len, ok);
+    if (result == NULL)
+        return NULL;
+    return Py_BuildValue("(Ny#y#)", result,
+                         counter_state, (Py_ssize_t)BLOCK_SIZE,
+                         state, (Py_ssize_t)BLOCK_SIZE);
+}
+
+
+static int check_batch(int mode, Py_ssize_t segment, Py_buffer *ivs,
+                       Py_buffer *data, Py_buffer *offsets,
+                       Py_ssize_t *count) {
+    Py_ssize_t i, start, end, unit = mode == MODE_CFB ? segment : BLOCK_SIZE;
+
+    if (mode != MODE_ECB && mode != MODE_CBC && mode != MODE_CFB &&
+            mode != MODE_OFB && mode != MODE_CTR) {
+        PyErr_Format(PyExc_ValueError, "Unsupported mode %d", mode);
+        return 0;
+    }
+    if (offsets->len % sizeof(int64_t) || !offsets->len) {
+        PyErr_SetString(PyExc_ValueError,
+                        "offsets must contain count + 1 64 bit integers");
+        return 0;
+    }
+    *count = offsets->len / sizeof(int64_t) - 1;
+    if (ivs->len != *count * BLOCK_SIZE) {
+        PyErr_SetString(PyExc_ValueError,
+                        "ivs must contain one block per message");
+        return 0;
+    }
+    if (get_offset(offsets->buf, 0) != 0 ||
+            get_offset(offsets->buf, *count) != data->len) {
+        PyErr_SetString(PyExc_ValueError, "offsets must span the data");
+        return 0;
+    }
+
+    for (i=0; i < *count; i++) {
+        start = (Py_ssize_t)get_offset(offsets->buf, i);
+        end = (Py_ssize_t)get_offset(offsets->buf, i + 1);
+        if (end < start) {
+            PyErr_SetString(PyExc_ValueError, "offsets must not decrease");
+            return 0;
+        }
+        if ((end - start) % unit && mode != MODE_OFB && mode != MODE_CTR) {
+            PyErr_Format(PyExc_ValueError, "Message %zd: Input length must "
+                         "be a multiple of %s", i, mode == MODE_CFB ?
+                         "segment_size/8" : "block_size");
+            return 0;
+        }
+    }
+    return 1;
+}
+
+
+// Signature: schedule, mode, ivs, data, offsets, decrypt, big_endian,
+//            segment_size
+static PyObject *xtea_crypt_many(PyObject *self, PyObject *args) {
+    xtea_params p = {NULL, 1};
+    Py_buffer ivs, data, offsets;
+    xtea_output out = {0};
+    Py_ssize_t count = 0, segment_size = 8 * BLOCK_SIZE;
+    int mode, decrypt = 0, ok;
+
+    if (!PyArg_ParseTuple(args, "O&iy*y*y*|ppn",
+                          get_schedule, &p.schedule, &mode,
+                          &ivs, &data, &offsets, &decrypt, &p.big_endian,
+                          &segment_size))
+        return NULL;
+
+    ok = check_segment_size(segment_size) &&
+         check_batch(mode, segment_size / 8, &ivs, &data, &offsets, &count) &&
+         open_output(&out, NULL, data.len);
+    if (ok) {
+        WITHOUT_GIL(data.len, crypt_many(&p, mode, decrypt, segment_size / 8,
+                                         ivs.buf, offsets.buf, data.buf,
+                                         out.buf, count))
+    }
+
+    PyBuffer_Release(&ivs);
+    PyBuffer_Release(&data);
+    PyBuffer_Release(&offsets);
+    return close_output(&out, data.len, ok);
+}
+
+
+static PyObject *xtea_get_kernel(PyObject *self, PyObject *args) {
+    return PyUnicode_FromString(kernel->name);
+}
+
+
+static PyObject *xtea_available_kernels(PyObject *self, PyObject *args) {
+    PyObject *result = PyList_New(0), *name;
+    int i;
+
+    for (i=0; result != NULL && i < NUM_KERNELS; i++) {
+        if (!kernel_supported(&kernels[i]))
+            continue;
+        name = PyUnicode_FromString(kernels[i].name);
+        if (name == NULL || PyList_Append(result, name) < 0)
+            Py_CLEAR(result);
+        Py_XDECREF(name);
+    }
+    return result;
+}
+
+
+// Signature: name
+static PyObject *xtea_set_kernel(PyObject *self, PyObject *args) {
+    const char *name;
+    int i;
+
+    if (!PyArg_ParseTuple(args, "s", &name))
+        return NULL;
+
+    for (i=0; i < NUM_KERNELS; i++) {
+        if (strcmp(kernels[i].name, name) == 0 &&
+                kernel_supported(&kernels[i])) {
+            kernel = &kernels[i];
+            Py_RETURN_NONE;
+        }
+    }
+    PyErr_Format(PyExc_ValueError, "Kernel %s is not available", name);
+    return NULL;
+}
+
+
+// Signature: start, count, big_endian
+static PyObject *xtea_counter_blocks(PyObject *self, PyObject *args) {
+    unsigned long long start;
+    uint64_t value;
+    Py_ssize_t count, i;
+    int big_endian = 1, j;
+    PyObject *result;
+    unsigned char *out;
+
+    if (!PyArg_ParseTuple(args, "Kn|p", &start, &count, &big_endian))
+        return NULL;
+    if (count < 0 || count > PY_SSIZE_T_MAX / BLOCK_SIZE) {
+        PyErr_SetString(PyExc_ValueError, "Invalid amount of blocks");
+        return NULL;
+    }
+
+    result = PyBytes_FromStringAndSize(NULL, count * BLOCK_SIZE);
+    if (result == NULL)
+        return NULL;
+    out = (unsigned char *)PyBytes_AS_STRING(result);
+
+    // Unsigned arithmetic wraps around at 2**64 like the Python counter
+    for (i=0; i < count; i++, out += BLOCK_SIZE) {
+        value = (uint64_t)start + (uint64_t)i;
+        for (j=0; j < BLOCK_SIZE; j++)
+            out[big_endian ? BLOCK_SIZE - 1 - j : j] =
+                (unsigned char)(value >> (8 * j));
+    }
+    return result;
+}
+
+
+#define BULK_FUNCTION(name, runner, arg) \
+    static PyObject *xtea_##name(PyObject *self, PyObject *args) { \
+        return runner(args, arg, 0); \
+    } \
+    static PyObject *xtea_##name##_into(PyObject *self, PyObject *args) { \
+        return runner(args, arg, 1); \
+    }
+
+BULK_FUNCTION(ecb_encrypt, run_block_mode, ecb_encrypt)
+BULK_FUNCTION(ecb_decrypt, run_block_mode, ecb_decrypt)
+BULK_FUNCTION(cbc_encrypt, run_chain_mode, cbc_encrypt)
+BULK_FUNCTION(cbc_decrypt, run_chain_mode, cbc_decrypt)
+BULK_FUNCTION(cfb_encrypt, run_chain_mode, cfb_encrypt)
+BULK_FUNCTION(cfb_decrypt, run_chain_mode, cfb_decrypt)
+BULK_FUNCTION(cfb_segment_encrypt, run_segment_mode, 0)
+BULK_FUNCTION(cfb_segment_decrypt, run_segment_mode, 1)
+BULK_FUNCTION(ofb, run_keystream_mode, 0)
+BULK_FUNCTION(ctr, run_keystream_mode, 1)
+
 
 static PyMethodDef XteaMethods[] = {
     {"encrypt_int", (PyCFunction) xtea_encrypt_int, METH_VARARGS, "Encrypt a single xtea block."},
     {"decrypt_int", (PyCFunction) xtea_decrypt_int, METH_VARARGS, "Decrypt a single xtea block."},
+    {"key_schedule", (PyCFunction) xtea_key_schedule, METH_VARARGS, "Precompute the round keys for a key and number of cycles."},
+    {"encipher", (PyCFunction) xtea_encipher, METH_VARARGS, "Encrypt a single xtea block with a key schedule."},
+    {"decipher", (PyCFunction) xtea_decipher, METH_VARARGS, "Decrypt a single xtea block with a key schedule."},
+    {"encrypt_block_bytes", (PyCFunction) xtea_encrypt_block_bytes, METH_VARARGS, "Encrypt a single block given as bytes with a key schedule."},
+    {"decrypt_block_bytes", (PyCFunction) xtea_decrypt_block_bytes, METH_VARARGS, "Decrypt a single block given as bytes with a key schedule."},
+    {"ecb_encrypt", (PyCFunction) xtea_ecb_encrypt, METH_VARARGS, "Encrypt a buffer in ECB mode."},
+    {"ecb_decrypt", (PyCFunction) xtea_ecb_decrypt, METH_VARARGS, "Decrypt a buffer in ECB mode."},
+    {"cbc_encrypt", (PyCFunction) xtea_cbc_encrypt, METH_VARARGS, "Encrypt a buffer in CBC mode, returns (data, iv)."},
+    {"cbc_decrypt", (PyCFunction) xtea_cbc_decrypt, METH_VARARGS, "Decrypt a buffer in CBC mode, returns (data, iv)."},
+    {"cfb_encrypt", (PyCFunction) xtea_cfb_encrypt, METH_VARARGS, "Encrypt a buffer in CFB-64 mode, returns (data, iv)."},
+    {"cfb_decrypt", (PyCFunction) xtea_cfb_decrypt, METH_VARARGS, "Decrypt a buffer in CFB-64 mode, returns (data, iv)."},
+    {"cfb_segment_encrypt", (PyCFunction) xtea_cfb_segment_encrypt, METH_VARARGS, "Encrypt a buffer in CFB mode with segments of 8 to 64 bits, returns (data, iv)."},
+    {"cfb_segment_decrypt", (PyCFunction) xtea_cfb_segment_decrypt, METH_VARARGS, "Decrypt a buffer in CFB mode with segments of 8 to 64 bits, returns (data, iv)."},
+    {"ofb", (PyCFunction) xtea_ofb, METH_VARARGS, "Apply the OFB keystream, returns (data, block, used)."},
+    {"ctr", (PyCFunction) xtea_ctr, METH_VARARGS, "Apply the CTR keystream, returns (data, block, used)."},
+    {"cbc_mac", (PyCFunction) xtea_cbc_mac, METH_VARARGS, "Chain a buffer into a CBC-MAC state, returns the new state."},
+    {"eax_crypt", (PyCFunction) xtea_eax_crypt, METH_VARARGS, "Apply EAX's CTR mode and chain the ciphertext into a CBC-MAC state, returns (data, counter, state)."},
+    {"crypt_many", (PyCFunction) xtea_crypt_many, METH_VARARGS, "Encrypt or decrypt a batch of messages with one IV each."},
+    {"get_kernel", (PyCFunction) xtea_get_kernel, METH_NOARGS, "Get the name of the kernel used for independent blocks."},
+    {"available_kernels", (PyCFunction) xtea_available_kernels, METH_NOARGS, "List the kernels supported by the CPU, fastest first."},
+    {"counter_blocks", (PyCFunction) xtea_counter_blocks, METH_VARARGS, "Get count consecutive 64 bit counter blocks."},
+    {"set_kernel", (PyCFunction) xtea_set_kernel, METH_VARARGS, "Select the kernel used for independent blocks."},
+    {"ecb_encrypt_into", (PyCFunction) xtea_ecb_encrypt_into, METH_VARARGS, "Encrypt a buffer in ECB mode into a writable buffer."},
+    {"ecb_decrypt_into", (PyCFunction) xtea_ecb_decrypt_into, METH_VARARGS, "Decrypt a buffer in ECB mode into a writable buffer."},
+    {"cbc_encrypt_into", (PyCFunction) xtea_cbc_encrypt_into, METH_VARARGS, "Encrypt a buffer in CBC mode into a writable buffer."},
+    {"cbc_decrypt_into", (PyCFunction) xtea_cbc_decrypt_into, METH_VARARGS, "Decrypt a buffer in CBC mode into a writable buffer."},
+    {"cfb_encrypt_into", (PyCFunction) xtea_cfb_encrypt_into, METH_VARARGS, "Encrypt a buffer in CFB-64 mode into a writable buffer."},
+    {"cfb_decrypt_into", (PyCFunction) xtea_cfb_decrypt_into, METH_VARARGS, "Decrypt a buffer in CFB-64 mode into a writable buffer."},
+    {"cfb_segment_encrypt_into", (PyCFunction) xtea_cfb_segment_encrypt_into, METH_VARARGS, "Encrypt a buffer in CFB mode with segments of 8 to 64 bits into a writable buffer."},
+    {"cfb_segment_decrypt_into", (PyCFunction) xtea_cfb_segment_decrypt_into, METH_VARARGS, "Decrypt a buffer in CFB mode with segments of 8 to 64 bits into a writable buffer."},
+    {"ofb_into", (PyCFunction) xtea_ofb_into, METH_VARARGS, "Apply the OFB keystream into a writable buffer."},
+    {"ctr_into", (PyCFunction) xtea_ctr_into, METH_VARARGS, "Apply the CTR keystream into a writable buffer."},
     {NULL, NULL, 0, NULL}
 };
 
@@ -69,5 +1351,14 @@ static struct PyModuleDef xteamodule = {
 
 PyMODINIT_FUNC
 PyInit__xtea() {
+    int i;
+
+    // The fastest kernel the CPU supports
+    for (i=0; i < NUM_KERNELS; i++) {
+        if (kernel_supported(&kernels[i])) {
+            kernel = &kernels[i];
+            break;
+        }
+    }
     return PyModule_Create(&xteamodule);
 }
@@ -26,9 +26,11 @@ True
 
 from __future__ import print_function
 
-__all__ = ("new", "XTEACipher",
+__all__ = ("new", "XTEACipher", "engine_info",
+           "encrypt_many", "decrypt_many",
            "MODE_ECB", "MODE_CBC", "MODE_CFB",
            "MODE_CTR", "MODE_OFB", "MODE_PGP",
+           "PADDING_PKCS7", "PADDING_ISO7816", "PADDING_ZERO",
            "key_size", "block_size")
 
 __version__ = "0.7.1"
@@ -38,45 +40,38 @@ __license__ = "Public Domain"
 
 import struct
 import sys
-import warnings
 
 from pep272_encryption import PEP272Cipher
+from pep272_encryption.util import xor_strings
+from . import metrics as _metrics
+from .cache import key_cache
 from .counter import Counter  # noqa: F401
 
 try:
+    import _xtea
     from _xtea import \
-        encrypt_int as _encrypt_int, \
-        decrypt_int as _decrypt_int
-
-except ImportError:
-    # Variable names are from from the reference implementation
-    # pylint: disable=invalid-name,redefined-builtin
-    def _encrypt_int(k, v, n=32):
-        v0, v1 = v
-
-        sum, delta, mask = 0, 0x9e3779b9, 0xffffffff
-        for _ in range(n):
-            v0 = (v0 + (((v1 << 4 ^ v1 >> 5) + v1) ^
-                        (sum + k[sum & 3]))) & mask
-            sum = (sum + delta) & mask
-            v1 = (v1 + (((v0 << 4 ^ v0 >> 5) + v0) ^
-                        (sum + k[sum >> 11 & 3]))) & mask
-
-        return v0, v1
-
-    def _decrypt_int(k, v, n=32):
-        v0, v1 = v
-
-        delta, mask = 0x9e3779b9, 0xffffffff
-        sum = (delta * n) & mask
-        for _ in range(n):
-            v1 = (v1 - (((v0 << 4 ^ v0 >> 5) + v0) ^
-                        (sum + k[sum >> 11 & 3]))) & mask
-            sum = (sum - delta) & mask
-            v0 = (v0 - (((v1 << 4 ^ v1 >> 5) + v1) ^
-                        (sum + k[sum & 3]))) & mask
-
-        return v0, v1
+        key_schedule as _key_schedule, \
+        encipher as _encipher, \
+        decipher as _decipher, \
+        encrypt_block_bytes as _encrypt_block_bytes, \
+        decrypt_block_bytes as _decrypt_block_bytes
+
+except ImportError:  # Missing or built from an older xtea.c
+    _xtea = None
+    from ._python import \
+        key_schedule as _key_schedule, \
+        encipher as _encipher, \
+        decipher as _decipher, \
+        encrypt_block_bytes as _encrypt_block_bytes, \
+        decrypt_block_bytes as _decrypt_block_bytes
+
+# The engine runs whole modes of operation, it is selected by
+# _load_engine() when the first cipher object is created.
+_engine = None
+
+#: Bytes processed per call to the engine in CTR mode, the counter blocks
+#: of one batch are generated at once.
+_CTR_BATCH = 1 << 16
 
 #: Constant for Electronic Codebook mode of operation.
 MODE_ECB = 1
@@ -97,6 +92,15 @@ MODE_OFB = 5
 #: Constant for Counter mode of operation
 MODE_CTR = 6
 
+#: Constant for PKCS#7 padding, see :py:mod:`xtea.padding`.
+PADDING_PKCS7 = 1
+
+#: Constant for ISO/IEC 7816-4 padding, see :py:mod:`xtea.padding`.
+PADDING_ISO7816 = 2
+
+#: Constant for zero padding, see :py:mod:`xtea.padding`.
+PADDING_ZERO = 3
+
 
 #: Block size of XTEA in bytes
 #:
@@ -116,6 +120,9 @@ def new(key, **kwargs):
 
     It's fully PEP-272 compliant, default mode is ECB.
 
+    Key schedules are shared between cipher objects with the same key,
+    see :py:data:`xtea.cache.key_cache`.
+
     :param key:
         The key for encryption/decryption. Must be 16 in length.
     :type key: `bytes`
@@ -168,6 +175,14 @@ def new(key, **kwargs):
 
         * **rounds** (`int` or `float`):
             Rounds of the xtea cipher, defaults to 64.
+
+        * **padding** (`int`): One of :py:data:`PADDING_PKCS7`,
+            :py:data:`PADDING_ISO7816` and :py:data:`PADDING_ZERO`, or None
+            (the default) for no padding. Every call to encrypt or decrypt
+            handles a complete message then, decrypt returns a
+            :py:class:`memoryview`. See :py:mod:`xtea.padding`.
+
+            **Only for**: *ECB* and *CBC* mode.
     """
     return XTEACipher(key, **kwargs)
 
@@ -192,6 +207,7 @@ class XTEACipher(PEP272Cipher):
 
     def __init__(self, key, mode=None, **kwargs):
         if mode is None:
+            import warnings  # pylint: disable=import-outside-toplevel
             mode = MODE_ECB
             warnings.warn("Implicitly selecting ECB mode of operation. "
                           "The ECB mode is usually insecure to use.")
@@ -200,18 +216,287 @@ class XTEACipher(PEP272Cipher):
         # pylint: disable=super-with-arguments
         super(XTEACipher, self).__init__(key, mode, **kwargs)
 
+        if _engine is None:
+            _load_engine()
+
+        self.padding = kwargs.get("padding")
+        if self.padding is not None and mode not in (MODE_ECB, MODE_CBC):
+            raise ValueError("Padding requires ECB or CBC mode")
+        if self.padding not in (None, PADDING_PKCS7, PADDING_ISO7816,
+                                PADDING_ZERO):
+            raise ValueError("Unknown padding {!r}".format(self.padding))
+
         self.rounds = int(kwargs.get("rounds", 64))
         self.cycles = self.rounds // 2
         self.endian = kwargs.get("endian", "!")
 
-        self.__k = struct.unpack(self.endian + "4L", self.key)
+        #: Counters of this object, see :py:mod:`xtea.metrics`.
+        self.stats = _metrics.Stats() if _metrics.ENABLED else None
+
+        self.__schedule = _get_schedule(self.key, self.cycles, self.endian,
+                                        self)
+        self.__big_endian = _big_endian(self.endian)
+        self._used = self.block_size  # Keystream bytes used of `_status`
+
+    def encrypt(self, string):
+        """Encrypt data with the key and the parameters set at initialization.
+
+        If the C extension (or NumPy for some modes) is available, the
+        whole mode of operation runs natively in a single call.
+        See :py:meth:`pep272_encryption.PEP272Cipher.encrypt` for details.
+
+        With padding, `string` is a complete message of any length.
+        """
+        if self.padding is not None:
+            return self._pad_crypt(string, False)
+        return self._crypt(string, False)
+
+    def decrypt(self, string):
+        """Decrypt data with the key and the parameters set at initialization.
+
+        If the C extension (or NumPy for some modes) is available, the
+        whole mode of operation runs natively in a single call.
+        See :py:meth:`pep272_encryption.PEP272Cipher.decrypt` for details.
+
+        With padding, `string` is a complete message and the result is a
+        :py:class:`memoryview` of the decrypted data without the padding.
+
+        :raises ValueError: If the padding is invalid.
+        """
+        if self.padding is not None:
+            return self._pad_crypt(string, True)
+        return self._crypt(string, True)
+
+    def encrypt_into(self, src, dst):
+        """Encrypt `src` and write the result to the writable buffer `dst`.
+
+        `src` may be any bytes-like object and `dst` may be the same buffer
+        for in-place encryption. With the C extension, no output object is
+        allocated and the GIL is released while the data is processed.
+        With padding, `dst` needs room for the padded message.
+
+        :return: The number of bytes written.
+        :rtype: int
+        """
+        if self.padding is not None:
+            return self._pad_crypt(src, False, dst)
+        return self._crypt(_byte_view(src), False, dst)
+
+    def decrypt_into(self, src, dst):
+        """Decrypt `src` and write the result to the writable buffer `dst`.
+
+        See :py:meth:`encrypt_into`. With padding, the padding is written to
+        `dst` as well, it is not part of the returned length.
+
+        :return: The number of bytes written.
+        :rtype: int
+        """
+        if self.padding is not None:
+            return self._pad_crypt(src, True, dst)
+        return self._crypt(_byte_view(src), True, dst)
+
+    def decrypt_at(self, offset, data):
+        """Decrypt data found at byte `offset` of a CTR stream.
+
+        The keystream is computed for the requested blocks only, so a slice
+        of a large stream can be decrypted without processing everything
+        before it. The counter must be a :py:class:`xtea.counter.Counter`,
+        `offset` is counted from its nonce. The state of the cipher object
+        and its counter is not changed.
+
+        :param int offset: Position of `data` in the stream in bytes.
+        :param bytes data: The ciphertext at that position.
+        :raises TypeError: If the cipher is not in CTR mode with a Counter.
+        """
+        counter = self._counter
+        if self.mode != MODE_CTR or not isinstance(counter, Counter):
+            raise TypeError("Random access requires CTR mode with a counter "
+                            "from xtea.counter")
+        if offset < 0:
+            raise ValueError("offset must not be negative")
+
+        skip = offset % self.block_size
+        position = counter.tell()
+        try:
+            counter.seek(offset // self.block_size)
+            counters = counter.blocks(
+                -(-(skip + len(data)) // self.block_size))
+        finally:
+            counter.seek(position)
+
+        func = getattr(_engine, "ctr", None)
+        if func is None or self.__big_endian is None:
+            keystream = b"".join(
+                self.encrypt_block(self.key, counters[i:i + self.block_size])
+                for i in range(0, len(counters), self.block_size))
+            return xor_strings(data, keystream[skip:skip + len(data)])
+
+        # Discard the first `skip` bytes of the keystream
+        block = b"\0" * self.block_size
+        _, block, used = func(self.__schedule, block, self.block_size,
+                              counters, block[:skip], self.__big_endian)
+        if skip:
+            counters = counters[self.block_size:]
+        return func(self.__schedule, block, used, counters, data,
+                    self.__big_endian)[0]
+
+    def encrypt_at(self, offset, data):
+        """Encrypt data for byte `offset` of a CTR stream.
+
+        See :py:meth:`decrypt_at`.
+        """
+        return self.decrypt_at(offset, data)
+
+    def _pad_crypt(self, data, decrypt, out=None):
+        """Process a complete message with padding.
+
+        Only the incomplete last block is padded, it is passed to the
+        engine as tail of the aligned data.
+        """
+        from . import padding  # pylint: disable=import-outside-toplevel
+        data = _byte_view(data)
+        if decrypt:
+            result = self._crypt(data, True, out)
+            if out is None:
+                return padding.unpad(result, self.padding)
+            return len(padding.unpad(_byte_view(out)[:result], self.padding))
+
+        aligned = len(data) - len(data) % self.block_size
+        return self._crypt(data[:aligned], False, out,
+                           padding.final_block(data[aligned:], self.padding))
+
+    def _crypt(self, data, decrypt, out=None, tail=b""):
+        """Run `_bulk_crypt`, instrumented if :py:mod:`xtea.metrics` is
+        enabled."""
+        if _metrics.ENABLED:
+            return _metrics.record(self, decrypt, len(data) + len(tail),
+                                   self._bulk_crypt, data, decrypt, out,
+                                   tail)
+        return self._bulk_crypt(data, decrypt, out, tail)
+
+    def _bulk_crypt(self, data, decrypt, out=None, tail=b""):
+        """Run a mode of operation with the engine.
+
+        If `out` is given, the result is written to it and the number of
+        written bytes is returned instead. Modes the engine does not provide
+        fall back to the block-by-block implementation. `tail` is processed
+        after `data` into the same output (ECB and CBC mode only).
+        """
+        if tail and (_engine is not _xtea or self.__big_endian is None):
+            # Only the C extension takes the tail as argument
+            if out is None:
+                return b"".join((self._bulk_crypt(data, decrypt),
+                                 self._bulk_crypt(tail, decrypt)))
+            written = self._bulk_crypt(data, decrypt, out)
+            return written + self._bulk_crypt(
+                _byte_view(tail), decrypt, _byte_view(out)[written:])
+
+        mode = self.mode
+        direction = "decrypt" if decrypt else "encrypt"
+        if mode == MODE_ECB:
+            name = "ecb_" + direction
+        elif mode == MODE_CBC or mode == MODE_CFB and self.segment_size == 64:
+            name = ("cbc_" if mode == MODE_CBC else "cfb_") + direction
+        elif mode == MODE_CFB:
+            name = "cfb_segment_" + direction
+        else:
+            name = {MODE_OFB: "ofb", MODE_CTR: "ctr"}.get(mode)
+
+        func = copy = None
+        if name is not None and self.__big_endian is not None:
+            func = out is not None and getattr(_engine, name + "_into", None)
+            if not func:
+                func, copy = getattr(_engine, name, None), out is not None
+
+        if func is None:
+            func = getattr(super(XTEACipher, self), direction)
+            if isinstance(data, memoryview):
+                data = data.tobytes()
+            if out is None:
+                return func(data)
+            return _copy_into(func(data), out)
+
+        if mode == MODE_CTR and len(data) > _CTR_BATCH:
+            return self._bulk_batches(data, decrypt, out)
+
+        if mode == MODE_ECB:
+            state = ()
+        elif mode == MODE_CFB and self.segment_size != 64:
+            state = (self._status, self.segment_size)
+        elif mode in (MODE_CBC, MODE_CFB):
+            state = (self._status,)
+        elif mode == MODE_OFB:
+            state = (self._status, self._used)
+        else:
+            state = (self._status or b"\0" * self.block_size, self._used,
+                     self._counter_blocks(len(data)))
+
+        buffers = (data,) if out is None or copy else (data, out)
+        args = (self.__schedule,) + state + buffers + (self.__big_endian,)
+        if tail:
+            args += (tail,)
+        if _metrics.ENABLED:
+            unit = self.segment_size // 8 if mode == MODE_CFB \
+                else self.block_size  # Bytes per block function call
+            result = _metrics.timed(self, "engine",
+                                    -(-(len(data) + len(tail)) // unit),
+                                    func, *args)
+        else:
+            result = func(*args)
+
+        if mode in (MODE_CBC, MODE_CFB):
+            result, self._status = result
+        elif mode in (MODE_OFB, MODE_CTR):
+            result, self._status, self._used = result
+
+        if copy:
+            return _copy_into(result, out)
+        return result
+
+    def _bulk_batches(self, data, decrypt, out=None):
+        """Run `_bulk_crypt` on slices of _CTR_BATCH bytes.
+
+        This bounds the memory needed for the counter blocks.
+        """
+        data = _byte_view(data)
+        target = None if out is None else _byte_view(out)
+
+        results = []
+        for start in range(0, len(data), _CTR_BATCH):
+            end = start + _CTR_BATCH
+            if target is None:
+                results.append(self._bulk_crypt(data[start:end], decrypt))
+            else:
+                self._bulk_crypt(data[start:end], decrypt, target[start:end])
+
+        return b"".join(results) if out is None else len(data)
+
+    def _counter_blocks(self, length):
+        """Get the counter blocks needed to process `length` more bytes."""
+        missing = length - (self.block_size - self._used)
+        count = max(0, -(-missing // self.block_size))
+
+        if isinstance(self._counter, Counter):
+            return self._counter.blocks(count)
+
+        blocks = [self._counter() for _ in range(count)]
+        if any(len(block) != self.block_size for block in blocks):
+            raise TypeError("Counter length must be block_size")
+        return b"".join(blocks)
 
     def encrypt_block(self, key, block, **kwargs):
         """Encrypt a single block with XTEA."""
-        encrypted_block = _encrypt_int(
-            self.__k,
-            struct.unpack(self.endian + "2L", block),
-            self.cycles
+        if self.__big_endian is not None:
+            if _metrics.ENABLED:
+                return _metrics.timed(self, "block", 1, _encrypt_block_bytes,
+                                      self.__schedule, block,
+                                      self.__big_endian)
+            return _encrypt_block_bytes(self.__schedule, block,
+                                        self.__big_endian)
+
+        encrypted_block = _encipher(
+            self.__schedule,
+            struct.unpack(self.endian + "2L", block)
         )
 
         return struct.pack(
@@ -221,10 +506,17 @@ class XTEACipher(PEP272Cipher):
 
     def decrypt_block(self, key, block, **kwargs):
         """Decrypt a single block with XTEA."""
-        decrypted_block = _decrypt_int(
-            self.__k,
-            struct.unpack(self.endian + "2L", block),
-            self.cycles
+        if self.__big_endian is not None:
+            if _metrics.ENABLED:
+                return _metrics.timed(self, "block", 1, _decrypt_block_bytes,
+                                      self.__schedule, block,
+                                      self.__big_endian)
+            return _decrypt_block_bytes(self.__schedule, block,
+                                        self.__big_endian)
+
+        decrypted_block = _decipher(
+            self.__schedule,
+            struct.unpack(self.endian + "2L", block)
         )
 
         return struct.pack(
@@ -233,6 +525,143 @@ class XTEACipher(PEP272Cipher):
         )
 
 
+def engine_info():
+    """Report the implementation selected at import.
+
+    :return: The ``engine`` running whole modes of operation (``"c"``,
+        ``"numpy"`` or ``"python"``), the module providing the
+        ``block_function``, the ``bulk_functions`` of the engine (modes
+        missing there run block by block), if the engine ``releases_gil``,
+        the path of the ``c_extension`` (or None), the ``kernel`` of the C
+        extension for independent blocks (``"avx2"``, ``"sse2"`` or
+        ``"scalar"``, or None) and the ``numpy`` version used (or None).
+    :rtype: dict
+    """
+    _load_engine()
+    if _engine is _xtea:
+        engine = "c"
+    else:
+        engine = _engine.__name__.rpartition("._")[2]
+    numpy = sys.modules.get("numpy") if engine == "numpy" else None
+
+    return {
+        "engine": engine,
+        "block_function": "c" if _xtea is not None else "python",
+        "bulk_functions": sorted(
+            name for name in ("ecb_encrypt", "ecb_decrypt", "cbc_encrypt",
+                              "cbc_decrypt", "cfb_encrypt", "cfb_decrypt",
+                              "ofb", "ctr")
+            if hasattr(_engine, name)),
+        "releases_gil": _xtea is not None,
+        "c_extension": getattr(_xtea, "__file__", None),
+        "kernel": _xtea.get_kernel() if _xtea is not None else None,
+        "numpy": getattr(numpy, "__version__", None),
+        "metrics": _metrics.ENABLED,
+    }
+
+
+def encrypt_many(key, mode, items, decrypt=False, **kwargs):
+    """Encrypt many small messages with one IV each under the same key.
+
+    See :py:func:`xtea.batch.encrypt_many`.
+
+    :rtype: xtea.batch.Packed
+    """
+    from . import batch  # pylint: disable=import-outside-toplevel
+    return batch.encrypt_many(key, mode, items, decrypt, **kwargs)
+
+
+def decrypt_many(key, mode, items, **kwargs):
+    """Decrypt many small messages with one IV each under the same key.
+
+    See :py:func:`xtea.batch.encrypt_many`.
+
+    :rtype: xtea.batch.Packed
+    """
+    from . import batch  # pylint: disable=import-outside-toplevel
+    return batch.encrypt_many(key, mode, items, True, **kwargs)
+
+
+def _load_engine():
+    """Select the engine once, it is kept for the lifetime of the process.
+
+    NumPy can only speed up modes without dependencies between blocks, the
+    others are left out there. Pure Python only handles the keystream modes
+    and CFB with segments of less than a block itself. Importing NumPy is
+    slow, so it is deferred until it is needed.
+    """
+    global _engine  # pylint: disable=global-statement,invalid-name
+    if _engine is None:
+        if _xtea is not None:
+            _engine = _xtea
+        else:
+            try:
+                from . import _numpy as engine
+            except ImportError:
+                from . import _python as engine
+            _engine = engine
+    return _engine
+
+
+def _get_schedule(key, cycles, endian, cipher=None):
+    """Get the key schedule from the key cache, or create it.
+
+    The time to create it is added to the metrics of `cipher`, if given.
+    """
+    def create():
+        words = struct.unpack(endian + "4L", key)
+        if getattr(cipher, "stats", None) is not None:
+            return _metrics.timed(cipher, "key_setup", 0,
+                                  _key_schedule, words, cycles)
+        return _key_schedule(words, cycles)
+
+    return key_cache.get((bytes(key), cycles, endian), create)
+
+
+def _byte_view(obj):
+    """Get a flat memoryview of unsigned bytes of a buffer.
+
+    Python 2 cannot cast memoryviews: other formats are copied there, and
+    objects with only the old buffer interface (like :py:class:`array.array`)
+    give a read-only view. Memoryviews are used as they are on Python 2, the
+    ones :py:mod:`io` passes to ``readinto`` crash when their format is read
+    or a memoryview of them is created.
+    """
+    if isinstance(obj, memoryview) and sys.version_info[0] < 3:
+        return obj
+    try:
+        view = memoryview(obj)
+    except TypeError:
+        if sys.version_info[0] > 2:
+            raise
+        view = memoryview(buffer(obj))  # noqa: F821 pylint: disable=E0602
+    if view.format != "B" or view.ndim != 1:
+        if not hasattr(view, "cast"):
+            return memoryview(view.tobytes())
+        view = view.cast("B")
+    return view
+
+
+def _copy_into(data, buffer):
+    """Copy data into a writable buffer, returns the length of data."""
+    _byte_view(buffer)[:len(data)] = data
+    return len(data)
+
+
+def _big_endian(endian):
+    """Map a struct byte order to the C extension's big endian flag.
+
+    Returns None if the C extension cannot handle the byte order.
+    """
+    if endian in ("!", ">"):
+        return True
+    if endian == "<":
+        return False
+    if endian == "=":
+        return sys.byteorder == "big"
+    return None
+
+
 try:
     XTEACipher.__doc__ += new.__doc__
 except (AttributeError, TypeError):  # Python 2
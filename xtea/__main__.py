@@ -0,0 +1,346 @@
+"""
+Command line interface, see ``python -m xtea --help`` (or ``xtea --help``).
+
+Files and pipes are processed in chunks of fixed size, every chunk in a
+single call to the bulk engine, so memory use is bounded no matter how
+large the input is. With ``--workers``, ECB, CTR and CBC/CFB decryption
+are spread over multiple cores, see :py:mod:`xtea.parallel`.
+
+The key is read from a file (16 raw bytes or 32 hexadecimal digits) or from
+an environment variable (hexadecimal, ``XTEA_KEY`` by default). Except in
+ECB mode, encryption generates a random IV (the initial counter block in
+CTR mode) and writes it in front of the output, unless one is given.
+Decryption reads it from there in that case. ECB and CBC mode use PKCS#7
+padding unless ``--padding`` says otherwise.
+
+Output files are written under a temporary name next to them and renamed
+once complete, a failed run leaves an existing file untouched.
+
+Example::
+
+    $ export XTEA_KEY=000102030405060708090a0b0c0d0e0f
+    $ python -m xtea encrypt -i backup.tar -o backup.tar.xtea
+    $ python -m xtea decrypt < backup.tar.xtea > backup.tar
+"""
+
+from __future__ import print_function
+
+import argparse
+import binascii
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import xtea
+
+from xtea import MODE_CBC, MODE_CFB, MODE_CTR, MODE_ECB, MODE_OFB
+from xtea import PADDING_ISO7816, PADDING_PKCS7, PADDING_ZERO
+from xtea.counter import Counter
+from xtea.stream import DEFAULT_CHUNK_SIZE, _check_end, _finish, _unit
+
+__all__ = ("main",)
+
+_TIMER = getattr(time, "perf_counter", time.time)
+
+MODES = {"ecb": MODE_ECB, "cbc": MODE_CBC, "cfb": MODE_CFB,
+         "ofb": MODE_OFB, "ctr": MODE_CTR}
+
+PADDINGS = {"pkcs7": PADDING_PKCS7, "iso7816": PADDING_ISO7816,
+            "zero": PADDING_ZERO, "none": None}
+
+_ENDIAN = {"big": "!", "little": "<"}
+
+_replace = getattr(os, "replace", os.rename)  # Python 2 has no replace
+
+
+class _Error(Exception):
+    """An error reported without a traceback."""
+
+
+def _parse_hex(text, what):
+    try:
+        return binascii.unhexlify(text.strip())
+    except (binascii.Error, TypeError, ValueError):
+        raise _Error("{} is not valid hexadecimal".format(what))
+
+
+def _secret(path, env, size, what):
+    """Read a key or IV from a file or an environment variable.
+
+    Files may contain the raw bytes or hexadecimal digits.
+    """
+    if path is not None:
+        with open(path, "rb") as file:
+            data = file.read()
+        if len(data) != size:
+            data = _parse_hex(data.decode("ascii", "replace"), what)
+    elif env is not None and os.environ.get(env):
+        data = _parse_hex(os.environ[env], what)
+    else:
+        return None
+
+    if len(data) != size:
+        raise _Error("{} must be {} bytes long".format(what, size))
+    return data
+
+
+def _size(text):
+    """Parse a size like 64, 16K, 1M or 256M."""
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+    text = text.strip().upper()
+    if text[-1:] in units:
+        return int(text[:-1]) * units[text[-1]]
+    return int(text)
+
+
+def _binary(stream):
+    return getattr(stream, "buffer", stream)  # Python 2 has no buffer
+
+
+def _open(path, mode, opened):
+    stream = open(path, mode)
+    opened.append(stream)
+    return stream
+
+
+def _temporary(path):
+    """Create an empty file next to `path` with the permissions a new (or
+    the existing) file at `path` would have."""
+    directory, name = os.path.split(os.path.abspath(path))
+    handle, temporary = tempfile.mkstemp(prefix="." + name + ".",
+                                         dir=directory)
+    os.close(handle)
+    if os.path.exists(path):
+        shutil.copymode(path, temporary)
+    else:
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(temporary, 0o666 & ~umask)
+    return temporary
+
+
+def _read_exact(src, size):
+    data = b""
+    while len(data) < size:
+        chunk = src.read(size - len(data))
+        if not chunk:
+            raise _Error("The input ended before the IV")
+        data += chunk
+    return data
+
+
+def _transform(cipher, decrypt, workers):
+    """Get the function processing one aligned chunk."""
+    if workers > 1:
+        from . import parallel  # pylint: disable=import-outside-toplevel
+        return lambda view: parallel.encrypt(cipher, view, workers, decrypt)
+
+    func = cipher.decrypt_into if decrypt else cipher.encrypt_into
+
+    def transform(view):
+        func(view, view)
+        return view
+    return transform
+
+
+def _copy(src, dst, transform, unit, chunk_size, finish=None, hold=0):
+    """Process `src` into `dst` in chunks, incomplete blocks wait for more
+    input.
+
+    With padding, `finish` pads (or unpads) the end of the input in place
+    and returns its new length. `hold` bytes are kept back for it while
+    more input follows.
+
+    :return: The amount of bytes written.
+    """
+    buffer = bytearray(chunk_size + unit)
+    view = memoryview(buffer)
+    readinto = getattr(src, "readinto", None)
+
+    total = pending = 0
+    while True:
+        if readinto is not None:
+            size = readinto(view[pending:pending + chunk_size]) or 0
+        else:
+            data = src.read(chunk_size)
+            size = len(data)
+            view[pending:pending + size] = data
+
+        available = pending + size
+        if size:
+            end = max(0, available - (available % unit or hold))
+        elif finish is not None:
+            end = finish(view, available)
+            if end:
+                dst.write(view[:end])
+            return total + end
+        else:
+            _check_end(unit, available)
+            end = available
+
+        if end:
+            dst.write(transform(view[:end]))
+            total += end
+        pending = available - end
+        view[:pending] = view[end:available]
+
+        if not size:
+            return total
+
+
+def _parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m xtea",
+        description="Encrypt or decrypt files and pipes with XTEA.")
+    parser.add_argument("operation", choices=("encrypt", "decrypt"))
+    parser.add_argument("-m", "--mode", choices=sorted(MODES), default="ctr",
+                        help="mode of operation (default: ctr)")
+    parser.add_argument("-i", "--input", default="-",
+                        help="input file (default: stdin)")
+    parser.add_argument("-o", "--output", default="-",
+                        help="output file (default: stdout)")
+
+    secrets = parser.add_argument_group("key and IV")
+    secrets.add_argument("--key-file", metavar="FILE",
+                         help="read the key from FILE")
+    secrets.add_argument("--key-env", metavar="NAME", default="XTEA_KEY",
+                         help="read the key as hexadecimal digits from the "
+                              "environment variable NAME (default: "
+                              "XTEA_KEY)")
+    secrets.add_argument("--iv", metavar="HEX",
+                         help="the IV or initial counter block, it is not "
+                              "written to or read from the data then")
+    secrets.add_argument("--iv-file", metavar="FILE",
+                         help="read the IV from FILE")
+    secrets.add_argument("--iv-env", metavar="NAME",
+                         help="read the IV from the environment variable "
+                              "NAME")
+
+    cipher = parser.add_argument_group("cipher")
+    cipher.add_argument("--padding", choices=sorted(PADDINGS),
+                        help="padding of ECB and CBC mode (default: pkcs7 "
+                             "for them, none otherwise)")
+    cipher.add_argument("--segment-size", type=int, default=8,
+                        help="CFB segment size in bits (default: 8)")
+    cipher.add_argument("--rounds", type=int, default=64,
+                        help="rounds of XTEA (default: 64)")
+    cipher.add_argument("--endian", choices=sorted(_ENDIAN), default="big",
+                        help="byte order of the words of a block "
+                             "(default: big)")
+
+    speed = parser.add_argument_group("processing")
+    speed.add_argument("--chunk-size", type=_size, default=DEFAULT_CHUNK_SIZE,
+                       help="bytes processed at once, K, M and G suffixes "
+                            "are allowed (default: 1M)")
+    speed.add_argument("-j", "--workers", type=int, default=1,
+                       help="use multiple cores for ECB, CTR and CBC/CFB "
+                            "decryption (default: 1)")
+    speed.add_argument("-q", "--quiet", action="store_true",
+                       help="do not print the throughput summary")
+    return parser
+
+
+def _run(args):
+    key = _secret(args.key_file, args.key_env, xtea.key_size, "The key")
+    if key is None:
+        raise _Error("No key given, use --key-file or set {}".format(
+            args.key_env))
+
+    mode = MODES[args.mode]
+    decrypt = args.operation == "decrypt"
+    padding = PADDINGS[args.padding or
+                       ("pkcs7" if mode in (MODE_ECB, MODE_CBC) else "none")]
+
+    opened, temporary, completed = [], None, False
+    try:
+        src = _binary(sys.stdin) if args.input == "-" \
+            else _open(args.input, "rb", opened)
+        if args.output == "-":
+            dst = _binary(sys.stdout)
+        else:
+            temporary = _temporary(args.output)
+            dst = _open(temporary, "wb", opened)
+
+        iv, new_iv = b"\0" * xtea.block_size, False
+        if mode != MODE_ECB:
+            if args.iv is not None:
+                iv = _parse_hex(args.iv, "The IV")
+            else:
+                iv = _secret(args.iv_file, args.iv_env, xtea.block_size,
+                             "The IV")
+            if iv is None and decrypt:
+                iv = _read_exact(src, xtea.block_size)
+            elif iv is None:
+                iv, new_iv = os.urandom(xtea.block_size), True
+            if len(iv) != xtea.block_size:
+                raise _Error("The IV must be {} bytes long".format(
+                    xtea.block_size))
+
+        cipher = xtea.new(key, mode=mode, IV=iv, counter=Counter(iv),
+                          segment_size=args.segment_size, rounds=args.rounds,
+                          endian=_ENDIAN[args.endian])
+        if new_iv:  # Only once the options turned out to be valid
+            dst.write(iv)
+        chunk_size = args.chunk_size
+        if args.workers > 1:  # Large enough for a shard per worker
+            from . import parallel  # pylint: disable=import-outside-toplevel
+            chunk_size = max(chunk_size,
+                             args.workers * parallel.MIN_SHARD_SIZE)
+        unit = _unit(cipher)
+        chunk_size = max(unit, chunk_size - chunk_size % unit)
+
+        finish, hold = None, 0
+        if padding is not None:  # Only the end of the input is padded
+            func = cipher.decrypt_into if decrypt else cipher.encrypt_into
+            finish = lambda view, total: _finish(  # noqa: E731
+                func, view, total, decrypt, padding)
+            hold = unit if decrypt else 0
+
+        start = _TIMER()
+        total = _copy(src, dst, _transform(cipher, decrypt, args.workers),
+                      unit, chunk_size, finish, hold)
+        dst.flush()
+        completed = True
+        return total, _TIMER() - start
+    finally:
+        for stream in opened:
+            stream.close()
+        if temporary is not None and completed:
+            _replace(temporary, args.output)
+        elif temporary is not None:
+            os.remove(temporary)
+
+
+def main(argv=None):
+    """Command line interface, see ``python -m xtea --help``."""
+    parser = _parser()
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be positive")
+    if args.rounds < 1:
+        parser.error("--rounds must be positive")
+    if not 8 <= args.segment_size <= 64 or args.segment_size % 8:
+        parser.error("--segment-size must be a multiple of 8 between 8 "
+                     "and 64")
+    if args.padding not in (None, "none") and args.mode not in ("ecb", "cbc"):
+        parser.error("--padding requires ECB or CBC mode")
+
+    try:
+        total, seconds = _run(args)
+    except (_Error, IOError, ValueError) as error:
+        print("{}: error: {}".format(parser.prog, error), file=sys.stderr)
+        return 1
+
+    if not args.quiet:
+        print("{}ed {} bytes in {:.3f} s ({:.1f} MB/s)".format(
+            args.operation, total, seconds,
+            total / max(seconds, 1e-9) / 1e6), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+"""
+NumPy implementation of the modes of operation without dependencies
+between blocks.
+
+Used if the C extension is not available. It provides a subset of the bulk
+functions of the C extension with the same signatures: ECB, CBC and CFB
+decryption and the CTR keystream. The rounds run on arrays of all blocks at
+once. OFB as well as CBC and CFB encryption are sequential, their pure
+Python versions are used.
+"""
+
+from __future__ import absolute_import
+
+import struct
+
+import numpy
+
+from numpy.lib.stride_tricks import as_strided
+
+from ._python import encipher, decipher
+from ._python import ofb  # noqa: F401 pylint: disable=unused-import
+from ._python import (  # noqa: F401 pylint: disable=unused-import
+    cbc_encrypt, cfb_encrypt, cfb_segment_encrypt)
+
+BLOCK_SIZE = 8
+
+#: Below this amount of blocks, the overhead of NumPy outweighs its gain and
+#: blocks are processed one at a time in Python.
+THRESHOLD = 32
+
+#: Segments decrypted at once by :py:func:`cfb_segment_decrypt`, which
+#: bounds its temporary arrays (a block per segment).
+SEGMENT_CHUNK = 1 << 16
+
+
+def _dtype(big_endian):
+    return ">u4" if big_endian else "<u4"
+
+
+def _check_blocks(data):
+    if len(data) % BLOCK_SIZE:
+        raise ValueError("Input length must be a multiple of block_size")
+
+
+def _check_iv(iv):
+    if len(iv) != BLOCK_SIZE:
+        raise ValueError("IV length must be block_size")
+
+
+def _xor(one, two):
+    """xor two byte strings of equal length."""
+    if not len(one):
+        return b""
+    return numpy.bitwise_xor(numpy.frombuffer(one, numpy.uint8),
+                             numpy.frombuffer(two, numpy.uint8)).tobytes()
+
+
+def _scalar(func, schedule, data, big_endian):
+    """Process blocks one at a time."""
+    fmt = ("!" if big_endian else "<") + "2L"
+    return b"".join(
+        struct.pack(fmt, *func(schedule, struct.unpack_from(fmt, data, i)))
+        for i in range(0, len(data), BLOCK_SIZE))
+
+
+def _encrypt_blocks(schedule, data, big_endian):
+    if len(data) < THRESHOLD * BLOCK_SIZE:
+        return _scalar(encipher, schedule, data, big_endian)
+
+    words = numpy.frombuffer(data, _dtype(big_endian)).astype(numpy.uint32)
+    v0, v1 = words[0::2], words[1::2]
+    t, u = numpy.empty_like(v0), numpy.empty_like(v0)
+
+    keys = iter(schedule)
+    for first, second in zip(keys, keys):
+        numpy.left_shift(v1, 4, out=t)
+        t ^= numpy.right_shift(v1, 5, out=u)
+        t += v1
+        t ^= first
+        v0 += t
+
+        numpy.left_shift(v0, 4, out=t)
+        t ^= numpy.right_shift(v0, 5, out=u)
+        t += v0
+        t ^= second
+        v1 += t
+
+    return words.astype(_dtype(big_endian)).tobytes()
+
+
+def _decrypt_blocks(schedule, data, big_endian):
+    if len(data) < THRESHOLD * BLOCK_SIZE:
+        return _scalar(decipher, schedule, data, big_endian)
+
+    words = numpy.frombuffer(data, _dtype(big_endian)).astype(numpy.uint32)
+    v0, v1 = words[0::2], words[1::2]
+    t, u = numpy.empty_like(v0), numpy.empty_like(v0)
+
+    keys = reversed(schedule)
+    for second, first in zip(keys, keys):
+        numpy.left_shift(v0, 4, out=t)
+        t ^= numpy.right_shift(v0, 5, out=u)
+        t += v0
+        t ^= second
+        v1 -= t
+
+        numpy.left_shift(v1, 4, out=t)
+        t ^= numpy.right_shift(v1, 5, out=u)
+        t += v1
+        t ^= first
+        v0 -= t
+
+    return words.astype(_dtype(big_endian)).tobytes()
+
+
+def ecb_encrypt(schedule, data, big_endian=True):
+    """Encrypt a buffer in ECB mode."""
+    _check_blocks(data)
+    return _encrypt_blocks(schedule, data, big_endian)
+
+
+def ecb_decrypt(schedule, data, big_endian=True):
+    """Decrypt a buffer in ECB mode."""
+    _check_blocks(data)
+    return _decrypt_blocks(schedule, data, big_endian)
+
+
+def cbc_decrypt(schedule, iv, data, big_endian=True):
+    """Decrypt a buffer in CBC mode, returns (data, iv)."""
+    _check_iv(iv)
+    _check_blocks(data)
+    if not len(data):
+        return b"", bytes(iv)
+
+    data = bytes(data)
+    plain = _decrypt_blocks(schedule, data, big_endian)
+    return _xor(plain, bytes(iv) + data[:-BLOCK_SIZE]), data[-BLOCK_SIZE:]
+
+
+def cfb_decrypt(schedule, iv, data, big_endian=True):
+    """Decrypt a buffer in CFB-64 mode, returns (data, iv)."""
+    _check_iv(iv)
+    _check_blocks(data)
+    if not len(data):
+        return b"", bytes(iv)
+
+    data = bytes(data)
+    keystream = _encrypt_blocks(schedule, bytes(iv) + data[:-BLOCK_SIZE],
+                                big_endian)
+    return _xor(keystream, data), data[-BLOCK_SIZE:]
+
+
+def cfb_segment_decrypt(schedule, iv, segment_size, data, big_endian=True):
+    """Decrypt a buffer in CFB mode with segments of 8 to 64 bits, returns
+    (data, iv)."""
+    _check_iv(iv)
+    if not 8 <= segment_size <= 8 * BLOCK_SIZE or segment_size % 8:
+        raise ValueError("segment_size must be a multiple of 8 between 8 "
+                         "and 64")
+    size = segment_size // 8
+    if len(data) % size:
+        raise ValueError("Input length must be a multiple of segment_size/8")
+
+    results, register = [], bytes(iv)
+    step = SEGMENT_CHUNK * size
+    for start in range(0, len(data), step):
+        history = register + bytes(data[start:start + step])
+        count = (len(history) - BLOCK_SIZE) // size
+        array = numpy.frombuffer(history, numpy.uint8)
+        # The shift register of segment i is history[i * size:i * size + 8]
+        registers = as_strided(array, shape=(count, BLOCK_SIZE),
+                               strides=(size, 1))
+        keystream = numpy.frombuffer(
+            _encrypt_blocks(schedule, registers.tobytes(), big_endian),
+            numpy.uint8).reshape(count, BLOCK_SIZE)[:, :size]
+        results.append(numpy.bitwise_xor(
+            keystream, array[BLOCK_SIZE:].reshape(count, size)).tobytes())
+        register = history[-BLOCK_SIZE:]
+    return b"".join(results), register
+
+
+def ctr(schedule, block, used, counters, data, big_endian=True):
+    """Apply the CTR keystream, returns (data, block, used)."""
+    _check_iv(block)
+    if not 0 <= used <= BLOCK_SIZE:
+        raise ValueError("used must be in range(9)")
+
+    length = len(data)
+    head = min(BLOCK_SIZE - used, length)
+    count = -(-(length - head) // BLOCK_SIZE)
+    if len(counters) < count * BLOCK_SIZE:
+        raise ValueError("Not enough counter blocks")
+
+    keystream = bytes(block[used:used + head])
+    if count:
+        keystream += _encrypt_blocks(
+            schedule, counters[:count * BLOCK_SIZE], big_endian)
+        block = keystream[-BLOCK_SIZE:]
+        used = length - head - (count - 1) * BLOCK_SIZE
+    else:
+        used += head
+
+    return _xor(data, keystream[:length]), bytes(block), used
@@ -0,0 +1,326 @@
+"""
+Pure Python implementation of the XTEA block function.
+
+Used if the C extension is not available. Besides the block function, it
+provides the modes of operation with the signatures of the C extension, so
+their state is kept the same way with every engine.
+
+The block functions are generated per key schedule: straight-line code
+without a loop over the rounds, with the round keys bound to the function.
+The code is compiled once per round count, binding the keys of a new
+schedule only creates a function object.
+"""
+
+import array
+import struct
+import types
+
+BLOCK_SIZE = 8
+
+#: Type code of the round keys, at least 32 bit wide.
+WORD = "I" if array.array("I").itemsize >= 4 else "L"
+
+#: Schedules with more cycles use a loop instead of generated functions.
+UNROLL_LIMIT = 64
+
+_TEMPLATES = {}  # Code objects by (cycles, decrypt)
+
+# Variable names are from from the reference implementation
+# pylint: disable=invalid-name,redefined-builtin
+
+
+class Schedule(array.array):
+    """Round keys, with the block functions generated on first use."""
+
+    __slots__ = ("encipher", "decipher")
+
+
+def key_schedule(k, n=32):
+    """Precompute the round keys `sum + k[...]` of all n cycles.
+
+    The two keys of every cycle follow each other in a flat array of words,
+    which takes a fraction of the memory of a tuple of integers.
+    """
+    schedule = Schedule(WORD)
+
+    sum, delta, mask = 0, 0x9e3779b9, 0xffffffff
+    for _ in range(n):
+        schedule.append((sum + k[sum & 3]) & mask)
+        sum = (sum + delta) & mask
+        schedule.append((sum + k[sum >> 11 & 3]) & mask)
+
+    return schedule
+
+
+def _template(cycles, decrypt):
+    """Compile the unrolled block function for `cycles` cycles.
+
+    The round keys are the default values of the parameters k0, k1, ...,
+    which are as fast to read as local variables.
+    """
+    key = (cycles, decrypt)
+    if key not in _TEMPLATES:
+        lines = []
+        for i in range(cycles):
+            if decrypt:
+                i = cycles - 1 - i
+                lines.append("v1 = (v1 - (((v0 << 4 ^ v0 >> 5) + v0) "
+                             "^ k{})) & 4294967295".format(2 * i + 1))
+                lines.append("v0 = (v0 - (((v1 << 4 ^ v1 >> 5) + v1) "
+                             "^ k{})) & 4294967295".format(2 * i))
+            else:
+                lines.append("v0 = (v0 + (((v1 << 4 ^ v1 >> 5) + v1) "
+                             "^ k{})) & 4294967295".format(2 * i))
+                lines.append("v1 = (v1 + (((v0 << 4 ^ v0 >> 5) + v0) "
+                             "^ k{})) & 4294967295".format(2 * i + 1))
+
+        params = ["v0", "v1"] + ["k{}".format(i) for i in range(2 * cycles)]
+        source = "def block({}):\n{}    return v0, v1\n".format(
+            ", ".join(params), "".join("    " + line + "\n"
+                                       for line in lines))
+        namespace = {}
+        exec(compile(source, "<xtea cycles={}>".format(cycles),  # nosec
+                     "exec"), namespace)  # pylint: disable=exec-used
+        _TEMPLATES[key] = namespace["block"].__code__
+    return _TEMPLATES[key]
+
+
+def _generate(schedule, decrypt):
+    """Get the block function of `schedule`, it is kept on the schedule."""
+    if len(schedule) // 2 > UNROLL_LIMIT:
+        loop = _decipher_loop if decrypt else _encipher_loop
+        func = lambda v0, v1: loop(schedule, v0, v1)  # noqa: E731
+    else:
+        # Both functions share the round keys as integer objects
+        other = getattr(schedule, "encipher" if decrypt else "decipher", None)
+        keys = getattr(other, "__defaults__", None) or tuple(schedule)
+        name = "decipher" if decrypt else "encipher"
+        func = types.FunctionType(_template(len(schedule) // 2, decrypt),
+                                  {}, name, keys)
+
+    if isinstance(schedule, Schedule):
+        setattr(schedule, "decipher" if decrypt else "encipher", func)
+    return func
+
+
+def _encipher_loop(schedule, v0, v1):
+    mask, words = 0xffffffff, iter(schedule)
+    for first, second in zip(words, words):
+        v0 = (v0 + (((v1 << 4 ^ v1 >> 5) + v1) ^ first)) & mask
+        v1 = (v1 + (((v0 << 4 ^ v0 >> 5) + v0) ^ second)) & mask
+    return v0, v1
+
+
+def _decipher_loop(schedule, v0, v1):
+    mask, words = 0xffffffff, reversed(schedule)
+    for second, first in zip(words, words):
+        v1 = (v1 - (((v0 << 4 ^ v0 >> 5) + v0) ^ second)) & mask
+        v0 = (v0 - (((v1 << 4 ^ v1 >> 5) + v1) ^ first)) & mask
+    return v0, v1
+
+
+def encipher(schedule, v):
+    """Encrypt a block given as two integers."""
+    try:
+        return schedule.encipher(*v)
+    except AttributeError:
+        return _generate(schedule, False)(*v)
+
+
+def decipher(schedule, v):
+    """Decrypt a block given as two integers."""
+    try:
+        return schedule.decipher(*v)
+    except AttributeError:
+        return _generate(schedule, True)(*v)
+
+
+def encrypt_block_bytes(schedule, block, big_endian=True):
+    """Encrypt a block of 8 bytes."""
+    fmt = ("!" if big_endian else "<") + "2L"
+    return struct.pack(fmt, *encipher(schedule, struct.unpack(fmt, block)))
+
+
+def decrypt_block_bytes(schedule, block, big_endian=True):
+    """Decrypt a block of 8 bytes."""
+    fmt = ("!" if big_endian else "<") + "2L"
+    return struct.pack(fmt, *decipher(schedule, struct.unpack(fmt, block)))
+
+
+def _xor(one, two):
+    """xor two byte strings, up to the length of the shorter one."""
+    return bytes(bytearray(x ^ y for x, y in zip(bytearray(one),
+                                                 bytearray(two))))
+
+
+def _blocks(data):
+    """Split a buffer into blocks of bytes."""
+    if len(data) % BLOCK_SIZE:
+        raise ValueError("Input length must be a multiple of block_size")
+    data = bytearray(data)
+    return [bytes(data[i:i + BLOCK_SIZE])
+            for i in range(0, len(data), BLOCK_SIZE)]
+
+
+def _check_iv(iv):
+    if len(iv) != BLOCK_SIZE:
+        raise ValueError("IV length must be block_size")
+
+
+def ecb_encrypt(schedule, data, big_endian=True):
+    """Encrypt a buffer in ECB mode."""
+    return b"".join(encrypt_block_bytes(schedule, block, big_endian)
+                    for block in _blocks(data))
+
+
+def ecb_decrypt(schedule, data, big_endian=True):
+    """Decrypt a buffer in ECB mode."""
+    return b"".join(decrypt_block_bytes(schedule, block, big_endian)
+                    for block in _blocks(data))
+
+
+def cbc_encrypt(schedule, iv, data, big_endian=True):
+    """Encrypt a buffer in CBC mode, returns (data, iv)."""
+    _check_iv(iv)
+    results = []
+    for block in _blocks(data):
+        iv = encrypt_block_bytes(schedule, _xor(iv, block), big_endian)
+        results.append(iv)
+    return b"".join(results), iv
+
+
+def cbc_decrypt(schedule, iv, data, big_endian=True):
+    """Decrypt a buffer in CBC mode, returns (data, iv)."""
+    _check_iv(iv)
+    results = []
+    for block in _blocks(data):
+        results.append(_xor(iv, decrypt_block_bytes(schedule, block,
+                                                    big_endian)))
+        iv = block
+    return b"".join(results), iv
+
+
+def cfb_encrypt(schedule, iv, data, big_endian=True):
+    """Encrypt a buffer in CFB mode (64 bit segments), returns (data, iv)."""
+    _check_iv(iv)
+    results = []
+    for block in _blocks(data):
+        iv = _xor(encrypt_block_bytes(schedule, iv, big_endian), block)
+        results.append(iv)
+    return b"".join(results), iv
+
+
+def cfb_decrypt(schedule, iv, data, big_endian=True):
+    """Decrypt a buffer in CFB mode (64 bit segments), returns (data, iv)."""
+    _check_iv(iv)
+    results = []
+    for block in _blocks(data):
+        results.append(_xor(encrypt_block_bytes(schedule, iv, big_endian),
+                            block))
+        iv = block
+    return b"".join(results), iv
+
+
+def cbc_mac(schedule, state, data, big_endian=True):
+    """Chain data into a CBC-MAC state, returns the new state."""
+    if len(state) != BLOCK_SIZE:
+        raise ValueError("IV length must be block_size")
+    if len(data) % BLOCK_SIZE:
+        raise ValueError("Input length must be a multiple of block_size")
+
+    state = bytearray(state)
+    data = bytearray(data)
+    for i in range(0, len(data), BLOCK_SIZE):
+        for j in range(BLOCK_SIZE):
+            state[j] ^= data[i + j]
+        state = bytearray(encrypt_block_bytes(schedule, bytes(state),
+                                              big_endian))
+    return bytes(state)
+
+
+def eax_crypt(schedule, counter, state, data, decrypt=False, big_endian=True):
+    """Apply EAX's CTR mode and chain the ciphertext (except for the last
+    block) into a CBC-MAC state, returns (data, counter, state)."""
+    if len(counter) != BLOCK_SIZE:
+        raise ValueError("IV length must be block_size")
+    if len(data) % BLOCK_SIZE:
+        raise ValueError("Input length must be a multiple of block_size")
+
+    value, = struct.unpack(">Q", counter)
+    keystream = b"".join(
+        encrypt_block_bytes(schedule, struct.pack(">Q", (value + i) % 2**64),
+                            big_endian)
+        for i in range(len(data) // BLOCK_SIZE))
+    result = _xor(data, keystream)
+
+    chained = (data if decrypt else result)[:-BLOCK_SIZE]
+    counter = struct.pack(">Q", (value + len(data) // BLOCK_SIZE) % 2**64)
+    return result, counter, cbc_mac(schedule, state, chained, big_endian)
+
+
+def _apply_keystream(schedule, block, used, data, big_endian, counters=None):
+    """xor data with the OFB or CTR keystream, see `ofb` and `ctr`."""
+    length = len(data)
+    head = min(BLOCK_SIZE - used, length)
+    count = -(-(length - head) // BLOCK_SIZE)
+
+    if block is None or len(block) != BLOCK_SIZE:
+        raise ValueError("IV length must be block_size")
+    if not 0 <= used <= BLOCK_SIZE:
+        raise ValueError("used must be in range(9)")
+    if counters is not None and len(counters) < count * BLOCK_SIZE:
+        raise ValueError("Not enough counter blocks")
+
+    keystream = [bytes(block[used:used + head])]
+    for i in range(count):
+        source = block if counters is None else \
+            counters[i * BLOCK_SIZE:(i + 1) * BLOCK_SIZE]
+        block = encrypt_block_bytes(schedule, source, big_endian)
+        keystream.append(block)
+
+    used = length - head - (count - 1) * BLOCK_SIZE if count else used + head
+    return _xor(data, b"".join(keystream)), bytes(block), used
+
+
+def ofb(schedule, block, used, data, big_endian=True):
+    """Apply the OFB keystream, returns (data, block, used)."""
+    return _apply_keystream(schedule, block, used, data, big_endian)
+
+
+def ctr(schedule, block, used, counters, data, big_endian=True):
+    """Apply the CTR keystream, returns (data, block, used)."""
+    return _apply_keystream(schedule, block, used, data, big_endian,
+                            counters)
+
+
+def _cfb_segments(schedule, iv, segment_size, data, decrypt, big_endian):
+    """Run CFB mode with a shift register, see `cfb_segment_encrypt`."""
+    if len(iv) != BLOCK_SIZE:
+        raise ValueError("IV length must be block_size")
+    if not 8 <= segment_size <= 8 * BLOCK_SIZE or segment_size % 8:
+        raise ValueError("segment_size must be a multiple of 8 between 8 "
+                         "and 64")
+    size = segment_size // 8
+    if len(data) % size:
+        raise ValueError("Input length must be a multiple of segment_size/8")
+
+    data, register, out = bytearray(data), bytes(iv), []
+    for i in range(0, len(data), size):
+        segment = data[i:i + size]
+        keystream = encrypt_block_bytes(schedule, register, big_endian)
+        result = _xor(segment, keystream)
+        register = register[size:] + (bytes(segment) if decrypt else result)
+        out.append(result)
+    return b"".join(out), register
+
+
+def cfb_segment_encrypt(schedule, iv, segment_size, data, big_endian=True):
+    """Encrypt a buffer in CFB mode with segments of 8 to 64 bits, returns
+    (data, iv)."""
+    return _cfb_segments(schedule, iv, segment_size, data, False, big_endian)
+
+
+def cfb_segment_decrypt(schedule, iv, segment_size, data, big_endian=True):
+    """Decrypt a buffer in CFB mode with segments of 8 to 64 bits, returns
+    (data, iv)."""
+    return _cfb_segments(schedule, iv, segment_size, data, True, big_endian)
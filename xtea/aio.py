@@ -0,0 +1,195 @@
+"""
+Encryption for :py:mod:`asyncio` applications.
+
+Small inputs are processed inline, larger ones in a shared pool of threads
+so the event loop is not blocked. The C extension releases the GIL, so the
+loop keeps running while the data is processed.
+
+Calls with the same cipher object on the same event loop are processed in
+the order they were made, the state of the mode of operation stays
+consistent across awaits.
+
+Example:
+
+    >>> import asyncio, xtea
+    >>> from xtea import aio
+    >>> from xtea.counter import Counter
+    >>> key, nonce = b" " * 16, b"12345678"  # Never use these values
+    >>> async def main():
+    ...     cipher = xtea.new(key, mode=xtea.MODE_CTR,
+    ...                       counter=Counter(nonce))
+    ...     return await aio.encrypt(cipher, b"This is a text. " * 10000)
+    >>> loop = asyncio.new_event_loop()
+    >>> encrypted = loop.run_until_complete(main())
+    >>> loop.close()
+    >>> cipher = xtea.new(key, mode=xtea.MODE_CTR, counter=Counter(nonce))
+    >>> cipher.decrypt(encrypted) == b"This is a text. " * 10000
+    True
+
+.. note:: This module requires Python 3.
+"""
+
+import asyncio
+import threading
+import weakref
+
+from concurrent.futures import ThreadPoolExecutor
+
+from .stream import _check_end, _unit
+
+__all__ = ("encrypt", "decrypt", "shutdown",
+           "AsyncEncryptingReader", "AsyncEncryptingWriter")
+
+#: Inputs up to this amount of bytes are processed inline.
+INLINE_THRESHOLD = 1 << 16
+
+_EXECUTOR = None
+_LOCK = threading.Lock()
+_CIPHER_LOCKS = weakref.WeakKeyDictionary()  # Event loop -> cipher -> lock
+
+# The running loop, get_event_loop returns it in coroutines before 3.7
+_running_loop = getattr(asyncio, "get_running_loop", asyncio.get_event_loop)
+
+
+def _executor():
+    """Get the shared pool of threads."""
+    global _EXECUTOR  # pylint: disable=global-statement
+    with _LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor()
+        return _EXECUTOR
+
+
+def shutdown():
+    """Shut down the shared pool of threads, it is recreated when needed."""
+    global _EXECUTOR  # pylint: disable=global-statement
+    with _LOCK:
+        executor, _EXECUTOR = _EXECUTOR, None
+    if executor is not None:
+        executor.shutdown()
+
+
+def _check_padding(cipher):
+    if getattr(cipher, "padding", None) is not None:
+        raise ValueError("Streams of padded messages are not supported, "
+                         "use xtea.aio.encrypt")
+
+
+def _cipher_lock(cipher):
+    """Get the lock ordering the calls with `cipher` on the running loop.
+
+    Locks belong to an event loop, so there is one per loop and cipher.
+    """
+    locks = _CIPHER_LOCKS.get(_running_loop())
+    if locks is None:
+        locks = _CIPHER_LOCKS[_running_loop()] = weakref.WeakKeyDictionary()
+    lock = locks.get(cipher)
+    if lock is None:
+        lock = locks[cipher] = asyncio.Lock()
+    return lock
+
+
+async def encrypt(cipher, data, decrypt=False):
+    """Encrypt `data` with `cipher` without blocking the event loop.
+
+    :param cipher: A :py:class:`xtea.XTEACipher` object.
+    :param data: A bytes-like object.
+    :param bool decrypt: Decrypt instead of encrypting.
+
+    :rtype: bytes
+    """
+    func = cipher.decrypt if decrypt else cipher.encrypt
+
+    # Acquiring a free lock does not suspend, small inputs still run
+    # without a context switch unless earlier calls are waiting
+    async with _cipher_lock(cipher):
+        if len(data) <= INLINE_THRESHOLD:
+            return func(data)
+        return await _running_loop().run_in_executor(_executor(), func, data)
+
+
+async def decrypt(cipher, data):
+    """Decrypt `data` with `cipher` without blocking the event loop.
+
+    See :py:func:`encrypt`.
+
+    :rtype: bytes
+    """
+    return await encrypt(cipher, data, True)
+
+
+class AsyncEncryptingReader(object):
+    """Read the encrypted (or decrypted) data of an
+    :py:class:`asyncio.StreamReader`.
+
+    :param reader: The stream with the input.
+    :param cipher: A fresh :py:class:`xtea.XTEACipher` object without
+        padding.
+    :param bool decrypt: Decrypt instead of encrypting.
+    """
+
+    def __init__(self, reader, cipher, decrypt=False):
+        self.reader = reader
+        self.cipher = cipher
+        self.decrypt = decrypt
+        self._unit = _unit(cipher)
+        _check_padding(cipher)
+        self._pending = b""  # Input not processed yet (incomplete block)
+
+    async def read(self, n=-1):
+        """Read up to `n` bytes, or everything if `n` is negative.
+
+        Less than `n` bytes may be returned to keep blocks complete.
+        An empty result means the end of the stream.
+        """
+        while True:
+            data = await self.reader.read(n)
+            total = self._pending + data
+
+            if data:
+                end = len(total) - len(total) % self._unit
+            else:
+                _check_end(self._unit, len(total))
+                end = len(total)
+
+            self._pending = total[end:]
+            if end or not data:
+                return await encrypt(self.cipher, total[:end], self.decrypt)
+
+
+class AsyncEncryptingWriter(object):
+    """Encrypt (or decrypt) data into an :py:class:`asyncio.StreamWriter`.
+
+    :param writer: The stream receiving the output.
+    :param cipher: A fresh :py:class:`xtea.XTEACipher` object without
+        padding.
+    :param bool decrypt: Decrypt instead of encrypting.
+    """
+
+    def __init__(self, writer, cipher, decrypt=False):
+        self.writer = writer
+        self.cipher = cipher
+        self.decrypt = decrypt
+        self._unit = _unit(cipher)
+        _check_padding(cipher)
+        self._pending = b""  # Input not processed yet (incomplete block)
+
+    async def write(self, data):
+        """Process `data` and write it to the stream, waiting for the
+        stream to drain."""
+        total = self._pending + bytes(data)
+        end = len(total) - len(total) % self._unit
+        self._pending = total[end:]
+
+        if end:
+            self.writer.write(
+                await encrypt(self.cipher, total[:end], self.decrypt))
+            await self.writer.drain()
+
+    async def close(self):
+        """Check that the input ended on a complete block and close the
+        stream."""
+        _check_end(self._unit, len(self._pending))
+        self.writer.close()
+        if hasattr(self.writer, "wait_closed"):  # Python 3.7+
+            await self.writer.wait_closed()
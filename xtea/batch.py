@@ -0,0 +1,134 @@
+"""
+Encryption of many small independent messages under the same key.
+
+Every message has its own IV (or, in CTR mode, initial counter block as for
+:py:class:`xtea.counter.Counter`). With the C extension, a whole batch is
+processed in a single native call, without creating a cipher object per
+message. Batches are passed around packed into one buffer with an array of
+offsets, see :py:class:`Packed`.
+
+Example:
+
+    >>> import xtea
+    >>> key = b" " * 16  # Never use this key
+    >>> items = [(b"12345678", b"This is a text. "), (b"abcdefgh", b"Short")]
+    >>> batch = xtea.encrypt_many(key, xtea.MODE_CTR, items)
+    >>> len(batch.data), list(batch.offsets)
+    (21, [0, 16, 21])
+    >>> xtea.decrypt_many(key, xtea.MODE_CTR, batch).split()
+    [b'This is a text. ', b'Short']
+"""
+
+import array
+
+from collections import namedtuple
+
+from . import MODE_CFB, XTEACipher, _big_endian, _get_schedule, _load_engine
+from . import block_size
+from .counter import Counter
+
+__all__ = ("Packed", "pack", "encrypt_many", "decrypt_many")
+
+try:
+    array.array("q")
+    _OFFSET_TYPE = "q"
+except ValueError:  # Python 2 has no long long, only the pure engine there
+    _OFFSET_TYPE = "l"
+
+
+class Packed(namedtuple("Packed", "ivs data offsets")):
+    """Messages packed into one buffer.
+
+    :var bytes ivs: One block per message.
+    :var bytes data: All messages concatenated.
+    :var array.array offsets: Message i is ``data[offsets[i]:offsets[i +
+        1]]``, an array of 64 bit integers (type code ``"q"``, ``"l"`` on
+        Python 2).
+    """
+
+    __slots__ = ()
+
+    def split(self):
+        """Get the messages as a list.
+
+        :rtype: list
+        """
+        offsets = self.offsets
+        return [self.data[offsets[i]:offsets[i + 1]]
+                for i in range(len(offsets) - 1)]
+
+
+def pack(items):
+    """Pack an iterable of ``(iv, data)`` pairs.
+
+    The IV may be None in ECB mode.
+
+    :rtype: Packed
+    """
+    ivs, chunks, offsets = [], [], array.array(_OFFSET_TYPE, [0])
+    for iv, data in items:
+        iv = b"\0" * block_size if iv is None else bytes(iv)
+        if len(iv) != block_size:
+            raise ValueError("IV length must be block_size")
+        ivs.append(iv)
+        chunks.append(bytes(data))
+        offsets.append(offsets[-1] + len(chunks[-1]))
+    return Packed(b"".join(ivs), b"".join(chunks), offsets)
+
+
+def _each(key, mode, batch, decrypt, kwargs):
+    """Process the messages with one cipher object each."""
+    results = []
+    for i, message in enumerate(batch.split()):
+        iv = batch.ivs[i * block_size:(i + 1) * block_size]
+        cipher = XTEACipher(key, mode=mode, IV=iv, counter=Counter(iv),
+                            **kwargs)
+        results.append(cipher.decrypt(message) if decrypt
+                       else cipher.encrypt(message))
+    return b"".join(results)
+
+
+def encrypt_many(key, mode, items, decrypt=False, **kwargs):
+    """Encrypt many messages under the same key.
+
+    :param bytes key: The key, 16 bytes long.
+    :param int mode: The mode of operation, the IV of each message is used
+        as initial counter block in CTR mode.
+    :param items: An iterable of ``(iv, data)`` pairs or a
+        :py:class:`Packed` batch.
+    :param bool decrypt: Decrypt instead of encrypting.
+    :param kwargs: ``rounds``, ``endian`` and ``segment_size``, see
+        :py:func:`xtea.new`.
+
+    :return: The results, with the IVs and offsets of the input.
+    :rtype: Packed
+    """
+    batch = items if isinstance(items, Packed) else pack(items)
+    if len(key) != 16:
+        raise ValueError("Key length must be 16")
+    if kwargs.get("padding") is not None:
+        raise ValueError("Padding would change the offsets of a batch")
+
+    func = getattr(_load_engine(), "crypt_many", None)
+    big_endian = _big_endian(kwargs.get("endian", "!"))
+    segment_size = kwargs.get("segment_size", 8) if mode == MODE_CFB else 64
+    # Invalid segment sizes are reported by the cipher objects
+    if func is None or big_endian is None or \
+            segment_size not in range(8, 65, 8):
+        return batch._replace(data=_each(key, mode, batch, decrypt, kwargs))
+
+    schedule = _get_schedule(key, int(kwargs.get("rounds", 64)) // 2,
+                             kwargs.get("endian", "!"))
+    return batch._replace(data=func(schedule, mode, batch.ivs, batch.data,
+                                    batch.offsets, decrypt, big_endian,
+                                    segment_size))
+
+
+def decrypt_many(key, mode, items, **kwargs):
+    """Decrypt many messages under the same key.
+
+    See :py:func:`encrypt_many`.
+
+    :rtype: Packed
+    """
+    return encrypt_many(key, mode, items, True, **kwargs)
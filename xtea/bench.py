@@ -0,0 +1,295 @@
+"""
+Benchmark of the engines, modes of operation, round counts and input sizes.
+
+Run it with ``python -m xtea.bench``, see ``--help`` for the options. Every
+measurement reports the throughput and the latency of a single call, use
+``--json`` to store the results for comparisons between releases.
+``--import-time`` measures the time to import :py:mod:`xtea` instead.
+
+The engines are:
+
+* ``pep272``: the block-by-block loop of :py:mod:`pep272_encryption`,
+  calling the block function (from the C extension if available) once per
+  block. This is how every mode ran before the bulk engines existed.
+* ``python``: the pure Python engine, running ECB, CBC, CFB, OFB and CTR
+  in bulk with the signatures of the C extension.
+* ``numpy``: the NumPy engine (if NumPy is installed).
+* ``c``: the C extension (if it is built).
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from contextlib import contextmanager
+
+from pep272_encryption import PEP272Cipher
+
+import xtea
+
+from xtea import MODE_CBC, MODE_CFB, MODE_CTR, MODE_ECB, MODE_OFB
+from xtea.counter import Counter
+
+__all__ = ("MODES", "available_engines", "measure", "measure_import", "run",
+           "main")
+
+_TIMER = getattr(time, "perf_counter", time.time)
+
+#: Benchmarked modes by name, with the keyword arguments for
+#: :py:func:`xtea.new`.
+MODES = {
+    "ecb": dict(mode=MODE_ECB),
+    "cbc": dict(mode=MODE_CBC),
+    "cfb8": dict(mode=MODE_CFB, segment_size=8),
+    "cfb32": dict(mode=MODE_CFB, segment_size=32),
+    "cfb64": dict(mode=MODE_CFB, segment_size=64),
+    "ofb": dict(mode=MODE_OFB),
+    "ctr": dict(mode=MODE_CTR),
+}
+
+DEFAULT_SIZES = (8, 1 << 10, 1 << 16, 1 << 20)
+
+
+def available_engines():
+    """Get the names of the engines usable in this environment.
+
+    :rtype: list
+    """
+    engines = ["pep272", "python"]
+    try:
+        from . import _numpy  # noqa: F401 pylint: disable=unused-import
+    except ImportError:
+        pass
+    else:
+        engines.append("numpy")
+    if xtea._xtea is not None:  # pylint: disable=protected-access
+        engines.append("c")
+    return engines
+
+
+def _engine_module(name):
+    # pylint: disable=import-outside-toplevel
+    if name == "python":
+        from . import _python as module
+    elif name == "numpy":
+        from . import _numpy as module
+    elif name == "c":
+        module = xtea._xtea  # pylint: disable=protected-access
+    else:
+        raise ValueError("Unknown engine {!r}".format(name))
+    return module
+
+
+@contextmanager
+def _using(name):
+    """Select the engine of :py:class:`xtea.XTEACipher` temporarily.
+
+    The Python engines need the key schedule of the Python block function.
+    """
+    # pylint: disable=protected-access
+    names = ("_engine", "_key_schedule", "_encipher", "_decipher",
+             "_encrypt_block_bytes", "_decrypt_block_bytes")
+    previous = [getattr(xtea, attr) for attr in names]
+
+    if name != "pep272":
+        xtea._engine = _engine_module(name)
+    if name in ("python", "numpy"):
+        from . import _python  # pylint: disable=import-outside-toplevel
+        for attr in names[1:]:
+            setattr(xtea, attr, getattr(_python, attr.lstrip("_")))
+
+    try:
+        yield
+    finally:
+        for attr, value in zip(names, previous):
+            setattr(xtea, attr, value)
+
+
+def _new(mode, rounds):
+    return xtea.new(os.urandom(16), IV=os.urandom(8),
+                    counter=Counter(os.urandom(8)), rounds=rounds,
+                    **MODES[mode])
+
+
+def measure(engine, mode, size, rounds=64, min_time=0.2):
+    """Measure encryption of `size` bytes.
+
+    The input is encrypted repeatedly with the same cipher object until
+    `min_time` seconds have passed, at least once.
+
+    :return: The parameters and the results of the measurement.
+    :rtype: dict
+    """
+    data = os.urandom(size)
+    with _using(engine):
+        cipher = _new(mode, rounds)
+        func = cipher.encrypt
+        if engine == "pep272":
+            func = lambda data: PEP272Cipher.encrypt(cipher, data)  # noqa
+
+        calls, start = 0, _TIMER()
+        while True:
+            func(data)
+            calls += 1
+            elapsed = _TIMER() - start
+            if elapsed >= min_time:
+                break
+
+    return {
+        "engine": engine, "mode": mode, "rounds": rounds, "size": size,
+        "calls": calls, "seconds": elapsed,
+        "mb_per_s": size * calls / elapsed / 1e6,
+        "latency_us": elapsed / calls * 1e6,
+    }
+
+
+def measure_import(module="xtea", runs=5):
+    """Measure the time to import `module` in fresh interpreters.
+
+    The time is reported by ``python -X importtime`` (Python 3.7 and
+    newer), the fastest of `runs` interpreters is kept.
+
+    :return: The ``module``, the import time in ``microseconds`` and the
+        names of all ``modules`` imported along with it.
+    :rtype: dict
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [path for path in sys.path if path] +
+        [env.get("PYTHONPATH", "")]).rstrip(os.pathsep)
+
+    best, modules = None, []
+    for _ in range(runs):
+        output = subprocess.check_output(
+            [sys.executable, "-X", "importtime", "-c",
+             "import " + module], env=env, stderr=subprocess.STDOUT,
+            universal_newlines=True)
+        total, imported = None, []
+        for line in output.splitlines():
+            fields = line.split("|")
+            if line.startswith("import time:") and len(fields) == 3 and \
+                    fields[1].strip().isdigit():
+                imported.append(fields[2].strip())
+                if fields[2].strip() == module:
+                    total = int(fields[1])
+        if total is None:
+            raise RuntimeError("Import time not reported:\n" + output)
+        if best is None or total < best:
+            best, modules = total, imported
+    return {"module": module, "microseconds": best, "modules": modules}
+
+
+def run(engines=None, modes=None, sizes=DEFAULT_SIZES, rounds=(64,),
+        min_time=0.2, callback=None):
+    """Run all combinations of the parameters.
+
+    :param engines: Engine names, defaults to :py:func:`available_engines`.
+    :param modes: Mode names of :py:data:`MODES`, defaults to all.
+    :param callback: Called with every result as soon as it is measured.
+    :rtype: list
+    """
+    results = []
+    for engine in engines or available_engines():
+        for mode in modes or sorted(MODES):
+            for count in rounds:
+                for size in sizes:
+                    result = measure(engine, mode, size, count, min_time)
+                    if callback is not None:
+                        callback(result)
+                    results.append(result)
+    return results
+
+
+def _environment():
+    return {
+        "xtea": xtea.__version__,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "engines": available_engines(),
+    }
+
+
+def _size(text):
+    """Parse a size like 64, 16K, 1M or 256M."""
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+    text = text.strip().upper()
+    if text[-1:] in units:
+        return int(text[:-1]) * units[text[-1]]
+    return int(text)
+
+
+def _list(convert=str):
+    return lambda text: [convert(item) for item in text.split(",") if item]
+
+
+def main(argv=None):
+    """Command line interface, see ``python -m xtea.bench --help``."""
+    parser = argparse.ArgumentParser(
+        prog="python -m xtea.bench",
+        description="Measure the speed of XTEA encryption.")
+    parser.add_argument("--engines", type=_list(),
+                        help="comma separated engines (default: all "
+                             "available of {})".format(
+                                 ", ".join(available_engines())))
+    parser.add_argument("--modes", type=_list(),
+                        help="comma separated modes (default: {})".format(
+                            ", ".join(sorted(MODES))))
+    parser.add_argument("--sizes", type=_list(_size),
+                        default=list(DEFAULT_SIZES),
+                        help="comma separated input sizes, K, M and G "
+                             "suffixes are allowed (default: 8,1K,64K,1M)")
+    parser.add_argument("--rounds", type=_list(int), default=[64],
+                        help="comma separated round counts (default: 64)")
+    parser.add_argument("--min-time", type=float, default=0.2,
+                        help="seconds per measurement (default: 0.2)")
+    parser.add_argument("--json", metavar="FILE",
+                        help="write the results as JSON, '-' for stdout")
+    parser.add_argument("--import-time", action="store_true",
+                        help="measure the time to import xtea instead")
+    args = parser.parse_args(argv)
+
+    if args.import_time:
+        result = measure_import()
+        print("import {module}: {microseconds} us, {count} modules".format(
+            count=len(result["modules"]), **result))
+        return 0
+
+    for engine in args.engines or ():
+        if engine not in available_engines():
+            parser.error("engine {!r} is not available".format(engine))
+    for mode in args.modes or ():
+        if mode not in MODES:
+            parser.error("unknown mode {!r}".format(mode))
+
+    quiet = args.json == "-"
+
+    def report(result):
+        if not quiet:
+            print("{engine:>7} {mode:>6} {rounds:>3} rounds {size:>10} B "
+                  "{mb_per_s:10.2f} MB/s {latency_us:12.1f} us".format(
+                      **result))
+            sys.stdout.flush()
+
+    results = run(args.engines, args.modes, args.sizes, args.rounds,
+                  args.min_time, report)
+
+    if args.json:
+        document = {"environment": _environment(), "results": results}
+        if args.json == "-":
+            json.dump(document, sys.stdout, indent=2, sort_keys=True)
+            print()
+        else:
+            with open(args.json, "w") as file:
+                json.dump(document, file, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""
+Process-wide cache for expanded keys.
+
+Creating a cipher object expands the key into a key schedule. Applications
+creating many cipher objects for a few keys can skip this step by reusing
+the schedules from a least recently used cache.
+
+Example:
+
+    >>> from xtea.cache import KeyCache
+    >>> cache = KeyCache(maxsize=2)
+    >>> cache.get("a", lambda: 1)
+    1
+    >>> cache.get("a", lambda: 2)
+    1
+    >>> cache.info()
+    CacheInfo(hits=1, misses=1, maxsize=2, currsize=1)
+    >>> cache.evict("a")
+    True
+    >>> cache.get("a", lambda: 2)
+    2
+
+.. warning::
+   Cached schedules are derived from the key and remain in memory until
+   they are evicted. Set the ``maxsize`` of :py:data:`key_cache` to zero to
+   disable caching.
+"""
+
+try:  # Cheaper to import than threading
+    from _thread import allocate_lock
+except ImportError:  # Python 2
+    from thread import allocate_lock
+
+from collections import OrderedDict, namedtuple
+
+#: Statistics returned by :py:meth:`KeyCache.info`.
+CacheInfo = namedtuple("CacheInfo", "hits misses maxsize currsize")
+
+
+class KeyCache(object):
+    """Thread safe least recently used cache.
+
+    :param int maxsize: Maximum amount of cached entries, 0 disables caching.
+    """
+
+    def __init__(self, maxsize=128):
+        self.__lock = allocate_lock()
+        self.__data = OrderedDict()
+        self.__maxsize = 0
+        self.hits = self.misses = 0
+        self.maxsize = maxsize
+
+    @property
+    def maxsize(self):
+        """Maximum amount of cached entries.
+
+        Shrinking the cache evicts the least recently used entries.
+        """
+        return self.__maxsize
+
+    @maxsize.setter
+    def maxsize(self, value):
+        if value < 0:
+            raise ValueError("maxsize must not be negative")
+
+        with self.__lock:
+            self.__maxsize = value
+            self.__trim()
+
+    def get(self, key, factory):
+        """Get the entry for `key`, call `factory()` to create it if missing.
+
+        :param key: A hashable identifier of the entry.
+        :param callable factory: Creates the value on a cache miss.
+        """
+        with self.__lock:
+            try:
+                value = self.__data.pop(key)
+            except KeyError:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.__data[key] = value
+                return value
+
+        value = factory()
+
+        with self.__lock:
+            self.__data[key] = value
+            self.__trim()
+
+        return value
+
+    def evict(self, key):
+        """Remove an entry.
+
+        :return: If the entry was cached.
+        :rtype: bool
+        """
+        with self.__lock:
+            return self.__data.pop(key, None) is not None
+
+    def clear(self):
+        """Remove all entries and reset the statistics."""
+        with self.__lock:
+            self.__data.clear()
+            self.hits = self.misses = 0
+
+    def info(self):
+        """Get the cache statistics.
+
+        :rtype: CacheInfo
+        """
+        with self.__lock:
+            return CacheInfo(self.hits, self.misses,
+                             self.__maxsize, len(self.__data))
+
+    def __len__(self):
+        return len(self.__data)
+
+    def __trim(self):
+        while len(self.__data) > self.__maxsize:
+            self.__data.popitem(last=False)
+
+
+#: The cache used for the key schedules of :py:class:`xtea.XTEACipher`.
+#: Entries are identified by ``(key, cycles, endian)``, the subkeys of
+#: :py:class:`xtea.mac.CMAC` by ``("cmac", key, cycles, endian)``.
+key_cache = KeyCache()  # pylint: disable=invalid-name
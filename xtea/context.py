@@ -0,0 +1,136 @@
+"""
+Memory-compact cipher contexts.
+
+Applications keeping many live ciphers (for example one per client
+session) pay for the instance dictionary and the PEP-272 attributes of
+every :py:class:`xtea.XTEACipher`. A :py:class:`CipherContext` has slots
+only: the key schedule, the mode, the byte order, the chaining (or
+keystream) block and, in CTR mode, the counter as a single integer. The key
+schedule is a packed array of round keys (a C array with the C extension),
+shared with other contexts of the same key through
+:py:data:`xtea.cache.key_cache`.
+
+On 64 bit CPython, a context takes 90 (ECB) to 170 (CTR) bytes besides its
+key schedule, a cipher object about 800 bytes. The key schedule of 64
+rounds takes about 320 bytes. Without the C extension, the block functions
+generated for it on first use add about 3 KiB.
+
+Example:
+
+    >>> import xtea
+    >>> from xtea.context import CipherContext
+    >>> key, iv = b" " * 16, b"12345678"  # Never use these values
+    >>> context = CipherContext(key, xtea.MODE_CBC, iv)
+    >>> encrypted = context.encrypt(b"This is a text. ")
+    >>> encrypted == xtea.new(key, mode=xtea.MODE_CBC, IV=iv).encrypt(
+    ...     b"This is a text. ")
+    True
+    >>> CipherContext(key, xtea.MODE_CBC, iv).decrypt(encrypted)
+    b'This is a text. '
+"""
+
+import struct
+
+from . import MODE_CBC, MODE_CFB, MODE_CTR, MODE_ECB, MODE_OFB
+from . import _CTR_BATCH, _big_endian, _byte_view, _get_schedule
+from . import _load_engine, _python, block_size
+from .counter import _pack_blocks
+
+__all__ = ("CipherContext",)
+
+_MASK = 2**64 - 1
+
+
+class CipherContext(object):
+    """A cipher with a fixed mode and as little memory as possible.
+
+    :param bytes key: The key, 16 bytes long.
+    :param int mode: One of :py:data:`xtea.MODE_ECB`,
+        :py:data:`xtea.MODE_CBC`, :py:data:`xtea.MODE_CFB` (64 bit
+        segments), :py:data:`xtea.MODE_OFB` and :py:data:`xtea.MODE_CTR`.
+    :param bytes IV: The IV, required except in ECB mode. In CTR mode, it
+        is the initial counter block, incremented as a big endian integer
+        like :py:class:`xtea.counter.Counter`.
+    :param int rounds: Rounds of XTEA, defaults to 64.
+    :param str endian: Byte order of the words of a block, see
+        :py:func:`xtea.new`.
+    """
+
+    __slots__ = ("_schedule", "_mode", "_big_endian", "_block", "_used",
+                 "_counter")
+
+    block_size = block_size
+
+    # pylint: disable=invalid-name,too-many-arguments
+    def __init__(self, key, mode, IV=None, rounds=64, endian="!"):
+        if len(key) != 16:
+            raise ValueError("Key length must be 16")
+        if mode not in (MODE_ECB, MODE_CBC, MODE_CFB, MODE_OFB, MODE_CTR):
+            raise ValueError("Unsupported mode of operation")
+        self._big_endian = _big_endian(endian)
+        if self._big_endian is None:
+            raise ValueError("Unsupported byte order {!r}".format(endian))
+
+        if mode != MODE_ECB and (IV is None or len(IV) != block_size):
+            raise ValueError("IV length must be block_size")
+
+        self._schedule = _get_schedule(bytes(key), int(rounds) // 2, endian)
+        self._mode = mode
+        self._used = block_size  # Keystream bytes used of `_block`
+        self._block = self._counter = None
+        if mode == MODE_CTR:
+            self._counter = struct.unpack(">Q", IV)[0]
+            self._block = b"\0" * block_size
+        elif mode != MODE_ECB:
+            self._block = bytes(IV)
+
+    def encrypt(self, data):
+        """Encrypt data, continuing the previous calls.
+
+        :rtype: bytes
+        """
+        return self._crypt(data, False)
+
+    def decrypt(self, data):
+        """Decrypt data, continuing the previous calls.
+
+        :rtype: bytes
+        """
+        return self._crypt(data, True)
+
+    def _function(self, name):
+        return getattr(_load_engine(), name, None) or getattr(_python, name)
+
+    def _crypt(self, data, decrypt):
+        mode, direction = self._mode, "decrypt" if decrypt else "encrypt"
+        if mode == MODE_ECB:
+            return self._function("ecb_" + direction)(
+                self._schedule, data, self._big_endian)
+        if mode in (MODE_CBC, MODE_CFB):
+            name = ("cbc_" if mode == MODE_CBC else "cfb_") + direction
+            result, self._block = self._function(name)(
+                self._schedule, self._block, data, self._big_endian)
+            return result
+        if mode == MODE_OFB:
+            result, self._block, self._used = self._function("ofb")(
+                self._schedule, self._block, self._used, data,
+                self._big_endian)
+            return result
+
+        data = _byte_view(data)
+        results = []
+        for start in range(0, len(data), _CTR_BATCH):
+            chunk = data[start:start + _CTR_BATCH]
+            result, self._block, self._used = self._function("ctr")(
+                self._schedule, self._block, self._used,
+                self._counter_blocks(len(chunk)), chunk, self._big_endian)
+            results.append(result)
+        return b"".join(results)
+
+    def _counter_blocks(self, length):
+        """Get the counter blocks needed to process `length` more bytes."""
+        missing = length - (block_size - self._used)
+        count = max(0, -(-missing // block_size))
+        start = self._counter
+        self._counter = (start + count) & _MASK
+        return _pack_blocks(start, count)
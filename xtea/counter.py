@@ -5,6 +5,13 @@ Simple counter for the CTR mode of operation.
 import struct
 import sys
 
+from itertools import count as _count, islice as _islice
+
+try:
+    from _xtea import counter_blocks as _counter_blocks
+except ImportError:
+    _counter_blocks = None
+
 PY_3 = sys.version_info.major >= 3
 
 if PY_3:
@@ -45,8 +52,22 @@ else:
         return result
 
 
-class Counter:
+def _pack_blocks(start, count, big_endian=True):
+    """Pack `count` counter values from `start` on, wrapping at 2**64."""
+    if _counter_blocks is not None:
+        return _counter_blocks(start, count, big_endian)
+
+    before_wrap = min(count, 2**64 - start)
+    values = list(_islice(_count(start), before_wrap))
+    values.extend(range(count - before_wrap))
+    return struct.pack((">" if big_endian else "<") + "%dQ" % count, *values)
+
+
+class Counter(object):
     """Small counter for CTR mode.
+
+    Counters have no instance dictionary, see ``__slots__``.
+
     Example:
 
         >>> from xtea.counter import Counter
@@ -61,8 +82,17 @@ class Counter:
         >>> c.reset()
         >>> c()
         b'$2dUI84e'
+        >>> c.blocks(2)
+        b'%2dUI84e&2dUI84e'
+        >>> c.seek(1)
+        >>> c()
+        b'%2dUI84e'
+        >>> c.tell()
+        2
     """
 
+    __slots__ = ("__nonce", "__current", "byteorder")
+
     def __init__(self, nonce, byteorder='big'):
         """Constructor for a counter which is suitable for CTR mode.
 
@@ -86,6 +116,46 @@ class Counter:
         self.__current %= 2**64
         return value
 
+    def blocks(self, count):
+        """Get the next `count` counter values at once.
+
+        This is equivalent to ``b"".join(c() for _ in range(count))``,
+        but without a Python call per value.
+
+        Returns:
+            bytes
+        """
+        start = self.__current
+        self.__current = (start + count) % 2**64
+        return _pack_blocks(start, count, self.byteorder != "little")
+
+    def seek(self, index):
+        """Set the counter to the value of the `index`-th call.
+
+        The counter wraps around at 2**64 as usual.
+        """
+        self.__current = (from_bytes(self.__nonce, self.byteorder) +
+                          index) % 2**64
+
+    def tell(self):
+        """Get the amount of values returned since the nonce.
+
+        Returns:
+            int
+        """
+        return (self.__current -
+                from_bytes(self.__nonce, self.byteorder)) % 2**64
+
+    def copy(self):
+        """Get an independent counter with the same nonce and position.
+
+        Returns:
+            Counter
+        """
+        other = Counter(self.__nonce, self.byteorder)
+        other.__current = self.__current
+        return other
+
     def reset(self):
         """Reset the counter to the nonce."""
 
@@ -0,0 +1,202 @@
+"""
+Authenticated encryption with XTEA in EAX mode.
+
+EAX (Bellare, Rogaway and Wagner) encrypts in CTR mode and authenticates
+the nonce, the associated data (header) and the ciphertext with CMAC. The
+encryption and the authentication of the ciphertext run in a single pass
+over the data, natively with the C extension.
+
+Data can be processed at once with :py:meth:`EAX.encrypt_and_digest` and
+:py:meth:`EAX.decrypt_and_verify`, or streamed with repeated calls to
+:py:meth:`EAX.encrypt` (or :py:meth:`EAX.decrypt`) before the tag is
+computed.
+
+Example:
+
+    >>> from xtea import eax
+    >>> key, nonce = b" " * 16, b"12345678"  # Never use these values
+    >>> cipher = eax.new(key, nonce, header=b"Version 1")
+    >>> encrypted, tag = cipher.encrypt_and_digest(b"This is a text. ")
+    >>> cipher = eax.new(key, nonce, header=b"Version 1")
+    >>> cipher.decrypt_and_verify(encrypted, tag)
+    b'This is a text. '
+    >>> cipher = eax.new(key, nonce, header=b"Version 2")
+    >>> cipher.decrypt_and_verify(encrypted, tag)
+    Traceback (most recent call last):
+    ...
+    ValueError: MAC check failed
+
+.. warning::
+   The nonce must never be used twice with the same key. With a block size
+   of 64 bit, a key should not protect much more than 2**32 blocks.
+"""
+
+import hmac
+import struct
+
+from . import _byte_view, _encrypt_block_bytes, _xtea, block_size
+from . import _python
+from ._python import _xor
+from .mac import CMAC, _cbc_mac
+
+__all__ = ("EAX", "new")
+
+if _xtea is not None:
+    _eax_crypt = _xtea.eax_crypt  # pylint: disable=invalid-name
+else:
+    _eax_crypt = _python.eax_crypt  # pylint: disable=invalid-name
+
+
+def _increment(counter):
+    value, = struct.unpack(">Q", counter)
+    return struct.pack(">Q", (value + 1) % 2**64)
+
+
+class EAX(object):
+    """EAX mode with XTEA.
+
+    :param bytes key: The key, 16 bytes long.
+    :param bytes nonce: A unique value of any length.
+    :param header: Associated data, which is authenticated but not
+        encrypted. More can be added with :py:meth:`update`.
+    :param int tag_size: Length of the tag in bytes, from 1 to 8.
+    :param kwargs: ``rounds`` and ``endian``, see :py:class:`xtea.mac.CMAC`.
+    """
+
+    def __init__(self, key, nonce, header=None, tag_size=block_size,
+                 **kwargs):
+        if not 1 <= tag_size <= block_size:
+            raise ValueError("tag_size must be between 1 and 8")
+        self.tag_size = tag_size
+
+        def omac(tweak, data=None):
+            cmac = CMAC(key, struct.pack(">Q", tweak), **kwargs)
+            if data is not None:
+                cmac.update(data)
+            return cmac
+
+        self._nonce = omac(0, nonce).digest()
+        self._header = omac(1, header)
+        self._mac = omac(2)  # Of the ciphertext
+
+        # pylint: disable=protected-access
+        self._schedule = self._mac._schedule
+        self._big_endian = self._mac._big_endian
+
+        self._counter = self._nonce  # Next counter block
+        self._keystream = b""  # Unused bytes of the current keystream block
+        self._direction = None
+
+    def update(self, data):
+        """Add associated data, which is authenticated but not encrypted."""
+        self._header.update(data)
+
+    def encrypt(self, data):
+        """Encrypt a part of the message.
+
+        :rtype: bytes
+        """
+        return self._crypt(data, False)
+
+    def decrypt(self, data):
+        """Decrypt a part of the message.
+
+        The plaintext is not authenticated until :py:meth:`verify` succeeds.
+
+        :rtype: bytes
+        """
+        return self._crypt(data, True)
+
+    def digest(self):
+        """Get the tag of the header and the message.
+
+        :rtype: bytes
+        """
+        tag = _xor(_xor(self._nonce, self._header.digest()),
+                   self._mac.digest())
+        return tag[:self.tag_size]
+
+    def hexdigest(self):
+        """Get the tag as hexadecimal string.
+
+        :rtype: str
+        """
+        return "".join("{:02x}".format(byte)
+                       for byte in bytearray(self.digest()))
+
+    def verify(self, tag):
+        """Check the tag received with the message.
+
+        :raises ValueError: If the tag is not valid.
+        """
+        if not hmac.compare_digest(self.digest(), bytes(tag)):
+            raise ValueError("MAC check failed")
+
+    def encrypt_and_digest(self, data):
+        """Encrypt the message and compute its tag.
+
+        :return: The ciphertext and the tag.
+        :rtype: tuple
+        """
+        return self.encrypt(data), self.digest()
+
+    def decrypt_and_verify(self, data, tag):
+        """Decrypt the message and check its tag.
+
+        :raises ValueError: If the tag is not valid.
+        :rtype: bytes
+        """
+        result = self.decrypt(data)
+        self.verify(tag)
+        return result
+
+    def _crypt(self, data, decrypt):
+        """Encrypt or decrypt and authenticate the ciphertext.
+
+        Bytes up to the next block boundary and after the last complete
+        block are processed here, all complete blocks at once by the engine.
+        """
+        if self._direction not in (None, decrypt):
+            raise TypeError("encrypt() and decrypt() cannot be mixed")
+        self._direction = decrypt
+
+        # pylint: disable=protected-access
+        data, mac, results = _byte_view(data), self._mac, []
+
+        head = min(len(self._keystream), len(data))
+        if head:
+            results.append(_xor(data[:head], self._keystream))
+            self._keystream = self._keystream[head:]
+            mac.update(data[:head] if decrypt else results[-1])
+
+        end = head + (len(data) - head) // block_size * block_size
+        if end > head:
+            if mac._pending:  # A complete block, it is not the last one
+                mac._state = _cbc_mac(self._schedule, mac._state,
+                                      mac._pending, self._big_endian)
+            result, self._counter, mac._state = _eax_crypt(
+                self._schedule, self._counter, mac._state, data[head:end],
+                decrypt, self._big_endian)
+            results.append(result)
+            mac._pending = (data[end - block_size:end].tobytes() if decrypt
+                            else result[-block_size:])
+
+        if end < len(data):
+            keystream = _encrypt_block_bytes(self._schedule, self._counter,
+                                             self._big_endian)
+            self._counter = _increment(self._counter)
+            results.append(_xor(data[end:], keystream))
+            self._keystream = keystream[len(data) - end:]
+            mac.update(data[end:] if decrypt else results[-1])
+
+        return b"".join(results)
+
+
+def new(key, nonce, header=None, **kwargs):
+    """Create an :py:class:`EAX` object.
+
+    :param bytes key: The key, 16 bytes long.
+    :param bytes nonce: A unique value of any length.
+    :param header: Associated data.
+    """
+    return EAX(key, nonce, header, **kwargs)
@@ -0,0 +1,153 @@
+"""
+CMAC message authentication with XTEA.
+
+CMAC (NIST SP 800-38B, also known as OMAC1) is a CBC-MAC with the last
+block masked by a subkey, so it is secure for messages of any length. The
+objects follow the interface of :py:mod:`hashlib`: data is added with
+:py:meth:`CMAC.update` and only one block of chaining state is kept, no
+matter how long the message is. With the C extension, the chaining runs
+natively.
+
+Example:
+
+    >>> from binascii import hexlify
+    >>> from xtea import mac
+    >>> key = b" " * 16  # Never use this key
+    >>> tag = mac.new(key, b"This is a text. ")
+    >>> tag.update(b"More text.")
+    >>> hexlify(tag.digest()) == hexlify(mac.new(
+    ...     key, b"This is a text. More text.").digest())
+    True
+    >>> tag.digest_size
+    8
+"""
+
+import copy
+import struct
+
+from binascii import hexlify
+
+from . import _big_endian, _byte_view, _encrypt_block_bytes, _get_schedule
+from . import _xtea, block_size, key_cache
+from . import _python
+
+__all__ = ("CMAC", "new")
+
+if _xtea is not None:
+    _cbc_mac = _xtea.cbc_mac  # pylint: disable=invalid-name
+else:
+    _cbc_mac = _python.cbc_mac  # pylint: disable=invalid-name
+
+#: The constant R_64 of CMAC for the subkey generation.
+_RB = 0x1b
+
+
+def _double(value):
+    """Multiply a block (as integer) by x in GF(2^64)."""
+    return (value << 1 ^ (_RB if value >> 63 else 0)) & 0xffffffffffffffff
+
+
+def _subkeys(key, cycles, endian):
+    """Get the key schedule and the two CMAC subkeys as integers."""
+    schedule = _get_schedule(key, cycles, endian)
+    first = _double(struct.unpack(">Q", _encrypt_block_bytes(
+        schedule, b"\0" * block_size, _big_endian(endian)))[0])
+    return schedule, first, _double(first)
+
+
+class CMAC(object):
+    """CMAC of a message with XTEA.
+
+    :param bytes key: The key, 16 bytes long.
+    :param msg: Initial data, as if passed to :py:meth:`update`.
+    :param int rounds: Rounds of XTEA, defaults to 64.
+    :param str endian: Byte order of the words of a block, see
+        :py:func:`xtea.new`.
+    """
+
+    #: Size of the tag in bytes.
+    digest_size = block_size
+    #: Block size of the underlying cipher in bytes.
+    block_size = block_size
+    name = "cmac-xtea"
+
+    def __init__(self, key, msg=None, rounds=64, endian="!"):
+        if len(key) != 16:
+            raise ValueError("Key length must be 16")
+        self._big_endian = _big_endian(endian)
+        if self._big_endian is None:
+            raise ValueError("Unsupported byte order {!r}".format(endian))
+
+        cycles = int(rounds) // 2
+        self._schedule, self._first, self._second = key_cache.get(
+            ("cmac", bytes(key), cycles, endian),
+            lambda: _subkeys(key, cycles, endian))
+
+        self._state = b"\0" * self.block_size
+        self._pending = b""  # Last 1 to 8 bytes, it might be the final block
+
+        if msg is not None:
+            self.update(msg)
+
+    def update(self, data):
+        """Add `data` (any bytes-like object) to the message."""
+        data = _byte_view(data)
+        if not len(data):
+            return
+
+        total = len(self._pending) + len(data)
+        keep = total % self.block_size or self.block_size
+        chained = total - keep
+
+        if chained:
+            start = 0
+            if self._pending:
+                start = self.block_size - len(self._pending)
+                self._state = _cbc_mac(
+                    self._schedule, self._state,
+                    self._pending + data[:start].tobytes(),
+                    self._big_endian)
+                chained -= self.block_size
+            self._state = _cbc_mac(self._schedule, self._state,
+                                   data[start:start + chained],
+                                   self._big_endian)
+            self._pending = data[len(data) - keep:].tobytes()
+        else:
+            self._pending += data.tobytes()
+
+    def digest(self):
+        """Get the tag of the data added so far.
+
+        :rtype: bytes
+        """
+        if len(self._pending) == self.block_size:
+            last, subkey = self._pending, self._first
+        else:
+            last = (self._pending + b"\x80").ljust(self.block_size, b"\0")
+            subkey = self._second
+
+        last = struct.pack(">Q", struct.unpack(">Q", last)[0] ^ subkey)
+        return _cbc_mac(self._schedule, self._state, last, self._big_endian)
+
+    def hexdigest(self):
+        """Get the tag of the data added so far as hexadecimal string.
+
+        :rtype: str
+        """
+        return hexlify(self.digest()).decode()
+
+    def copy(self):
+        """Get an independent copy of the current state.
+
+        :rtype: CMAC
+        """
+        return copy.copy(self)
+
+
+def new(key, msg=None, **kwargs):
+    """Create a :py:class:`CMAC` object.
+
+    :param bytes key: The key, 16 bytes long.
+    :param msg: Initial data of the message.
+    """
+    return CMAC(key, msg, **kwargs)
@@ -0,0 +1,175 @@
+"""
+Opt-in instrumentation of :py:class:`xtea.XTEACipher`.
+
+While enabled, every call to encrypt or decrypt is counted and timed, both
+for the cipher object (its ``stats`` attribute) and globally
+(:py:data:`totals`). The time is split into phases:
+
+* ``key_setup``: expanding keys missing from the key cache.
+* ``engine``: running a whole mode of operation in the bulk engine.
+* ``block``: the block function, called by the block-by-block modes.
+* ``mode``: everything else within a call, mostly the bookkeeping of the
+  modes of operation in :py:mod:`pep272_encryption`.
+
+Hooks receive a dictionary for every call, for example to export them to a
+metrics system. Disabled instrumentation costs one attribute lookup per
+call. Cipher objects created while disabled are only counted globally.
+
+Example:
+
+    >>> import xtea
+    >>> from xtea import metrics
+    >>> metrics.enable()
+    >>> cipher = xtea.new(b" " * 16, mode=xtea.MODE_CBC, IV=b"12345678")
+    >>> _ = cipher.encrypt(b"This is a text. ")
+    >>> cipher.stats.calls, cipher.stats.bytes, cipher.stats.blocks
+    ({'cbc': 1}, 16, 2)
+    >>> metrics.disable()
+"""
+
+import time
+
+try:  # Cheaper to import than threading
+    from _thread import _local, allocate_lock
+except ImportError:  # Python 2
+    from thread import _local, allocate_lock
+
+__all__ = ("Stats", "totals", "enable", "disable", "reset",
+           "add_hook", "remove_hook")
+
+_TIMER = getattr(time, "perf_counter", time.time)
+
+#: If the instrumentation is enabled, use :py:func:`enable` to change it.
+ENABLED = False
+
+PHASES = ("key_setup", "engine", "block", "mode")
+
+_MODES = {1: "ecb", 2: "cbc", 3: "cfb", 4: "pgp", 5: "ofb", 6: "ctr"}
+
+_HOOKS = []
+_LOCK = allocate_lock()
+# Seconds spent in the other phases during the current call of a thread
+_LOCAL = _local()
+
+
+class Stats(object):
+    """Counters of a cipher object or of all of them.
+
+    :var dict calls: Calls to encrypt or decrypt by mode name.
+    :var int bytes: Bytes processed.
+    :var int blocks: Blocks processed by the block function or the engine.
+    :var dict time: Seconds spent per phase.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        """Reset all counters to zero."""
+        # pylint: disable=attribute-defined-outside-init
+        self.calls = {}
+        self.bytes = self.blocks = 0
+        self.time = dict.fromkeys(PHASES, 0.0)
+
+    def as_dict(self):
+        """Get a copy of the counters.
+
+        :rtype: dict
+        """
+        return {"calls": dict(self.calls), "bytes": self.bytes,
+                "blocks": self.blocks, "time": dict(self.time)}
+
+    def __repr__(self):
+        return "Stats({!r})".format(self.as_dict())
+
+
+#: Counters of all cipher objects.
+totals = Stats()  # pylint: disable=invalid-name
+
+
+def enable():
+    """Enable the instrumentation."""
+    global ENABLED  # pylint: disable=global-statement
+    ENABLED = True
+
+
+def disable():
+    """Disable the instrumentation, the counters are kept."""
+    global ENABLED  # pylint: disable=global-statement
+    ENABLED = False
+
+
+def reset():
+    """Reset the global counters."""
+    with _LOCK:
+        totals.clear()
+
+
+def add_hook(hook):
+    """Call `hook` with a dictionary after every call to encrypt or decrypt.
+
+    The dictionary contains the ``cipher`` object, the ``operation``
+    (``"encrypt"`` or ``"decrypt"``), the ``mode`` name, the ``bytes``
+    processed and the ``seconds`` taken.
+    """
+    with _LOCK:
+        _HOOKS.append(hook)
+
+
+def remove_hook(hook):
+    """Remove a hook added by :py:func:`add_hook`."""
+    with _LOCK:
+        _HOOKS.remove(hook)
+
+
+def _stats(cipher):
+    """Get the counters to update for `cipher`."""
+    own = getattr(cipher, "stats", None)
+    return (totals,) if own is None else (totals, own)
+
+
+def _add(cipher, phase, seconds, blocks=0):
+    inner = getattr(_LOCAL, "inner", None)
+    if inner is not None:
+        _LOCAL.inner = inner + seconds
+    with _LOCK:
+        for stats in _stats(cipher):
+            stats.time[phase] += seconds
+            stats.blocks += blocks
+
+
+def record(cipher, decrypt, length, func, *args):
+    """Count and time a call to encrypt or decrypt."""
+    outer = getattr(_LOCAL, "inner", None)
+    _LOCAL.inner = 0.0
+    start = _TIMER()
+    try:
+        result = func(*args)
+    finally:
+        seconds = _TIMER() - start
+        inner = _LOCAL.inner
+        # A nested call is accounted for completely by itself
+        _LOCAL.inner = None if outer is None else outer + seconds
+
+    mode = _MODES.get(cipher.mode, str(cipher.mode))
+    with _LOCK:
+        for stats in _stats(cipher):
+            stats.calls[mode] = stats.calls.get(mode, 0) + 1
+            stats.bytes += length
+            stats.time["mode"] += max(0.0, seconds - inner)
+        hooks = list(_HOOKS)
+
+    event = {"cipher": cipher, "operation": "decrypt" if decrypt
+             else "encrypt", "mode": mode, "bytes": length,
+             "seconds": seconds}
+    for hook in hooks:
+        hook(event)
+    return result
+
+
+def timed(cipher, phase, blocks, func, *args):
+    """Time `func` as `phase` of `cipher`."""
+    start = _TIMER()
+    result = func(*args)
+    _add(cipher, phase, _TIMER() - start, blocks)
+    return result
@@ -0,0 +1,141 @@
+"""
+In-place encryption of files with memory mapping.
+
+The file is mapped window by window and every window is transformed in
+place with :py:meth:`xtea.XTEACipher.encrypt_into`, so there are neither
+read and write calls nor intermediate copies of the data. On Python 2,
+memory maps have no memoryview and each window is copied once.
+
+Example:
+
+    >>> import os, tempfile, xtea
+    >>> from xtea.counter import Counter
+    >>> from xtea.mmapio import encrypt_file_inplace, decrypt_file_inplace
+    >>> key, nonce = b" " * 16, b"12345678"  # Never use these values
+    >>> handle, path = tempfile.mkstemp()
+    >>> os.write(handle, b"This is a text. " * 1000)
+    16000
+    >>> os.close(handle)
+    >>> cipher = xtea.new(key, mode=xtea.MODE_CTR, counter=Counter(nonce))
+    >>> encrypt_file_inplace(path, cipher)
+    16000
+    >>> cipher = xtea.new(key, mode=xtea.MODE_CTR, counter=Counter(nonce))
+    >>> decrypt_file_inplace(path, cipher, start=1000)  # Resume at block 1000
+    8000
+    >>> with open(path, "rb") as file:
+    ...     file.read()[8000:] == b"This is a text. " * 500
+    True
+    >>> os.remove(path)
+"""
+
+import mmap
+import os
+import sys
+
+from . import MODE_CBC, MODE_CFB, MODE_ECB, MODE_OFB
+from .counter import Counter
+from .stream import _check_end, _unit
+
+__all__ = ("encrypt_file_inplace", "decrypt_file_inplace")
+
+#: Default size of a mapped window in bytes.
+DEFAULT_WINDOW_SIZE = 1 << 24
+
+
+def _resume(cipher, start):
+    """Prepare a fresh cipher object to start at block `start`."""
+    if not start or cipher.mode == MODE_ECB:
+        return
+    if cipher.mode in (MODE_CBC, MODE_CFB):
+        raise ValueError("CBC and CFB mode can only start at block 0")
+
+    if cipher.mode == MODE_OFB:
+        # Each keystream block depends on the previous one
+        scratch = bytearray(min(start * cipher.block_size, 1 << 16))
+        remaining = start * cipher.block_size
+        while remaining:
+            size = min(remaining, len(scratch))
+            view = memoryview(scratch)[:size]
+            cipher.encrypt_into(view, view)
+            remaining -= size
+        return
+
+    # pylint: disable=protected-access
+    if not isinstance(cipher._counter, Counter):
+        raise TypeError("Resuming in CTR mode requires a counter "
+                        "from xtea.counter")
+    cipher._counter.seek(start)
+
+
+def _crypt_window(func, mapped, start):
+    """Transform a memory map from byte `start` on in place."""
+    if sys.version_info[0] < 3:
+        # mmap only has the old buffer interface
+        window = bytearray(mapped[start:])
+        func(window, window)
+        mapped[start:] = bytes(window)
+        return
+
+    with memoryview(mapped) as view:
+        with view[start:] as window:
+            func(window, window)
+
+
+def encrypt_file_inplace(path, cipher, start=0,
+                         window_size=DEFAULT_WINDOW_SIZE, decrypt=False):
+    """Encrypt the file at `path` in place.
+
+    :param path: Path of the file, it must be seekable and writable.
+    :param cipher: A fresh :py:class:`xtea.XTEACipher` object without
+        padding.
+    :param int start: Block to start at, all data before it is untouched.
+        This allows resuming an interrupted run with a cipher object created
+        like the original one. In CTR mode (which requires a
+        :py:class:`xtea.counter.Counter`) the counter is moved to this block,
+        in OFB mode the keystream before it is generated and discarded.
+        CBC and CFB mode can only start at block 0.
+    :param int window_size: Bytes mapped at once, rounded down to
+        :py:data:`mmap.ALLOCATIONGRANULARITY`.
+    :param bool decrypt: Decrypt instead of encrypting.
+
+    :return: The amount of bytes processed.
+    :rtype: int
+    """
+    if getattr(cipher, "padding", None) is not None:
+        raise ValueError("Padding changes the size, it is not possible in "
+                         "place")
+    func = cipher.decrypt_into if decrypt else cipher.encrypt_into
+    offset = start * cipher.block_size
+
+    granularity = mmap.ALLOCATIONGRANULARITY
+    window_size = max(granularity, window_size - window_size % granularity)
+
+    with open(path, "r+b") as file:
+        size = os.fstat(file.fileno()).st_size
+        if not 0 <= offset <= size:
+            raise ValueError("start must be within the file")
+        _check_end(_unit(cipher), size - offset)
+        _resume(cipher, start)
+
+        position = offset - offset % granularity
+        while position < size:
+            length = min(window_size, size - position)
+            mapped = mmap.mmap(file.fileno(), length,
+                               access=mmap.ACCESS_WRITE, offset=position)
+            try:
+                _crypt_window(func, mapped, max(0, offset - position))
+                mapped.flush()
+            finally:
+                mapped.close()
+            position += length
+
+    return size - offset
+
+
+def decrypt_file_inplace(path, cipher, start=0,
+                         window_size=DEFAULT_WINDOW_SIZE):
+    """Decrypt the file at `path` in place.
+
+    See :py:func:`encrypt_file_inplace`.
+    """
+    return encrypt_file_inplace(path, cipher, start, window_size, True)
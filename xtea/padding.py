@@ -0,0 +1,104 @@
+"""
+Padding schemes for ECB and CBC mode.
+
+Cipher objects created with a ``padding`` (see :py:func:`xtea.new`) pad and
+unpad by themselves, every call to ``encrypt`` or ``decrypt`` handles a
+complete message then. Only the final block is built separately: with the C
+extension, it is encrypted into the same output as the rest of the message,
+which is not copied. Unpadding returns a :py:class:`memoryview` slice of
+the decrypted data instead of a copy.
+
+* :py:data:`xtea.PADDING_PKCS7`: n bytes of value n (PKCS#7, RFC 5652).
+* :py:data:`xtea.PADDING_ISO7816`: a byte 0x80 followed by zero bytes
+  (ISO/IEC 7816-4).
+* :py:data:`xtea.PADDING_ZERO`: zero bytes, none if the data is aligned.
+  Trailing zero bytes of the data itself are removed as well when
+  unpadding, so it is only suitable for data which does not end with one.
+
+The first two always add at least one byte, a full block if the data is
+aligned.
+
+Example:
+
+    >>> import xtea
+    >>> key, iv = b" " * 16, b"12345678"  # Never use these values
+    >>> cipher = xtea.new(key, mode=xtea.MODE_CBC, IV=iv,
+    ...                   padding=xtea.PADDING_PKCS7)
+    >>> encrypted = cipher.encrypt(b"Some text")
+    >>> len(encrypted)
+    16
+    >>> cipher = xtea.new(key, mode=xtea.MODE_CBC, IV=iv,
+    ...                   padding=xtea.PADDING_PKCS7)
+    >>> cipher.decrypt(encrypted).tobytes()
+    b'Some text'
+
+.. warning::
+   Errors about invalid padding tell an attacker whether a forged
+   ciphertext decrypted to valid padding, which is enough to decrypt CBC
+   mode (a padding oracle). Authenticate the ciphertext before decrypting
+   it, for example with :py:mod:`xtea.mac`, or use :py:mod:`xtea.eax`.
+"""
+
+from . import PADDING_ISO7816, PADDING_PKCS7, PADDING_ZERO
+from . import _byte_view, block_size
+
+__all__ = ("final_block", "unpad")
+
+SCHEMES = (PADDING_PKCS7, PADDING_ISO7816, PADDING_ZERO)
+
+
+def _check_scheme(scheme):
+    if scheme not in SCHEMES:
+        raise ValueError("Unknown padding {!r}".format(scheme))
+
+
+def final_block(tail, scheme=PADDING_PKCS7):
+    """Pad the incomplete last block of a message.
+
+    :param tail: The last ``len(data) % block_size`` bytes of the message.
+    :param int scheme: One of the ``PADDING_*`` constants of :py:mod:`xtea`.
+    :return: `tail` with the padding, a full block of padding if `tail` is
+        empty (or nothing with :py:data:`xtea.PADDING_ZERO`).
+    :rtype: bytes
+    """
+    _check_scheme(scheme)
+    tail = _byte_view(tail).tobytes()
+    if len(tail) >= block_size:
+        raise ValueError("The tail must be shorter than block_size")
+
+    missing = block_size - len(tail)
+    if scheme == PADDING_PKCS7:
+        return tail + bytearray((missing,)) * missing
+    if scheme == PADDING_ISO7816:
+        return tail + b"\x80" + b"\0" * (missing - 1)
+    return tail + b"\0" * missing if tail else b""
+
+
+def unpad(data, scheme=PADDING_PKCS7):
+    """Remove the padding of a decrypted message.
+
+    :param data: The message with padding, any bytes-like object.
+    :param int scheme: One of the ``PADDING_*`` constants of :py:mod:`xtea`.
+    :raises ValueError: If the padding is invalid.
+    :return: A slice of `data` without the padding.
+    :rtype: memoryview
+    """
+    _check_scheme(scheme)
+    view = _byte_view(data)
+    if len(view) % block_size or not len(view) and scheme != PADDING_ZERO:
+        raise ValueError("Invalid padding")
+    last = bytearray(view[len(view) - block_size:])
+
+    if scheme == PADDING_PKCS7:
+        size = last[-1] if last else 0
+        if not 1 <= size <= block_size or \
+                last[-size:] != bytearray((size,)) * size:
+            raise ValueError("Invalid padding")
+    elif scheme == PADDING_ISO7816:
+        marker = last.rstrip(b"\0")
+        if not marker or marker[-1] != 0x80:
+            raise ValueError("Invalid padding")
+        size = len(last) - len(marker) + 1
+    else:
+        size = min(len(last) - len(last.rstrip(b"\0")), block_size - 1)
+    return view[:len(view) - size]
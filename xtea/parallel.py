@@ -0,0 +1,172 @@
+"""
+Encryption of large buffers on multiple cores.
+
+Modes without dependencies between blocks are split into block aligned
+shards which are processed by a pool of workers: ECB, CTR (with a
+:py:class:`xtea.counter.Counter`) and decryption in CBC and CFB mode (64 bit
+segments), where every shard starts with the previous ciphertext block as
+its IV. The output is identical to a single call to
+:py:meth:`xtea.XTEACipher.encrypt` and the cipher object is left in the same
+state, so calls can be mixed freely. Other modes run sequentially.
+
+The C extension releases the GIL, a pool of threads is used with it. Without
+the C extension, the shards are sent to a pool of processes.
+
+Example:
+
+    >>> import os, xtea
+    >>> from xtea.counter import Counter
+    >>> from xtea import parallel
+    >>> key, nonce = b" " * 16, b"12345678"  # Never use these values
+    >>> data = os.urandom(1 << 20)
+    >>> cipher = xtea.new(key, mode=xtea.MODE_CTR, counter=Counter(nonce))
+    >>> encrypted = parallel.encrypt(cipher, data, workers=4)
+    >>> cipher = xtea.new(key, mode=xtea.MODE_CTR, counter=Counter(nonce))
+    >>> encrypted == cipher.encrypt(data)
+    True
+
+.. note:: This module requires Python 3.
+"""
+
+import os
+import threading
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from . import MODE_CBC, MODE_CFB, MODE_CTR, MODE_ECB, XTEACipher
+from . import _byte_view, _xtea
+from .counter import Counter
+
+__all__ = ("encrypt", "decrypt", "shutdown")
+
+#: Inputs are not split into shards smaller than this amount of bytes.
+MIN_SHARD_SIZE = 1 << 18
+
+_EXECUTORS = {}
+_LOCK = threading.Lock()
+
+
+def _executor(workers):
+    """Get the shared pool with `workers` workers."""
+    with _LOCK:
+        executor = _EXECUTORS.get(workers)
+        if executor is None:
+            kind = ThreadPoolExecutor if _xtea is not None \
+                else ProcessPoolExecutor
+            executor = _EXECUTORS[workers] = kind(workers)
+        return executor
+
+
+def shutdown():
+    """Shut down the worker pools, they are recreated when needed."""
+    with _LOCK:
+        executors = list(_EXECUTORS.values())
+        _EXECUTORS.clear()
+    for executor in executors:
+        executor.shutdown()
+
+
+def _shard(params, iv, counter, data, decrypt):
+    """Process one shard with a new cipher object.
+
+    :return: The result and the keystream state of the cipher.
+    """
+    key, mode, segment_size, rounds, endian = params
+    cipher = XTEACipher(key, mode=mode, IV=iv, counter=counter,
+                        segment_size=segment_size, rounds=rounds,
+                        endian=endian)
+    func = cipher.decrypt if decrypt else cipher.encrypt
+    # pylint: disable=protected-access
+    return func(data), cipher._status, cipher._used
+
+
+def _parallel(cipher, decrypt):
+    """Check if the mode of `cipher` can be split into shards."""
+    # pylint: disable=protected-access
+    if getattr(cipher, "padding", None) is not None:
+        return False  # Padded messages are processed in one piece
+    if cipher.mode == MODE_ECB:
+        return True
+    if cipher.mode == MODE_CTR:
+        return isinstance(cipher._counter, Counter)
+    if cipher.mode == MODE_CFB and cipher.segment_size != 64:
+        return False
+    return decrypt and cipher.mode in (MODE_CBC, MODE_CFB)
+
+
+def encrypt(cipher, data, workers=None, decrypt=False):
+    """Encrypt `data` with `cipher` using multiple workers.
+
+    :param cipher: A :py:class:`xtea.XTEACipher` object, its state is updated
+        as by :py:meth:`xtea.XTEACipher.encrypt`.
+    :param data: A bytes-like object.
+    :param int workers: The maximum amount of workers, defaults to the
+        amount of CPUs.
+    :param bool decrypt: Decrypt instead of encrypting.
+
+    :rtype: bytes
+    """
+    # pylint: disable=protected-access
+    func = cipher.decrypt if decrypt else cipher.encrypt
+    workers = workers or os.cpu_count() or 1
+    view = _byte_view(data)
+    block_size = cipher.block_size
+
+    head = 0
+    if cipher.mode == MODE_CTR:
+        # Use up the current keystream block to start at a block boundary
+        head = min(len(view), (block_size - cipher._used) % block_size)
+
+    shards = min(workers, (len(view) - head) // MIN_SHARD_SIZE)
+    if shards < 2 or not _parallel(cipher, decrypt) or len(view) % (
+            1 if cipher.mode == MODE_CTR else block_size):
+        return func(data)
+
+    results = [func(view[:head])]
+    view = view[head:]
+    blocks = -(-len(view) // block_size)
+    size = -(-blocks // shards) * block_size
+
+    params = (bytes(cipher.key), cipher.mode, cipher.segment_size,
+              cipher.rounds, cipher.endian)
+    counter = cipher._counter if cipher.mode == MODE_CTR else None
+    position = counter.tell() if counter is not None else 0
+
+    executor = _executor(workers)
+    futures = []
+    for start in range(0, len(view), size):
+        iv = counter_copy = None
+        if cipher.mode in (MODE_CBC, MODE_CFB):
+            iv = cipher._status if not start else \
+                bytes(view[start - block_size:start])
+        elif counter is not None:
+            counter_copy = counter.copy()
+            counter_copy.seek(position + start // block_size)
+
+        shard = view[start:start + size]
+        if _xtea is None:
+            shard = bytes(shard)  # Sent to another process
+        futures.append(executor.submit(_shard, params, iv, counter_copy,
+                                       shard, decrypt))
+
+    for future in futures:
+        result, status, used = future.result()
+        results.append(result)
+
+    if cipher.mode in (MODE_CBC, MODE_CFB):
+        cipher._status = bytes(view[-block_size:])
+    elif counter is not None:
+        counter.seek(position + blocks)
+        cipher._status, cipher._used = status, used
+
+    return b"".join(results)
+
+
+def decrypt(cipher, data, workers=None):
+    """Decrypt `data` with `cipher` using multiple workers.
+
+    See :py:func:`encrypt`.
+
+    :rtype: bytes
+    """
+    return encrypt(cipher, data, workers, True)
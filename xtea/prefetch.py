@@ -0,0 +1,191 @@
+"""
+Background keystream generation for OFB and CTR mode.
+
+The keystream of OFB and CTR mode only depends on the key and the IV or
+counter, not on the data. A :py:class:`KeystreamPrefetcher` generates it
+ahead on a background thread into a bounded buffer of ``depth`` chunks, so
+encrypting is a single XOR against ready keystream and the cipher runs in
+idle time. If the buffer runs dry, the missing keystream is generated on the
+calling thread, the result is the same either way.
+
+Example:
+
+    >>> import xtea
+    >>> from xtea.counter import Counter
+    >>> from xtea.prefetch import KeystreamPrefetcher
+    >>> key, nonce = b" " * 16, b"12345678"  # Never use these values
+    >>> cipher = xtea.new(key, mode=xtea.MODE_CTR, counter=Counter(nonce))
+    >>> with KeystreamPrefetcher(cipher, depth=4) as prefetcher:
+    ...     encrypted = prefetcher.encrypt(b"This is a text. ")
+    >>> cipher = xtea.new(key, mode=xtea.MODE_CTR, counter=Counter(nonce))
+    >>> encrypted == cipher.encrypt(b"This is a text. ")
+    True
+
+.. note::
+   The cipher object belongs to the prefetcher, it must not be used
+   directly while the prefetcher runs. The prefetched keystream is secret
+   material kept in memory until it is used or discarded.
+"""
+
+import collections
+import threading
+
+from pep272_encryption.util import xor_strings
+
+from . import MODE_CTR, MODE_OFB, _byte_view
+
+__all__ = ("KeystreamPrefetcher",)
+
+#: Default amount of chunks kept ready.
+DEFAULT_DEPTH = 16
+
+#: Default size of a chunk of keystream in bytes.
+DEFAULT_CHUNK_SIZE = 1 << 12
+
+
+class KeystreamPrefetcher(object):
+    """Generate the keystream of a cipher ahead on a background thread.
+
+    :param cipher: A :py:class:`xtea.XTEACipher` in OFB or CTR mode.
+    :param int depth: Maximum amount of chunks kept ready.
+    :param int chunk_size: Bytes of keystream generated at once.
+    :raises TypeError: If the cipher is not in OFB or CTR mode.
+    """
+
+    def __init__(self, cipher, depth=DEFAULT_DEPTH,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+        if depth < 1 or chunk_size < 1:
+            raise ValueError("depth and chunk_size must be positive")
+        self.depth = depth
+        self.chunk_size = chunk_size
+
+        self._lock = threading.Lock()  # Held while the cipher is used
+        # For the following attributes
+        self._ready = threading.Condition(threading.Lock())
+        self._chunks = collections.deque()
+        self._offset = 0  # Bytes used of the first chunk
+        self._buffered = 0
+        self._closed = False
+
+        self._cipher = None
+        self.reset(cipher)
+
+        self._thread = threading.Thread(target=self._run,
+                                        name="xtea-prefetch")
+        self._thread.daemon = True
+        self._thread.start()
+
+    @property
+    def buffered(self):
+        """Bytes of keystream ready to be used.
+
+        :rtype: int
+        """
+        with self._ready:
+            return self._buffered
+
+    def encrypt(self, data):
+        """Encrypt data with the next bytes of the keystream.
+
+        :rtype: bytes
+        """
+        data = _byte_view(data)
+        if not len(data):
+            return b""
+        return xor_strings(data.tobytes(), self._take(len(data)))
+
+    def decrypt(self, data):
+        """Decrypt data with the next bytes of the keystream.
+
+        This is the same as :py:meth:`encrypt`.
+
+        :rtype: bytes
+        """
+        return self.encrypt(data)
+
+    def reset(self, cipher):
+        """Discard the prefetched keystream and continue with `cipher`.
+
+        Use it whenever the keystream has to restart, for example with a
+        new IV or counter. Keystream generated concurrently is discarded as
+        well.
+
+        :raises TypeError: If the cipher is not in OFB or CTR mode.
+        """
+        if cipher.mode not in (MODE_OFB, MODE_CTR):
+            raise TypeError("Prefetching requires OFB or CTR mode")
+        with self._lock:
+            with self._ready:
+                self._cipher = cipher
+                self._chunks.clear()
+                self._offset = self._buffered = 0
+                self._ready.notify_all()
+
+    def close(self):
+        """Stop the background thread.
+
+        The buffered keystream is still used, encryption continues on the
+        calling thread afterwards.
+        """
+        with self._ready:
+            self._closed = True
+            self._ready.notify_all()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _run(self):
+        """Keep the buffer filled until the prefetcher is closed."""
+        zeros = b"\0" * self.chunk_size
+        while True:
+            with self._ready:
+                while not self._closed and \
+                        len(self._chunks) >= self.depth:
+                    self._ready.wait()
+                if self._closed:
+                    return
+
+            with self._lock:
+                keystream = self._cipher.encrypt(zeros)
+                with self._ready:
+                    self._chunks.append(keystream)
+                    self._buffered += len(keystream)
+
+    def _pop(self, length):
+        """Remove up to `length` bytes from the buffer, the condition must
+        be held."""
+        parts, taken, full = [], 0, len(self._chunks) >= self.depth
+        while taken < length and self._chunks:
+            chunk = self._chunks[0]
+            end = min(len(chunk), self._offset + length - taken)
+            parts.append(chunk[self._offset:end])
+            taken += end - self._offset
+            if end == len(chunk):
+                self._chunks.popleft()
+                self._offset = 0
+            else:
+                self._offset = end
+        self._buffered -= taken
+        if full and len(self._chunks) < self.depth:
+            self._ready.notify()  # The background thread waits for space
+        return parts
+
+    def _take(self, length):
+        """Get the next `length` bytes of the keystream."""
+        with self._ready:
+            if self._buffered >= length:
+                return b"".join(self._pop(length))
+
+        # Not enough is ready. Holding the lock of the cipher keeps the
+        # background thread from adding keystream in between.
+        with self._lock:
+            with self._ready:
+                parts = self._pop(length)
+            missing = length - sum(len(part) for part in parts)
+            if missing:
+                parts.append(self._cipher.encrypt(b"\0" * missing))
+        return b"".join(parts)
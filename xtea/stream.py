@@ -0,0 +1,281 @@
+"""
+File-like wrappers to encrypt or decrypt streams with bounded memory.
+
+The cipher object keeps the state of the mode of operation between chunks,
+so a stream is processed exactly like a single call to
+:py:meth:`xtea.XTEACipher.encrypt` with all of its data. For ECB, CBC and
+CFB mode, incomplete blocks (or segments) are held back until more data
+arrives, only the end of the stream must be aligned.
+
+If the cipher has a padding (see :py:mod:`xtea.padding`), the stream is one
+message: the end of the stream is padded when encrypting, and when
+decrypting, the last block is held back until the end and returned without
+the padding.
+
+Example:
+
+    >>> import io, xtea
+    >>> from xtea.counter import Counter
+    >>> from xtea.stream import EncryptingReader, encrypt_file
+    >>> key, nonce = b" " * 16, b"12345678"  # Never use these values
+    >>> data = b"This is a text. " * 1000
+    >>> cipher = xtea.new(key, mode=xtea.MODE_CTR, counter=Counter(nonce))
+    >>> encrypted = io.BytesIO()
+    >>> encrypt_file(io.BytesIO(data), encrypted, cipher, chunk_size=1000)
+    16000
+    >>> cipher = xtea.new(key, mode=xtea.MODE_CTR, counter=Counter(nonce))
+    >>> reader = EncryptingReader(io.BytesIO(encrypted.getvalue()), cipher,
+    ...                           decrypt=True)
+    >>> reader.read() == data
+    True
+"""
+
+import io
+
+from . import MODE_CFB, MODE_ECB, MODE_CBC, _byte_view, block_size
+from .padding import final_block, unpad
+
+__all__ = ("EncryptingReader", "EncryptingWriter",
+           "encrypt_file", "decrypt_file")
+
+#: Default amount of bytes processed at once by :py:func:`encrypt_file`.
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+
+def _unit(cipher):
+    """Get the alignment the input of `cipher` needs."""
+    if cipher.mode in (MODE_ECB, MODE_CBC):
+        return cipher.block_size
+    if cipher.mode == MODE_CFB:
+        return cipher.segment_size // 8
+    return 1
+
+
+def _check_end(unit, length):
+    if length % unit:
+        raise ValueError("The stream ended with an incomplete block "
+                         "({} bytes required)".format(unit))
+
+
+def _transform(cipher, decrypt):
+    """Get the function processing aligned chunks, without padding."""
+    if getattr(cipher, "padding", None) is None:
+        return cipher.decrypt_into if decrypt else cipher.encrypt_into
+    # pylint: disable=protected-access
+    return lambda src, dst: cipher._crypt(_byte_view(src), decrypt, dst)
+
+
+def _finish(func, view, total, decrypt, padding):
+    """Pad or unpad the last `total` bytes of a stream, found at the start
+    of `view`, in place.
+
+    :return: The length of the result.
+    """
+    if decrypt:
+        _check_end(block_size, total)
+        func(view[:total], view[:total])
+        return len(unpad(view[:total], padding))
+
+    last = final_block(view[:total], padding)
+    view[:len(last)] = last
+    func(view[:len(last)], view[:len(last)])
+    return len(last)
+
+
+class EncryptingReader(io.RawIOBase):
+    """Read the encrypted (or decrypted) contents of a readable stream.
+
+    :param raw: The readable binary stream with the input.
+    :param cipher: A fresh :py:class:`xtea.XTEACipher` object.
+    :param bool decrypt: Decrypt instead of encrypting.
+    :param bool closefd: Close `raw` when the reader is closed.
+
+    Data is transformed in place in the buffer given to :py:meth:`readinto`,
+    wrap the reader in :py:class:`io.BufferedReader` for small reads.
+    """
+
+    def __init__(self, raw, cipher, decrypt=False, closefd=True):
+        super(EncryptingReader, self).__init__()
+        self.raw = raw
+        self.closefd = closefd
+        self.cipher = cipher
+        self._func = _transform(cipher, decrypt)
+        self._decrypt = decrypt
+        self._padding = getattr(cipher, "padding", None)
+        self._unit = _unit(cipher)
+        # Input held back, a block more when the padding is removed
+        self._hold = self._unit if decrypt and self._padding else 0
+        self._pending = b""  # Input not processed yet (incomplete block)
+        self._ready = b""  # Output not returned yet (short reads)
+        self._done = False  # The padded end was returned
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        view = _byte_view(b)
+
+        if self._ready:
+            size = min(len(view), len(self._ready))
+            view[:size] = self._ready[:size]
+            self._ready = self._ready[size:]
+            return size
+
+        if len(view) < self._unit + self._hold:
+            scratch = bytearray(self._unit + self._hold)
+            self._ready = bytes(scratch[:self.readinto(scratch)])
+            return self.readinto(view) if self._ready else 0
+
+        while True:
+            start = len(self._pending)
+            view[:start] = self._pending
+            size = self._read_raw(view[start:])
+            total = start + size
+
+            if size:
+                end = max(0, total - (total % self._unit or self._hold))
+            elif self._padding is not None:
+                self._pending = b""
+                if self._done:
+                    return 0
+                self._done = True
+                return _finish(self._func, view, total, self._decrypt,
+                               self._padding)
+            else:
+                _check_end(self._unit, total)
+                end = total
+
+            self._pending = view[end:total].tobytes()
+            if end or not size:
+                self._func(view[:end], view[:end])
+                return end
+
+    def _read_raw(self, view):
+        readinto = getattr(self.raw, "readinto", None)
+        if readinto is not None:
+            return readinto(view) or 0
+
+        data = self.raw.read(len(view))
+        view[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            try:
+                if self.closefd:
+                    self.raw.close()
+            finally:
+                super(EncryptingReader, self).close()
+
+
+class EncryptingWriter(io.RawIOBase):
+    """Encrypt (or decrypt) data written to it into a writable stream.
+
+    :param raw: The writable binary stream receiving the output.
+    :param cipher: A fresh :py:class:`xtea.XTEACipher` object.
+    :param bool decrypt: Decrypt instead of encrypting.
+    :param bool closefd: Close `raw` when the writer is closed.
+
+    Closing the writer checks that the stream ended on a complete block, or
+    writes the end of the message with padding.
+    """
+
+    def __init__(self, raw, cipher, decrypt=False, closefd=True):
+        super(EncryptingWriter, self).__init__()
+        self.raw = raw
+        self.closefd = closefd
+        self.cipher = cipher
+        self._func = _transform(cipher, decrypt)
+        self._decrypt = decrypt
+        self._padding = getattr(cipher, "padding", None)
+        self._unit = _unit(cipher)
+        # Input held back, a block more when the padding is removed
+        self._hold = self._unit if decrypt and self._padding else 0
+        self._pending = b""  # Input not processed yet (incomplete block)
+        self._buffer = bytearray()
+        self._done = False  # The padded end was written
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        data = _byte_view(b)
+        start = len(self._pending)
+        total = start + len(data)
+        end = max(0, total - (total % self._unit or self._hold))
+
+        if not end:
+            self._pending += data.tobytes()
+            return len(data)
+
+        if len(self._buffer) < end:
+            self._buffer = bytearray(end)
+        view = memoryview(self._buffer)[:end]
+        view[:start] = self._pending
+        view[start:] = data[:end - start]
+
+        self._func(view, view)
+        self.raw.write(view)
+        self._pending = data[end - start:].tobytes()
+        return len(data)
+
+    def finish(self):
+        """Check that all input was processed and flush `raw`.
+
+        With padding, the end of the message is written first.
+        """
+        if self._padding is None:
+            _check_end(self._unit, len(self._pending))
+        elif not self._done:
+            self._done = True
+            view = memoryview(bytearray(self._unit))
+            view[:len(self._pending)] = self._pending
+            size = _finish(self._func, view, len(self._pending),
+                           self._decrypt, self._padding)
+            self._pending = b""
+            self.raw.write(view[:size])
+        flush = getattr(self.raw, "flush", None)
+        if flush is not None:
+            flush()
+
+    def close(self):
+        if not self.closed:
+            try:
+                self.finish()
+            finally:
+                try:
+                    if self.closefd:
+                        self.raw.close()
+                finally:
+                    super(EncryptingWriter, self).close()
+
+
+def encrypt_file(src, dst, cipher, chunk_size=DEFAULT_CHUNK_SIZE,
+                 decrypt=False):
+    """Encrypt the readable stream `src` into the writable stream `dst`.
+
+    At most `chunk_size` bytes are held in memory, the same buffer is used
+    for every chunk. Neither stream is closed.
+
+    :return: The amount of bytes written.
+    :rtype: int
+    """
+    reader = EncryptingReader(src, cipher, decrypt, closefd=False)
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+
+    total = 0
+    while True:
+        size = reader.readinto(buffer)
+        if not size:
+            return total
+        dst.write(view[:size])
+        total += size
+
+
+def decrypt_file(src, dst, cipher, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Decrypt the readable stream `src` into the writable stream `dst`.
+
+    See :py:func:`encrypt_file`.
+    """
+    return encrypt_file(src, dst, cipher, chunk_size, decrypt=True)